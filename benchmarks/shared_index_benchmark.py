@@ -0,0 +1,122 @@
+"""
+Benchmark: 1..N procesów serwujących wyszukiwanie po indexie.
+
+Porównuje dwa tryby, oba przez QuantLibIndex.search_by_vector (ścieżka aplikacji):
+- private -> każdy worker: QuantLibIndex(db_path) z własną Chroma (osobny HNSW w RAM)
+- shared  -> rodzic tworzy segment (QuantLibIndex.share), workery:
+             QuantLibIndex(shared_segment=spec), wektory podpięte zero-copy
+
+Mierzy łączną przepustowość (zapytania/s) i pamięć workerów
+(suma PSS z /proc/<pid>/smaps_rollup - strony współdzielone liczone proporcjonalnie).
+Zapytania to wektory chunków z szumem. Domyślnie bez modelu embeddingów
+(mierzymy index + chunk store); --with-model ładuje bge-m3 w każdym workerze,
+jak w aplikacji - wtedy PSS zawiera też model.
+
+Usage (z katalogu repo, Linux):
+    python -m benchmarks.shared_index_benchmark --max-workers 4 --duration 5
+    python -m benchmarks.shared_index_benchmark --max-workers 4 --with-model
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+from langchain_core.embeddings import FakeEmbeddings
+
+from src.quantlib_rag.config import CHROMA_BGE_MD
+from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+
+
+def _pss_mb() -> float:
+    """PSS bieżącego procesu w MB (Linux); 0.0, jeśli niedostępne."""
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _open_index(mode: str, spec: Dict[str, Any], with_model: bool) -> QuantLibIndex:
+    # bez modelu: zapytania to gotowe wektory, embed_query nie jest wołane
+    embeddings = None if with_model else FakeEmbeddings(size=spec["shape"][1])
+    if mode == "shared":
+        return QuantLibIndex(shared_segment=spec, embeddings=embeddings)
+    return QuantLibIndex(db_path=spec["db_dir"], embeddings=embeddings, corpora=[])
+
+
+def _worker(mode: str, spec: Dict[str, Any], queries: np.ndarray, k: int, with_model: bool,
+            duration: float, barrier: Any, results: Any) -> None:
+    index = _open_index(mode, spec, with_model)
+    index.search_by_vector(queries[0].tolist(), k)
+
+    barrier.wait()
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for handle in index.search_by_vector(queries[done % len(queries)].tolist(), k):
+            handle.text(max_chars=800)
+        done += 1
+
+    results.put({"queries": done, "pss_mb": _pss_mb()})
+    index.close()
+
+
+def run(db_dir: Path, max_workers: int, duration: float, k: int, n_queries: int, with_model: bool) -> None:
+    parent = QuantLibIndex(db_path=db_dir, embeddings=FakeEmbeddings(size=1), corpora=[])
+    segment = parent.share()
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, segment.shape[0], size=n_queries)
+    queries = segment.vectors[picks] + rng.normal(0, 0.02, size=(n_queries, segment.shape[1]))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    ctx = mp.get_context("spawn")
+    model = "bge-m3 loaded per worker" if with_model else "excluded (precomputed query vectors; --with-model to include)"
+    print(f"\nEmbedding model: {model}")
+    print(f"{'mode':<8} {'workers':>7} {'qps':>10} {'qps/worker':>11} {'PSS total MB':>13}")
+    try:
+        for mode in ("private", "shared"):
+            for n in range(1, max_workers + 1):
+                barrier = ctx.Barrier(n)
+                results = ctx.Queue()
+                procs = [
+                    ctx.Process(
+                        target=_worker,
+                        args=(mode, segment.spec(), queries, k, with_model, duration, barrier, results),
+                    )
+                    for _ in range(n)
+                ]
+                for p in procs:
+                    p.start()
+                stats = [results.get() for _ in procs]
+                for p in procs:
+                    p.join()
+
+                qps = sum(s["queries"] for s in stats) / duration
+                pss = sum(s["pss_mb"] for s in stats)
+                print(f"{mode:<8} {n:>7} {qps:>10.0f} {qps / n:>11.0f} {pss:>13.1f}")
+    finally:
+        segment.close()
+        parent.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shared-memory index scaling benchmark.")
+    parser.add_argument("--db-dir", type=Path, default=CHROMA_BGE_MD)
+    parser.add_argument("--max-workers", type=int, default=max(1, min(4, mp.cpu_count())))
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--with-model", action="store_true", help="load bge-m3 in every worker")
+    args = parser.parse_args()
+
+    run(args.db_dir, args.max_workers, args.duration, args.k, args.queries, args.with_model)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,13 @@
 Main bootstrap script for QuantLib RAG Engine.
 
 Usage:
-    python main.py
+    python main.py               # index (snapshot / docs + build) -> Groq UI
+    python main.py --ui ollama   # local Ollama UI (model preloaded and pinned first)
+    python main.py --watch       # + rebuild index in background when docs change
 """
 
+import argparse
+import os
 import subprocess
 from pathlib import Path
 import sys
@@ -12,12 +16,24 @@ import sys
 from src.quantlib_rag.config import (
     MD_DIR,
     CHROMA_BGE_MD,
+    INDEX_SNAPSHOT,
+    OLLAMA_KEEP_ALIVE,
 )
 from src.quantlib_rag.ingestion.download_quantlib_docs import QuantLibDocsDownloader
 from src.quantlib_rag.ingestion.build_index import QuantLibMarkdownIndexBuilder
+from src.quantlib_rag.ingestion.index_snapshot import QuantLibIndexSnapshot, SnapshotError
+from src.quantlib_rag.rag.warmup import ollama_ready, preload_ollama
 
 
-def run_streamlit():
+# UI do wyboru (--ui) i te, które korzystają z lokalnej Ollamy
+STREAMLIT_UIS = {
+    "groq": "src/quantlib_rag/app/ui_streamlit_groq.py",
+    "ollama": "src/quantlib_rag/app/ui_streamlit.py",
+}
+OLLAMA_UIS = {STREAMLIT_UIS["ollama"]}
+
+
+def run_streamlit(ui: str = STREAMLIT_UIS["groq"], watch: bool = False):
 
     #print("\n[INFO] Launching Streamlit UI...\n")
     #project_root = Path(__file__).resolve().parent  # katalog z main.py
@@ -29,8 +45,12 @@ def run_streamlit():
     #)
 
     print("\n[INFO] Launching Streamlit UI...\n")
+    env = dict(os.environ)
+    if watch:
+        env["QUANTLIB_RAG_WATCH"] = "1"
     subprocess.run(
-        [sys.executable, "-m", "streamlit", "run", "src/quantlib_rag/app/ui_streamlit_groq.py"]
+        [sys.executable, "-m", "streamlit", "run", ui],
+        env=env,
     )
 
 
@@ -44,21 +64,61 @@ def ensure_docs():
 
 
 def ensure_index():
+    """
+    Index na dysku: istniejący -> snapshot (sekundy, bez docs) -> pełny build.
+    Docs pobieramy dopiero przed buildem: świeży node ze snapshotem ich nie potrzebuje,
+    a świeżo pobrane mogłyby się różnić od zindeksowanych (source_hashes) i wymusić rebuild.
+    """
     if CHROMA_BGE_MD.exists() and any(CHROMA_BGE_MD.glob("*")):
         print("[INFO] Chroma index already exists — skipping rebuild.")
         return
 
+    if INDEX_SNAPSHOT.exists():
+        print(f"[INFO] Restoring Chroma index from snapshot: {INDEX_SNAPSHOT}")
+        try:
+            QuantLibIndexSnapshot.open(INDEX_SNAPSHOT).restore(CHROMA_BGE_MD, overwrite=True)
+            return
+        except SnapshotError as exc:
+            print(f"[WARN] Snapshot not usable ({exc}) — falling back to full rebuild.")
+
+    ensure_docs()
     print("[INFO] Chroma index NOT found — building index...")
     builder = QuantLibMarkdownIndexBuilder()
     builder.run()
 
 
+def warm_up_ollama(model: str = "mistral"):
+    """
+    Ładuje model do Ollamy przed startem UI i przypina go (OLLAMA_KEEP_ALIVE, domyślnie -1),
+    żeby pierwsze pytanie nie czekało na load modelu.
+    Tylko dla UI z Ollamą (OLLAMA_UIS) - Groq UI nie potrzebuje modelu w pamięci.
+    Embeddingi rozgrzewa już sam proces Streamlit.
+    """
+    if not ollama_ready():
+        print("[INFO] Ollama not reachable — skipping LLM preload.")
+        return
+
+    print(f"[INFO] Preloading Ollama model '{model}'...")
+    if preload_ollama(model):
+        if OLLAMA_KEEP_ALIVE == -1:
+            print(f"[INFO] Ollama model '{model}' loaded and pinned (keep_alive=-1).")
+        else:
+            print(f"[INFO] Ollama model '{model}' loaded (keep_alive={OLLAMA_KEEP_ALIVE}).")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="QuantLib RAG Engine bootstrap.")
+    parser.add_argument("--ui", choices=sorted(STREAMLIT_UIS), default="groq")
+    parser.add_argument("--watch", action="store_true", help="rebuild the index when docs change")
+    args = parser.parse_args()
+    ui = STREAMLIT_UIS[args.ui]
+
     print("\n=== QuantLib RAG Engine ===")
 
-    ensure_docs()
     ensure_index()
-    run_streamlit()
+    if ui in OLLAMA_UIS:
+        warm_up_ollama()
+    run_streamlit(ui, watch=args.watch)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+import streamlit as st
+
+from src.quantlib_rag import config
+from src.quantlib_rag.rag.index_watcher import IndexWatcher, LiveQuantLibIndex, pinned_index
+from src.quantlib_rag.rag.quantlib_assistant import QuantLibQuoteAssistant
+from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+from src.quantlib_rag.rag.query_log import shared_query_log
+from src.quantlib_rag.rag.warmup import READINESS, warm_up
+
+
+# --------- JEDEN INDEX NA PROCES ---------
+
+@st.cache_resource(show_spinner="Warming up models...")
+def get_shared_index() -> QuantLibIndex | LiveQuantLibIndex:
+    """
+    Index współdzielony przez wszystkie sesje Streamlit w procesie:
+    - bge-m3, Chroma, chunk store i cache LRU ładowane raz, nie na sesję
+    - watch mode (QUANTLIB_RAG_WATCH=1) -> LiveQuantLibIndex + wątek przebudowy
+    - pierwsze inference embeddingów i wyszukiwanie od razu (raz na proces)
+    - pre-warm cache najczęstszymi pytaniami z logu (QUANTLIB_RAG_QUERY_LOG=1), też raz
+    """
+    if config.WATCH_DOCS:
+        index = LiveQuantLibIndex()
+        IndexWatcher(index).start()
+    else:
+        index = QuantLibIndex()
+
+    with pinned_index(index) as current:
+        warm_up(current)
+        if config.QUERY_LOG_ENABLED:
+            QuantLibQuoteAssistant.prewarm(current, shared_query_log())
+    return index
+
+
+# --------- STATUS GOTOWOŚCI ---------
+
+def render_readiness_sidebar() -> None:
+    """Status gotowości procesu (READINESS) w sidebarze."""
+    status = READINESS.status()
+    st.sidebar.markdown(f"**Backend ready:** {'✅' if status['ready'] else '⏳'}")
+    for name, check in status["checks"].items():
+        st.sidebar.caption(f"{name}: {'ok' if check['ok'] else 'failed'} ({check['seconds']:.1f}s)")
@@ -2,8 +2,10 @@ import streamlit as st
 
 #from quantlib_rag.rag.quantlib_assistant import QuantLibQuoteAssistant
 #from quantlib_rag.rag.quantlib_index import QuantLibIndex
+from src.quantlib_rag.app.ui_common import get_shared_index, render_readiness_sidebar
+from src.quantlib_rag.rag.index_watcher import pinned_index
 from src.quantlib_rag.rag.quantlib_assistant import QuantLibQuoteAssistant
-from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+from src.quantlib_rag.rag.query_decomposer import QueryDecomposer
 
 def get_quote_assistant() -> QuantLibQuoteAssistant:
     if "ql_quote_assistant" not in st.session_state:
@@ -11,22 +13,22 @@ def get_quote_assistant() -> QuantLibQuoteAssistant:
             llm_model="mistral",
             temperature=0.0,
             k_default=5,
+            index=get_shared_index(),  # ten sam (rozgrzany) index co tryb Search
         )
-    return st.session_state.ql_quote_assistant
-
 
-def get_index() -> QuantLibIndex:
-    if "ql_index" not in st.session_state:
-        st.session_state.ql_index = QuantLibIndex(
-            # db_path domyślnie z configu, więc nic nie podajemy
-        )
-    return st.session_state.ql_index
+        # index (i pre-warm z logu) rozgrzany raz na proces; tu tylko pierwsze wywołanie LLM
+        with st.spinner("Warming up LLM..."):
+            st.session_state.ql_quote_assistant.warm_up(warm_llm=True, warm_index=False, prewarm_top_n=0)
+    return st.session_state.ql_quote_assistant
 
 
 def main():
     st.set_page_config(page_title="QuantLib RAG Assistant", layout="wide")
     st.title("📘 QuantLib RAG Assistant (internal docs only)")
 
+    # rozgrzanie indexu raz na proces (współdzielony przez sesje)
+    get_shared_index()
+
     st.markdown(
         "- **Search only** – pokazuje surowe fragmenty dokumentacji z retrievera\n"
         "- **Docs-based answer** – LLM odpowiada WYŁĄCZNIE na podstawie dokumentacji\n"
@@ -44,30 +46,56 @@ def main():
         index=0,
     )
 
+    # LLM (Ollama) rozgrzewamy dopiero, gdy będzie potrzebny
+    if mode.startswith("Docs"):
+        get_quote_assistant()
+    render_readiness_sidebar()
+
     k = st.slider("Number of retrieved chunks (k)", 1, 8, value=5)
+    adaptive = st.checkbox(
+        "Adaptive k (score cut-off + MMR, slider = max k)",
+        value=False,
+        help=(
+            "Example / how-to questions still take code examples first; adaptive k then "
+            "trims the documentation chunks that fill the rest. "
+            "Compound questions split by multi-query are merged without adaptive k."
+        ),
+    )
+    multi_query = st.checkbox(
+        "Multi-query (split compound questions into sub-queries)",
+        value=False,
+    )
 
     if st.button("Run") and question.strip():
         if mode.startswith("Search"):
-            index = get_index()
-            retriever = index.get_retriever(k=k)
-
-            with st.spinner("Retrieving documentation..."):
-                docs = retriever.invoke(question)
-
-            st.subheader("🔎 Retrieved documentation chunks")
-            if not docs:
-                st.info("No documents retrieved.")
-            else:
-                for i, d in enumerate(docs):
-                    source = d.metadata.get("source", "")
-                    source_name = source.split("/")[-1] if source else "unknown"
-                    with st.expander(f"Result {i+1} — {source_name}"):
-                        st.code(d.page_content)
+            # wyniki renderujemy w obrębie pinu: po swapie w watch mode stara wersja
+            # (mmap chunk store) jest zamykana, gdy ostatnie zapytanie ją odda
+            with pinned_index(get_shared_index()) as index:
+                with st.spinner("Retrieving documentation..."):
+                    queries = QueryDecomposer().split(question) if multi_query else [question]
+                    if len(queries) > 1:
+                        docs = index.multi_search(queries, k=k)
+                    elif adaptive:
+                        docs = index.adaptive_search(question, k_max=k)
+                    else:
+                        docs = index.get_retriever(k=k).invoke(question)
+
+                st.subheader("🔎 Retrieved documentation chunks")
+                if not docs:
+                    st.info("No documents retrieved.")
+                else:
+                    for i, d in enumerate(docs):
+                        source = d.metadata.get("source", "")
+                        source_name = source.split("/")[-1] if source else "unknown"
+                        with st.expander(f"Result {i+1} — {source_name}"):
+                            st.code(d.page_content)
 
         else:  # Docs-based answer (quote-only)
             assistant = get_quote_assistant()
             with st.spinner("Asking LLM (docs-constrained)..."):
-                res = assistant.quote_only_answer(question, k=k)
+                res = assistant.quote_only_answer(
+                    question, k=k, adaptive=adaptive, multi_query=multi_query
+                )
 
             st.subheader("🧾 Answer based on documentation")
             st.write(res["answer_en"])
@@ -4,6 +4,7 @@ import os
 
 import streamlit as st
 
+from src.quantlib_rag.app.ui_common import get_shared_index, render_readiness_sidebar
 from src.quantlib_rag.rag.quantlib_assistant import QuantLibQuoteAssistant
 from src.quantlib_rag.rag.llm_groq import create_groq_llm
 
@@ -57,7 +58,10 @@ def get_groq_assistant() -> QuantLibQuoteAssistant:
         st.session_state.ql_groq_assistant = QuantLibQuoteAssistant(
             llm=llm,      # 🔹 tu wstrzykujemy gotowy ChatGroq
             k_default=5,
+            index=get_shared_index(),  # jeden index na proces (watch mode -> live index)
         )
+        # index rozgrzany (i pre-warm z logu) raz na proces w get_shared_index;
+        # Groq nie rozgrzewamy - to płatne wywołanie
     return st.session_state.ql_groq_assistant
 
 
@@ -70,6 +74,10 @@ def main():
     # 🔐 hasło
     #check_password()
 
+    # index rozgrzany raz na proces + status gotowości
+    get_groq_assistant()
+    render_readiness_sidebar()
+
     st.markdown(
         "This instance uses **Groq** as the LLM backend.\n\n"
         "- Retrieval: BGE + Chroma\n"
@@ -89,13 +97,28 @@ def main():
     )
 
     k = st.slider("Number of retrieved chunks (k)", 1, 8, value=5)
+    adaptive = st.checkbox(
+        "Adaptive k (score cut-off + MMR, slider = max k)",
+        value=False,
+        help=(
+            "Example / how-to questions still take code examples first; adaptive k then "
+            "trims the documentation chunks that fill the rest. "
+            "Compound questions split by multi-query are merged without adaptive k."
+        ),
+    )
+    multi_query = st.checkbox(
+        "Multi-query (split compound questions into sub-queries)",
+        value=False,
+    )
 
     if st.button("Run") and question.strip():
         assistant = get_groq_assistant()
 
         if mode.startswith("Quote-only"):
             with st.spinner("Asking Groq (quote-only)..."):
-                res = assistant.quote_only_answer(question, k=k)
+                res = assistant.quote_only_answer(
+                    question, k=k, adaptive=adaptive, multi_query=multi_query
+                )
 
             st.subheader("🧾 Quote-only answer (copied from docs)")
             st.write(res["answer_en"])
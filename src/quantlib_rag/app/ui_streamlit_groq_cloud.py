@@ -2,16 +2,44 @@ import os
 import streamlit as st
 
 from src.quantlib_rag import config
+from src.quantlib_rag.app.ui_common import get_shared_index, render_readiness_sidebar
 from src.quantlib_rag.ingestion.download_quantlib_docs import QuantLibDocsDownloader
 from src.quantlib_rag.ingestion.build_index import QuantLibMarkdownIndexBuilder
+from src.quantlib_rag.ingestion.index_snapshot import QuantLibIndexSnapshot, SnapshotError
 from src.quantlib_rag.rag.llm_groq import create_groq_llm
 from src.quantlib_rag.rag.quantlib_assistant import QuantLibQuoteAssistant
 
 
 # --------- HELPERY: DOCS + INDEX ---------
 
+def restore_index_from_snapshot() -> bool:
+    """
+    Brak indexu + gotowy snapshot -> odtworzenie w kilka sekund, bez docs i embedowania.
+    Zwraca True, jeśli index jest na dysku.
+    """
+    index_missing = not config.CHROMA_BGE_MD.exists() or not any(config.CHROMA_BGE_MD.glob("*"))
+    if not index_missing:
+        return True
+    if not config.INDEX_SNAPSHOT.exists():
+        return False
+
+    st.write("📦 Restoring index from snapshot...")
+    try:
+        QuantLibIndexSnapshot.open(config.INDEX_SNAPSHOT).restore(
+            config.CHROMA_BGE_MD, overwrite=True
+        )
+        return True
+    except SnapshotError as exc:
+        print(f"[BOOTSTRAP] Snapshot not usable: {exc}")
+        return False
+
+
 def ensure_docs_and_index() -> None:
     """Upewnia się, że .md i index Chroma są gotowe (Cloud / lokalnie)."""
+    # 0) gotowy snapshot
+    if restore_index_from_snapshot():
+        return
+
     # 1) markdowny
     if not any(config.MD_DIR.glob("*.md")):
         st.write("📥 Downloading QuantLib-Python docs...")
@@ -66,6 +94,8 @@ def get_groq_assistant() -> QuantLibQuoteAssistant:
     if "ql_groq_assistant" not in st.session_state:
         # 🔥 tu dbamy o docs + index
         #ensure_docs_and_index()
+        # cold start na Cloud: index ze snapshotu (bez pobierania docs i embedowania)
+        restore_index_from_snapshot()
 
         llm = create_groq_llm(
             model="llama-3.1-8b-instant",
@@ -75,7 +105,10 @@ def get_groq_assistant() -> QuantLibQuoteAssistant:
         st.session_state.ql_groq_assistant = QuantLibQuoteAssistant(
             llm=llm,
             k_default=5,
+            index=get_shared_index(),  # jeden index na proces, nie na sesję
         )
+        # index rozgrzany (i pre-warm z logu) raz na proces w get_shared_index;
+        # Groq nie rozgrzewamy - to płatne wywołanie
     return st.session_state.ql_groq_assistant
 
 
@@ -88,6 +121,10 @@ def main():
     # 🔐 hasło (opcjonalne – jak ustawisz APP_PASSWORD)
     check_password()
 
+    # index rozgrzany raz na proces + status gotowości
+    get_groq_assistant()
+    render_readiness_sidebar()
+
     st.markdown(
         "Backend:\n"
         "- **Retriever**: Chroma + BGE (BAAI/bge-m3)\n"
@@ -102,12 +139,27 @@ def main():
     )
 
     k = st.slider("Number of retrieved chunks (k)", 1, 8, value=5)
+    adaptive = st.checkbox(
+        "Adaptive k (score cut-off + MMR, slider = max k)",
+        value=False,
+        help=(
+            "Example / how-to questions still take code examples first; adaptive k then "
+            "trims the documentation chunks that fill the rest. "
+            "Compound questions split by multi-query are merged without adaptive k."
+        ),
+    )
+    multi_query = st.checkbox(
+        "Multi-query (split compound questions into sub-queries)",
+        value=False,
+    )
 
     if st.button("Run") and question.strip():
         assistant = get_groq_assistant()
 
         with st.spinner("Asking Groq (quote-only)..."):
-            res = assistant.quote_only_answer(question, k=k)
+            res = assistant.quote_only_answer(
+                question, k=k, adaptive=adaptive, multi_query=multi_query
+            )
 
         st.subheader("🧾 Quote-only answer")
         st.write(res["answer_en"])
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # ---------------------------------------------------------
@@ -28,6 +29,40 @@ DB_DIR = PROJECT_ROOT / "db"
 # domyślna lokalizacja Chroma z embeddingami BGE-M3
 CHROMA_BGE_MD = DB_DIR / "quantlib_chroma_bge_md"
 
+# nazwa kolekcji w Chroma (domyślna nazwa z langchain_chroma)
+CHROMA_COLLECTION = "langchain"
+
+# osobna, mniejsza kolekcja z przykładami kodu (```...``` + podpis)
+CHROMA_CODE_COLLECTION = "quantlib_code"
+
+# manifest indexu (model, konfiguracja, hashe źródeł) zapisywany obok Chroma
+INDEX_MANIFEST_NAME = "manifest.json"
+
+# kompaktowy magazyn tekstów chunków (mmap) w katalogu indexu
+CHUNK_STORE_DIRNAME = "chunk_store"
+
+
+# wersje indexu budowane w tle (watch mode, blue/green)
+INDEX_VERSIONS_DIR = DB_DIR / "quantlib_chroma_bge_md_versions"
+
+# plik ze ścieżką aktywnej wersji (brak -> CHROMA_BGE_MD)
+ACTIVE_INDEX_POINTER = DB_DIR / "ACTIVE_INDEX"
+
+# watch mode: QUANTLIB_RAG_WATCH=1 -> rebuild po zmianie MD_DIR
+WATCH_DOCS = os.environ.get("QUANTLIB_RAG_WATCH", "0") == "1"
+WATCH_POLL_SECONDS = 5.0
+
+
+# ---------------------------------------------------------
+# INDEX SNAPSHOTS
+# ---------------------------------------------------------
+# gotowy index w jednym pliku -> szybki cold start bez embedowania
+SNAPSHOT_DIR = DB_DIR / "snapshots"
+INDEX_SNAPSHOT = SNAPSHOT_DIR / "quantlib_chroma_bge_md.qlsnap"
+
+# wersja formatu pliku snapshotu (podbijać przy zmianie layoutu)
+SNAPSHOT_FORMAT_VERSION = 1
+
 
 # ---------------------------------------------------------
 # MODELS / EMBEDDINGS
@@ -39,6 +74,19 @@ BGE_QUERY_INSTRUCTION = (
     "Represent this question for retrieving relevant internal documentation: "
 )
 
+# ---------------------------------------------------------
+# LLM (OLLAMA) / WARM-UP
+# ---------------------------------------------------------
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# jak długo Ollama trzyma model w pamięci po ostatnim zapytaniu (-1 = zawsze, przypięty)
+# liczba idzie do Ollamy jako int (string "-1" nie jest poprawnym czasem), np. "30m" - jako string
+_keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE", "-1")
+OLLAMA_KEEP_ALIVE = int(_keep_alive) if _keep_alive.lstrip("-").isdigit() else _keep_alive
+
+# rozmiary batchy embeddingów rozgrzewane na starcie (query = 1, build = 32)
+WARMUP_BATCH_SIZES = (1, 32)
+
 # ---------------------------------------------------------
 # RAG / CHUNKING PARAMETERS
 # ---------------------------------------------------------
@@ -54,3 +102,118 @@ DEFAULT_CHUNK_OVERLAP = 200
 
 # ile dokumentów pobiera retriever
 DEFAULT_K = 5
+
+# adaptive k: over-fetch kandydatów, odcięcie po score / skoku score, potem MMR
+ADAPTIVE_FETCH_K = 20
+ADAPTIVE_K_MAX = 8
+ADAPTIVE_MIN_SCORE = 0.40     # min. cosine similarity (bge-m3, znormalizowane)
+ADAPTIVE_MAX_GAP = 0.08       # skok score między sąsiednimi kandydatami -> koniec
+MMR_LAMBDA = 0.7              # 1.0 = tylko trafność, 0.0 = tylko różnorodność
+
+# ---------------------------------------------------------
+# DEDUPLIKACJA CHUNKÓW (build time)
+# ---------------------------------------------------------
+# shingle = n kolejnych słów; MinHash num_perm = bands * rows
+DEDUP_SHINGLE_SIZE = 5
+DEDUP_NUM_PERM = 64
+DEDUP_BANDS = 16
+
+# min. Jaccard (na shinglach), od którego chunki uznajemy za duplikaty
+DEDUP_JACCARD_THRESHOLD = 0.85
+
+# ---------------------------------------------------------
+# KOMPAKTOWY CONTEXT DO PROMPTU (build time)
+# ---------------------------------------------------------
+# ile wierszy długiej tabeli zostawiamy w wersji kompaktowej
+COMPACT_TABLE_MAX_ROWS = 3
+
+# ---------------------------------------------------------
+# INDEX PRZYKŁADÓW KODU + ROUTING ZAPYTAŃ
+# ---------------------------------------------------------
+# krótsze bloki kodu (np. jedna linia 'ql.Date(44000)') nie trafiają do indexu kodu
+CODE_EXAMPLE_MIN_CHARS = 40
+CODE_CAPTION_MAX_CHARS = 300
+
+# min. cosine similarity trafienia z indexu kodu; poniżej -> zwykły index
+CODE_ROUTE_MIN_SCORE = 0.45
+
+# ---------------------------------------------------------
+# HNSW AUTO-TUNER (ingestion/hnsw_tuner.py)
+# ---------------------------------------------------------
+# siatka kandydatów; embeddingi są znormalizowane, więc przestrzeń
+# (cosine / l2 / ip) nie zmienia rankingu - domyślnie tylko cosine
+HNSW_TUNE_SPACES = ("cosine",)
+HNSW_TUNE_M = (8, 16, 32)
+HNSW_TUNE_CONSTRUCTION_EF = (64, 128, 256)
+HNSW_TUNE_SEARCH_EF = (16, 32, 64, 128)
+
+# recall@k liczony dla k = ADAPTIVE_FETCH_K (tyle kandydatów pobiera adaptive_search)
+HNSW_TUNE_K = ADAPTIVE_FETCH_K
+HNSW_TUNE_TARGET_RECALL = 0.99
+
+# zapytania = wektory chunków z szumem (bez ładowania bge-m3)
+HNSW_TUNE_QUERIES = 200
+HNSW_TUNE_NOISE = 0.05
+
+# ---------------------------------------------------------
+# QUERY LOG + CACHE + PRE-WARM
+# ---------------------------------------------------------
+# log zapytań (domyślnie wyłączony): QUANTLIB_RAG_QUERY_LOG=1
+QUERY_LOG_ENABLED = os.environ.get("QUANTLIB_RAG_QUERY_LOG", "0") == "1"
+QUERY_LOG_DIR = PROJECT_ROOT / "logs"
+
+# "jsonl" (rotowane pliki) albo "sqlite"
+QUERY_LOG_BACKEND = os.environ.get("QUANTLIB_RAG_QUERY_LOG_BACKEND", "jsonl")
+
+# prywatność: "text" -> zapisujemy znormalizowane pytanie,
+# "hash" -> tylko sha256 pytania (statystyki bez treści; pre-warm niemożliwy)
+QUERY_LOG_PRIVACY = os.environ.get("QUANTLIB_RAG_QUERY_LOG_PRIVACY", "text")
+
+# rotacja: jsonl -> max rozmiar pliku + liczba starych plików; sqlite -> max wierszy
+QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+QUERY_LOG_BACKUPS = 3
+QUERY_LOG_MAX_ROWS = 100_000
+
+# ile najczęstszych pytań z logu odtwarzamy na starcie (0 -> bez pre-warm)
+PREWARM_TOP_N = 20
+
+# rozmiary cache LRU w QuantLibIndex (embeddingi zapytań / wyniki wyszukiwania)
+QUERY_EMBED_CACHE_SIZE = 1024
+RETRIEVAL_CACHE_SIZE = 512
+
+# ---------------------------------------------------------
+# BATCH GROUNDING CHECKER (rag/grounding.py)
+# ---------------------------------------------------------
+# liczba procesów (None -> liczba CPU); mniejsze batche liczymy w procesie
+GROUNDING_PROCESSES = None
+GROUNDING_MIN_POOL_BATCH = 256
+GROUNDING_POOL_CHUNKSIZE = 64
+
+# ---------------------------------------------------------
+# MULTI-QUERY (rozbijanie pytań złożonych)
+# ---------------------------------------------------------
+# max liczba pod-pytań (bez pytania oryginalnego) i min. długość pod-pytania w słowach
+MULTI_QUERY_MAX_PARTS = 4
+MULTI_QUERY_MIN_WORDS = 3
+
+# True -> pod-pytania generuje LLM asystenta (fallback: heurystyki)
+MULTI_QUERY_USE_LLM = False
+
+# ---------------------------------------------------------
+# KORPUSY / SHARDY (federated search)
+# ---------------------------------------------------------
+# domyślny korpus = index z CHROMA_BGE_MD (ReadTheDocs), zawsze przeszukiwany
+DEFAULT_CORPUS = "readthedocs"
+
+# dodatkowe korpusy (np. Doxygen C++, przykłady, notatki) - każdy shard to osobny index
+CORPORA_DIR = DB_DIR / "corpora"
+CORPORA_REGISTRY = CORPORA_DIR / "corpora.json"
+
+# które dodatkowe korpusy przeszukujemy: QUANTLIB_RAG_CORPORA=cpp_doxygen,notes
+ACTIVE_CORPORA = [c.strip() for c in os.environ.get("QUANTLIB_RAG_CORPORA", "").split(",") if c.strip()]
+
+# max czas odpowiedzi shardu; wolniejszy shard jest pomijany w wyniku
+FEDERATION_TIMEOUT_SECONDS = 10.0
+
+# ile wektorów shardu bierzemy do kalibracji score (tło podobieństw w shardzie)
+FEDERATION_CALIBRATION_SAMPLE = 256
@@ -1,6 +1,9 @@
+import hashlib
+import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import chromadb
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
 from langchain_text_splitters import MarkdownHeaderTextSplitter
 from langchain_community.embeddings import HuggingFaceBgeEmbeddings
@@ -11,19 +14,33 @@ from langchain_core.documents import Document
 from ..config import (
     MD_DIR,
     CHROMA_BGE_MD,
+    CHROMA_COLLECTION,
+    CHROMA_CODE_COLLECTION,
     EMBEDDING_MODEL,
     BGE_QUERY_INSTRUCTION,
     MARKDOWN_HEADERS,
     DEFAULT_K,
+    DEDUP_JACCARD_THRESHOLD,
 )
+from ..rag.chunk_store import ChunkStore
+from .code_examples import example_id, extract_code_examples
+from .corpora import shard_of
+from .dedup import ChunkDeduplicator
+from .hnsw_tuner import hnsw_metadata
+from .manifest import build_index_manifest, load_manifest, write_manifest
 
 class QuantLibMarkdownIndexBuilder:
     """
     Buduje index Chroma na plikach .md z dokumentacja QuantLib:
     - laduje .md z katalogu (domyslnie: data/processed/quantlib_md)
     - dzieli po naglowkach markdown (h1/h2/h3)
+    - usuwa duplikaty / prawie-duplikaty chunkow (MinHash + LSH)
     - embeduje BAAI/bge-m3
-    - zapisuje index w db/quantlib_chroma_bge_md
+    - zapisuje chunk store z kompaktowa wersja chunkow do promptu (compress_chunk)
+    - osobna kolekcja z przykladami kodu (bloki ``` + podpis) dla pytan o przyklady
+    - zapisuje index w db/quantlib_chroma_bge_md (+ chunk store + manifest.json)
+    - parametry HNSW bierze z sekcji "hnsw" manifestu (hnsw_tuner), jesli jest
+    - opcjonalnie: shard nazwanego korpusu (corpus + shard=(nr, liczba shardow))
     """
 
     def __init__(
@@ -31,18 +48,36 @@ class QuantLibMarkdownIndexBuilder:
         source_dir: Optional[Path] = None,
         db_dir: Optional[Path] = None,
         model_name: str = EMBEDDING_MODEL,
+        dedup: bool = True,
+        dedup_threshold: float = DEDUP_JACCARD_THRESHOLD,
+        embeddings: Optional[HuggingFaceBgeEmbeddings] = None,
+        hnsw: Optional[Dict[str, Any]] = None,
+        corpus: Optional[str] = None,
+        shard: Optional[Tuple[int, int]] = None,
     ) -> None:
 
 
         self.source_dir = source_dir or MD_DIR
         self.db_dir = db_dir or CHROMA_BGE_MD
+        self.model_name = model_name
+        self.deduplicator = ChunkDeduplicator(threshold=dedup_threshold) if dedup else None
+        self.dedup_report: Optional[dict] = None
+        self.corpus = corpus
+        self.shard = shard
 
-        self.embeddings = HuggingFaceBgeEmbeddings(
+        # można podać gotowy model (np. z działającego indexu w watch mode)
+        self.embeddings = embeddings or HuggingFaceBgeEmbeddings(
             model_name=model_name,
             encode_kwargs={"normalize_embeddings": True},
             query_instruction=BGE_QUERY_INSTRUCTION,
         )
 
+        # ustawienia HNSW z tunera: podane wprost (watch mode) albo z manifestu db_dir
+        if hnsw is None:
+            hnsw = (load_manifest(self.db_dir) or {}).get("hnsw")
+        self.hnsw = hnsw
+        self.collection_metadata = hnsw_metadata((hnsw or {}).get("settings"))
+
     # 1. Ładowanie dokumentów (1:1 z Twojego kodu)
 
     def load_documents(self) -> List[Document]:
@@ -53,6 +88,18 @@ class QuantLibMarkdownIndexBuilder:
             loader_kwargs={"encoding": "utf-8"},
         )
         docs = loader.load()
+
+        # shard korpusu: tylko pliki, których hash ścieżki wypada na ten shard
+        if self.shard is not None:
+            index, n_shards = self.shard
+            docs = [
+                d for d in docs
+                if shard_of(os.path.relpath(d.metadata["source"], self.source_dir), n_shards) == index
+            ]
+        if self.corpus is not None:
+            for d in docs:
+                d.metadata["corpus"] = self.corpus
+
         print("Docs:", len(docs))
         return docs
 
@@ -80,16 +127,54 @@ class QuantLibMarkdownIndexBuilder:
         print("Markdown-aware chunks:", len(chunks))
         return chunks
 
-    # 3. Budowa i zapis indexu Chroma
+    # 3. Deduplikacja chunkow (boilerplate, powtorzone sygnatury)
+
+    def deduplicate(self, chunks: List[Document]) -> List[Document]:
+        if self.deduplicator is None:
+            return chunks
+
+        chunks, report = self.deduplicator.deduplicate(chunks)
+        self.dedup_report = report
+
+        removed = report["chunks_in"] - report["chunks_out"]
+        print(
+            f"Dedup: {report['chunks_in']} -> {report['chunks_out']} chunks "
+            f"(-{removed}: {report['exact_removed']} exact, {report['near_removed']} near; "
+            f"{report['chars_removed']} chars not embedded)"
+        )
+        return chunks
+
+    # 4. Budowa i zapis indexu Chroma
+
+    @staticmethod
+    def chunk_id(doc: Document) -> str:
+        """Deterministyczne id chunka (to samo w Chroma i w chunk store)."""
+        source = os.path.basename(doc.metadata.get("source", ""))
+        data = f"{source}\n{doc.page_content}".encode("utf-8")
+        return hashlib.blake2b(data, digest_size=12).hexdigest()
 
     def build_index(self, chunks: List[Document]) -> Chroma:
         self.db_dir.parent.mkdir(parents=True, exist_ok=True)
         print(f"[INFO] Building Chroma index in: {self.db_dir}")
+        if self.collection_metadata:
+            print(f"[INFO] HNSW settings from manifest: {self.collection_metadata}")
 
+        ids = [self.chunk_id(c) for c in chunks]
+        self._reset_collection(CHROMA_COLLECTION)
         vectorstore = Chroma.from_documents(
             documents=chunks,
             embedding=self.embeddings,
+            ids=ids,
             persist_directory=str(self.db_dir),
+            collection_name=CHROMA_COLLECTION,
+            collection_metadata=self.collection_metadata,
+        )
+
+        ChunkStore.write(
+            ChunkStore.path_for(self.db_dir, CHROMA_COLLECTION),
+            ids=ids,
+            texts=[c.page_content for c in chunks],
+            metadatas=[c.metadata for c in chunks],
         )
 
         try:
@@ -100,12 +185,75 @@ class QuantLibMarkdownIndexBuilder:
         print("[INFO] Index built and persisted.")
         return vectorstore
 
-    # 4. Pipeline end-to-end
+    def _reset_collection(self, name: str) -> None:
+        """
+        Przebudowa = nowa kolekcja: parametry HNSW (M, construction_ef) ustawia
+        się tylko przy tworzeniu, a stare chunki nie mogą zostać obok nowych.
+        """
+        if not self.db_dir.exists():
+            return
+        client = chromadb.PersistentClient(path=str(self.db_dir))
+        names = {c if isinstance(c, str) else c.name for c in client.list_collections()}
+        if name in names:
+            print(f"[INFO] Dropping existing collection '{name}' before rebuild.")
+            client.delete_collection(name)
+
+    # 5. Pipeline end-to-end
 
     def run(self) -> None:
         docs = self.load_documents()
+        if not docs:
+            print(f"[WARN] No markdown documents for {self.db_dir} — nothing to index.")
+            return
         chunks = self.split_markdown(docs)
+        chunks = self.deduplicate(chunks)
         self.build_index(chunks)
+        n_examples = self.build_code_index(chunks)
+        self.write_manifest(
+            n_chunks=len(chunks),
+            n_code_examples=n_examples,
+            dedup=self.dedup_report,
+            hnsw=self.hnsw,
+            corpus=self.corpus,
+            shard=list(self.shard) if self.shard else None,
+        )
+
+    # 6. Index przykladow kodu (osobna kolekcja w tym samym katalogu)
+
+    def build_code_index(self, chunks: List[Document]) -> int:
+        examples = extract_code_examples(chunks, [self.chunk_id(c) for c in chunks])
+        print("Code examples:", len(examples))
+        if not examples:
+            return 0
+
+        ids = [example_id(e) for e in examples]
+        self._reset_collection(CHROMA_CODE_COLLECTION)
+        Chroma.from_documents(
+            documents=examples,
+            embedding=self.embeddings,
+            ids=ids,
+            persist_directory=str(self.db_dir),
+            collection_name=CHROMA_CODE_COLLECTION,
+            collection_metadata=self.collection_metadata,
+        )
+        ChunkStore.write(
+            ChunkStore.path_for(self.db_dir, CHROMA_CODE_COLLECTION),
+            ids=ids,
+            texts=[e.page_content for e in examples],
+            metadatas=[e.metadata for e in examples],
+        )
+        return len(examples)
+
+    # 7. Manifest indexu (model, konfiguracja, hashe źródeł)
+
+    def write_manifest(self, **extra) -> None:
+        manifest = build_index_manifest(
+            source_dir=self.source_dir,
+            model_name=self.model_name,
+            extra=extra,
+        )
+        path = write_manifest(self.db_dir, manifest)
+        print(f"[INFO] Manifest written: {path}")
 
 
 def main() -> None:
@@ -0,0 +1,89 @@
+import hashlib
+import re
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from ..config import CODE_EXAMPLE_MIN_CHARS, CODE_CAPTION_MAX_CHARS
+
+
+_FENCE_RE = re.compile(r"^\s*```")
+_HEADER_RE = re.compile(r"^\s*#{1,6}\s+")
+
+
+def _caption(prose: List[str], max_chars: int) -> str:
+    """Ostatnie niepuste linie prozy przed blokiem kodu (podpis przykładu)."""
+    lines: List[str] = []
+    size = 0
+    for line in reversed(prose):
+        line = line.strip()
+        if not line or _HEADER_RE.match(line):
+            if lines:
+                break
+            continue
+        lines.insert(0, line)
+        size += len(line)
+        if size >= max_chars:
+            break
+    return " ".join(lines)[-max_chars:]
+
+
+def extract_code_examples(
+    chunks: List[Document],
+    parent_ids: List[str],
+    min_chars: int = CODE_EXAMPLE_MIN_CHARS,
+    caption_max_chars: int = CODE_CAPTION_MAX_CHARS,
+) -> List[Document]:
+    """
+    Wyciąga bloki ```kodu``` z chunków jako osobne, małe dokumenty:
+    - page_content = ścieżka nagłówków + podpis (proza tuż przed kodem) + kod
+    - metadata = metadane chunka + parent_id (id chunka w głównej kolekcji)
+    Bloki krótsze niż min_chars są pomijane.
+    """
+    examples: List[Document] = []
+
+    for chunk, parent_id in zip(chunks, parent_ids):
+        prose: List[str] = []
+        code: Optional[List[str]] = None
+        position = 0
+
+        for line in chunk.page_content.splitlines():
+            if _FENCE_RE.match(line):
+                if code is None:
+                    code = []
+                    continue
+
+                body = "\n".join(code).strip()
+                if len(body) >= min_chars:
+                    headers = " > ".join(
+                        chunk.metadata[h] for h in ("h1", "h2", "h3") if chunk.metadata.get(h)
+                    )
+                    caption = _caption(prose, caption_max_chars)
+                    text = "\n".join(p for p in (headers, caption) if p)
+                    examples.append(
+                        Document(
+                            page_content=f"{text}\n\n```\n{body}\n```".lstrip(),
+                            metadata={
+                                **chunk.metadata,
+                                "parent_id": parent_id,
+                                "example_index": position,
+                            },
+                        )
+                    )
+                    position += 1
+                code = None
+                prose = []
+                continue
+
+            if code is None:
+                prose.append(line)
+            else:
+                code.append(line)
+
+    return examples
+
+
+def example_id(doc: Document) -> str:
+    """Deterministyczne id przykładu (parent_id + numer bloku w chunku)."""
+    data = f"{doc.metadata['parent_id']}#{doc.metadata['example_index']}".encode("utf-8")
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
@@ -0,0 +1,120 @@
+import re
+from typing import List
+
+from ..config import COMPACT_TABLE_MAX_ROWS
+
+
+# linie nawigacji / stopek z ReadTheDocs i artefakty trafilatury
+_BOILERPLATE_RE = re.compile(
+    r"^\s*(?:¶|previous|next|back to top|edit on github|view page source|"
+    r"built with sphinx.*|©.*|read the docs.*|[-*_=|•·]+)\s*$",
+    re.IGNORECASE,
+)
+_FENCE_RE = re.compile(r"^\s*```")
+_TABLE_SEP_RE = re.compile(r"^\s*\|?\s*:?-{3,}")
+_METHOD_BULLET_RE = re.compile(r"^\s*[-*]\s+(\.\w+\(.*\))\s*$")
+_SPACES_RE = re.compile(r"[ \t]+")
+# *valueDate* -> valueDate (kursywa z Sphinx w sygnaturach; w kodzie nie ruszamy)
+_EMPHASIS_RE = re.compile(r"(?<![\w*])\*(?!\s)([^*\n]+?)(?<!\s)\*(?![\w*])")
+_SPHINX_KIND_RE = re.compile(r"\*(class|function|method|property|attribute)\*\s*")
+
+
+def _open_parens(line: str) -> int:
+    return line.count("(") - line.count(")")
+
+
+def _collapse_table(rows: List[str], max_rows: int) -> List[str]:
+    """Nagłówek (+ separator) i max_rows wierszy; reszta jako licznik."""
+    head = rows[:2] if len(rows) > 1 and _TABLE_SEP_RE.match(rows[1]) else rows[:1]
+    body = rows[len(head):]
+    if len(body) <= max_rows:
+        return rows
+    return head + body[:max_rows] + [f"| … (+{len(body) - max_rows} rows) |"]
+
+
+def _collapse_method_bullets(bullets: List[str]) -> List[str]:
+    """'- .NPV()' x N -> jedna linia 'Methods: .NPV(), ...'."""
+    if len(bullets) < 3:
+        return [f"- {b}" for b in bullets]
+    return ["Methods: " + ", ".join(bullets)]
+
+
+def compress_chunk(text: str, table_max_rows: int = COMPACT_TABLE_MAX_ROWS) -> str:
+    """
+    Kompaktowa wersja chunka do promptu (extractive - poza etykietą 'Methods:'
+    nic nie dopisujemy):
+    - bloki kodu (```...```) bez zmian
+    - usuwa linie nawigacji / boilerplate i puste punktory
+    - długie tabele skraca do nagłówka + kilku wierszy
+    - serie punktorów z metodami ('- .NPV()') łączy w jedną linię
+    - zbija wielokrotne spacje i puste linie
+    - zdejmuje kursywę Sphinx z sygnatur (*class*ql.X(*a*) -> class ql.X(a))
+      i skleja sygnatury złamane wewnątrz nawiasu (po ',' ze spacją)
+    Treść sygnatur (nazwy, parametry, domyślne wartości) zostaje bez zmian.
+    """
+    out: List[str] = []
+    table: List[str] = []
+    bullets: List[str] = []
+    in_code = False
+    # ostatnia linia prozy ma niezamknięty '(' -> następna to ciąg sygnatury
+    in_signature = False
+
+    def flush() -> None:
+        if table:
+            out.extend(_collapse_table(table, table_max_rows))
+            table.clear()
+        if bullets:
+            out.extend(_collapse_method_bullets(bullets))
+            bullets.clear()
+
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            flush()
+            in_code = not in_code
+            in_signature = False
+            out.append(line)
+            continue
+        if in_code:
+            out.append(line)
+            continue
+
+        if line.lstrip().startswith("|") and line.count("|") >= 2:
+            if bullets:
+                flush()
+            in_signature = False
+            table.append(line.strip())
+            continue
+
+        method = _METHOD_BULLET_RE.match(line)
+        if method:
+            if table:
+                flush()
+            in_signature = False
+            bullets.append(method.group(1))
+            continue
+
+        if not line.strip():
+            in_signature = False
+            # pusta linia między punktorami metod nie przerywa serii
+            if not bullets and out and out[-1] != "":
+                flush()
+                out.append("")
+            continue
+
+        flush()
+        if _BOILERPLATE_RE.match(line):
+            continue
+
+        line = _SPHINX_KIND_RE.sub(r"\1 ", line)
+        line = _EMPHASIS_RE.sub(r"\1", line)
+        line = _SPACES_RE.sub(" ", line.strip())
+
+        # sygnatura złamana przez trafilaturę: '.impliedYield(' + 'a,' + 'b)'
+        if in_signature:
+            out[-1] += (" " if out[-1].endswith(",") else "") + line
+        else:
+            out.append(line)
+        in_signature = _open_parens(out[-1]) > 0
+
+    flush()
+    return "\n".join(out).strip()
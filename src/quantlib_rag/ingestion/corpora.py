@@ -0,0 +1,132 @@
+"""
+Rejestr nazwanych korpusów dokumentacji (federated search).
+
+Każdy korpus to katalog markdownów podzielony na N shardów; shard to zwykły
+index (Chroma + chunk store + manifest) w db/corpora/<nazwa>/shard-XXX.
+Plik źródłowy trafia zawsze do tego samego shardu (hash ścieżki),
+więc przebudowa jednego korpusu nie rusza pozostałych.
+
+Rejestr (db/corpora/corpora.json):
+    {"cpp_doxygen": {"source_dir": "...", "shards": ["db/corpora/cpp_doxygen/shard-000", ...]}}
+
+Usage:
+    python -m src.quantlib_rag.ingestion.corpora build NAME SOURCE_DIR [--shards 4]
+    python -m src.quantlib_rag.ingestion.corpora list
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..config import (
+    CORPORA_DIR,
+    CORPORA_REGISTRY,
+    DEFAULT_CORPUS,
+    INDEX_MANIFEST_NAME,
+)
+
+
+def shard_of(source: str, n_shards: int) -> int:
+    """Stabilny numer shardu dla pliku źródłowego."""
+    digest = hashlib.blake2b(Path(source).as_posix().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % n_shards
+
+
+def load_registry() -> Dict[str, Dict[str, Any]]:
+    if not CORPORA_REGISTRY.exists():
+        return {}
+    return json.loads(CORPORA_REGISTRY.read_text(encoding="utf-8"))
+
+
+def save_registry(registry: Dict[str, Dict[str, Any]]) -> None:
+    CORPORA_REGISTRY.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CORPORA_REGISTRY.with_name(CORPORA_REGISTRY.name + ".tmp")
+    tmp.write_text(json.dumps(registry, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, CORPORA_REGISTRY)
+
+
+def corpus_shards(names: Sequence[str]) -> Dict[str, Path]:
+    """
+    Shardy wskazanych korpusów: {"<korpus>:<nr>": katalog indexu}.
+    Nieznane korpusy są pomijane z ostrzeżeniem (domyślny korpus nie jest w rejestrze).
+    """
+    registry = load_registry()
+    shards: Dict[str, Path] = {}
+    for name in names:
+        if name == DEFAULT_CORPUS:
+            continue
+        entry = registry.get(name)
+        if entry is None:
+            print(f"[WARN] Unknown corpus '{name}' — build it with ingestion.corpora first.")
+            continue
+        for i, db_dir in enumerate(entry["shards"]):
+            shards[f"{name}:{i:03d}"] = Path(db_dir)
+    return shards
+
+
+def build_corpus(
+    name: str,
+    source_dir: Path,
+    n_shards: int = 1,
+    embeddings: Optional[Any] = None,
+) -> List[Path]:
+    """Buduje wszystkie shardy korpusu (jeden model embeddingów) i dopisuje go do rejestru."""
+    # import tutaj: build_index sam importuje shard_of z tego modułu
+    from .build_index import QuantLibMarkdownIndexBuilder
+
+    if name == DEFAULT_CORPUS:
+        raise ValueError(f"'{DEFAULT_CORPUS}' is the default index — build it with build_index.")
+
+    shard_dirs: List[Path] = []
+    for i in range(n_shards):
+        db_dir = CORPORA_DIR / name / f"shard-{i:03d}"
+        print(f"[INFO] Corpus '{name}': building shard {i + 1}/{n_shards} -> {db_dir}")
+        builder = QuantLibMarkdownIndexBuilder(
+            source_dir=Path(source_dir),
+            db_dir=db_dir,
+            embeddings=embeddings,
+            corpus=name,
+            shard=(i, n_shards) if n_shards > 1 else None,
+        )
+        embeddings = builder.embeddings  # jeden model dla wszystkich shardów
+        builder.run()
+        if (db_dir / INDEX_MANIFEST_NAME).exists():
+            shard_dirs.append(db_dir)
+
+    if not shard_dirs:
+        raise RuntimeError(f"Corpus '{name}': no markdown documents in {source_dir}.")
+
+    registry = load_registry()
+    registry[name] = {
+        "source_dir": str(Path(source_dir).resolve()),
+        "shards": [str(d.resolve()) for d in shard_dirs],
+    }
+    save_registry(registry)
+    return shard_dirs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage named documentation corpora (shards).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="build (or rebuild) a corpus from a markdown directory")
+    p_build.add_argument("name")
+    p_build.add_argument("source_dir", type=Path)
+    p_build.add_argument("--shards", type=int, default=1)
+
+    sub.add_parser("list", help="list registered corpora")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_corpus(args.name, args.source_dir, n_shards=args.shards)
+    else:
+        for name, entry in sorted(load_registry().items()):
+            print(f"{name}: {len(entry['shards'])} shard(s) from {entry['source_dir']}")
+
+
+if __name__ == "__main__":
+    main()
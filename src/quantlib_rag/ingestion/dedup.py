@@ -0,0 +1,161 @@
+import hashlib
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ..config import (
+    DEDUP_SHINGLE_SIZE,
+    DEDUP_NUM_PERM,
+    DEDUP_BANDS,
+    DEDUP_JACCARD_THRESHOLD,
+)
+
+
+_TOKEN_RE = re.compile(r"\w+")
+_MERSENNE_61 = np.uint64((1 << 61) - 1)
+
+
+def _hash32(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class ChunkDeduplicator:
+    """
+    Usuwa duplikaty chunków przed embedowaniem:
+    - dokładne duplikaty: hash znormalizowanej sekwencji tokenów
+    - prawie-duplikaty: MinHash + LSH (banding) na shinglach słownych,
+      kandydaci potwierdzani dokładnym Jaccardem na zbiorach shingli
+
+    Z każdej grupy zostaje jeden chunk (najdłuższy), a jego metadane
+    dostają listę wszystkich źródeł grupy.
+    """
+
+    def __init__(
+        self,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+        num_perm: int = DEDUP_NUM_PERM,
+        bands: int = DEDUP_BANDS,
+        threshold: float = DEDUP_JACCARD_THRESHOLD,
+        seed: int = 1,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = np.random.default_rng(seed)
+        # a, x < 2^32 -> iloczyn mieści się w uint64 bez przepełnienia
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_61, size=num_perm, dtype=np.uint64)
+
+    # ---------- INTERNAL UTILS ----------
+
+    def _shingles(self, tokens: List[str]) -> Set[int]:
+        n = self.shingle_size
+        if len(tokens) <= n:
+            return {_hash32(" ".join(tokens))}
+        return {_hash32(" ".join(tokens[i : i + n])) for i in range(len(tokens) - n + 1)}
+
+    def _minhash(self, shingles: Set[int]) -> np.ndarray:
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        hashed = (self._a[:, None] * x[None, :] % _MERSENNE_61 + self._b[:, None]) % _MERSENNE_61
+        return hashed.min(axis=1)
+
+    @staticmethod
+    def _find(parent: List[int], i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # ---------- GŁÓWNA METODA ----------
+
+    def deduplicate(self, chunks: List[Document]) -> Tuple[List[Document], Dict[str, Any]]:
+        """
+        Zwraca (chunki bez duplikatów, raport).
+        Raport: ile było, ile zostało, ile usunięto dokładnie / przez LSH
+        i ile znaków nie trzeba już embedować.
+        """
+        n = len(chunks)
+        parent = list(range(n))
+        exact_removed = 0
+
+        # 1) dokładne duplikaty
+        tokens = [_TOKEN_RE.findall(c.page_content.lower()) for c in chunks]
+        first_by_key: Dict[bytes, int] = {}
+        for i, toks in enumerate(tokens):
+            key = hashlib.blake2b(" ".join(toks).encode("utf-8"), digest_size=16).digest()
+            if key in first_by_key:
+                parent[i] = first_by_key[key]
+                exact_removed += 1
+            else:
+                first_by_key[key] = i
+
+        # 2) prawie-duplikaty (tylko reprezentanci dokładnych grup)
+        survivors = [i for i in range(n) if parent[i] == i and tokens[i]]
+        shingles = {i: self._shingles(tokens[i]) for i in survivors}
+
+        buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        for i in survivors:
+            signature = self._minhash(shingles[i])
+            for band in range(self.bands):
+                rows = signature[band * self.rows : (band + 1) * self.rows]
+                buckets[(band, rows.tobytes())].append(i)
+
+        near_pairs = 0
+        checked: Set[Tuple[int, int]] = set()
+        for members in buckets.values():
+            for pos, i in enumerate(members):
+                for j in members[pos + 1 :]:
+                    if (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+
+                    si, sj = shingles[i], shingles[j]
+                    jaccard = len(si & sj) / len(si | sj)
+                    if jaccard < self.threshold:
+                        continue
+
+                    ri, rj = self._find(parent, i), self._find(parent, j)
+                    if ri != rj:
+                        parent[max(ri, rj)] = min(ri, rj)
+                        near_pairs += 1
+
+        # 3) grupy -> jeden chunk z połączonymi źródłami
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for i in range(n):
+            groups[self._find(parent, i)].append(i)
+
+        kept: List[Document] = []
+        chars_removed = 0
+        for root in sorted(groups):
+            members = groups[root]
+            best = max(members, key=lambda i: len(chunks[i].page_content))
+            doc = chunks[best]
+
+            if len(members) > 1:
+                sources = sorted({
+                    os.path.basename(chunks[i].metadata.get("source", "")) for i in members
+                })
+                doc.metadata["duplicate_sources"] = ";".join(s for s in sources if s)
+                doc.metadata["duplicate_count"] = len(members)
+                chars_removed += sum(len(chunks[i].page_content) for i in members if i != best)
+
+            kept.append(doc)
+
+        report = {
+            "chunks_in": n,
+            "chunks_out": len(kept),
+            "exact_removed": exact_removed,
+            "near_removed": near_pairs,
+            "chars_removed": chars_removed,
+        }
+        return kept, report
@@ -0,0 +1,62 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+
+# te same reguły co analyze_answer_vs_context
+TOKEN_RE = re.compile(r"\w+")
+SYMBOL_RE = re.compile(r"ql\.\w+")
+
+GROUNDING_VOCAB = "grounding_vocab.json"
+GROUNDING_TOKENS = "grounding_tokens.npy"
+GROUNDING_TOKEN_OFFSETS = "grounding_token_offsets.npy"
+GROUNDING_SYMBOLS = "grounding_symbols.npy"
+GROUNDING_SYMBOL_OFFSETS = "grounding_symbol_offsets.npy"
+
+
+def text_tokens(text: str) -> Set[str]:
+    """Znormalizowane tokeny (lowercase, \\w+)."""
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+def text_symbols(text: str) -> Set[str]:
+    """Symbole API QuantLib (ql.Xyz), z zachowaniem wielkości liter."""
+    return set(SYMBOL_RE.findall(text))
+
+
+def _encode(sets: List[Set[str]]) -> tuple[List[str], np.ndarray, np.ndarray]:
+    """Zbiory -> (słownik, posortowane id per chunk sklejone w jedną tablicę, offsety n+1)."""
+    vocab: Dict[str, int] = {}
+    for items in sets:
+        for item in sorted(items):
+            vocab.setdefault(item, len(vocab))
+
+    rows = [np.sort(np.fromiter((vocab[i] for i in items), dtype=np.int32, count=len(items))) for items in sets]
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(r) for r in rows])
+    flat = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    return list(vocab), flat.astype(np.int32), offsets
+
+
+def write_grounding_sets(store_dir: Path, texts: Iterable[str]) -> None:
+    """
+    Zbiory tokenów i symboli ql.* dla każdego chunka (build time),
+    zapisane w chunk store jako słownik + tablice id w formacie CSR.
+    """
+    store_dir = Path(store_dir)
+    texts = list(texts)
+
+    token_vocab, tokens, token_offsets = _encode([text_tokens(t or "") for t in texts])
+    symbol_vocab, symbols, symbol_offsets = _encode([text_symbols(t or "") for t in texts])
+
+    np.save(store_dir / GROUNDING_TOKENS, tokens)
+    np.save(store_dir / GROUNDING_TOKEN_OFFSETS, token_offsets)
+    np.save(store_dir / GROUNDING_SYMBOLS, symbols)
+    np.save(store_dir / GROUNDING_SYMBOL_OFFSETS, symbol_offsets)
+    (store_dir / GROUNDING_VOCAB).write_text(
+        json.dumps({"tokens": token_vocab, "symbols": symbol_vocab}, ensure_ascii=False),
+        encoding="utf-8",
+    )
@@ -0,0 +1,274 @@
+"""
+Auto-tuner parametrów HNSW dla kolekcji Chroma.
+
+Dla każdej kombinacji (space, M, construction_ef, search_ef) z siatki:
+- buduje tymczasową kolekcję z wektorów istniejącego indexu
+- mierzy recall@k względem dokładnego brute-force (iloczyn skalarny,
+  embeddingi są znormalizowane), latencję pojedynczego zapytania i rozmiar HNSW
+Domyślne ustawienia Chroma (settings = {}) też są kandydatem. Wybiera najszybszą
+konfigurację z recall >= target (a jeśli żadna nie spełnia - tę z najwyższym recall),
+więc nigdy nie zapisze ustawień gorszych od domyślnych, i zapisuje ją w manifest.json
+indexu, sekcja "hnsw" ({} = zostają domyślne).
+QuantLibMarkdownIndexBuilder używa tych ustawień przy następnej budowie.
+
+Zapytania to wektory chunków z szumem (jak w benchmarks/), więc tuner
+nie ładuje bge-m3.
+
+Usage:
+    python -m src.quantlib_rag.ingestion.hnsw_tuner [--db-dir ...] [--dry-run]
+"""
+
+import argparse
+import itertools
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import chromadb
+import numpy as np
+
+from ..config import (
+    CHROMA_BGE_MD,
+    CHROMA_COLLECTION,
+    HNSW_TUNE_SPACES,
+    HNSW_TUNE_M,
+    HNSW_TUNE_CONSTRUCTION_EF,
+    HNSW_TUNE_SEARCH_EF,
+    HNSW_TUNE_K,
+    HNSW_TUNE_TARGET_RECALL,
+    HNSW_TUNE_QUERIES,
+    HNSW_TUNE_NOISE,
+)
+from .manifest import load_manifest, write_manifest
+
+
+_BATCH = 1000
+_TUNE_COLLECTION = "hnsw_tune"
+
+
+def hnsw_metadata(settings: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Ustawienia z manifestu -> metadata kolekcji Chroma ('hnsw:*')."""
+    if not settings:
+        return None
+    return {f"hnsw:{key}": value for key, value in settings.items()}
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class HnswTuner:
+    """
+    Strojenie HNSW na wektorach jednej kolekcji istniejącego indexu.
+
+    run() -> raport (lista kandydatów + wybrane ustawienia),
+    write_to_manifest(report) -> zapis sekcji "hnsw" w manifest.json.
+    """
+
+    def __init__(
+        self,
+        db_dir: Optional[Path] = None,
+        collection_name: str = CHROMA_COLLECTION,
+        k: int = HNSW_TUNE_K,
+        n_queries: int = HNSW_TUNE_QUERIES,
+        noise: float = HNSW_TUNE_NOISE,
+        target_recall: float = HNSW_TUNE_TARGET_RECALL,
+        seed: int = 0,
+    ) -> None:
+        self.db_dir = Path(db_dir or CHROMA_BGE_MD)
+        self.collection_name = collection_name
+        self.k = k
+        self.n_queries = n_queries
+        self.noise = noise
+        self.target_recall = target_recall
+        self.rng = np.random.default_rng(seed)
+
+    # ---------- DANE ----------
+
+    def load_vectors(self) -> np.ndarray:
+        """Wszystkie wektory kolekcji jako (n, dim) float32."""
+        client = chromadb.PersistentClient(path=str(self.db_dir))
+        collection = client.get_collection(self.collection_name)
+
+        parts: List[np.ndarray] = []
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings"], limit=_BATCH, offset=offset)
+            if not len(page["ids"]):
+                break
+            parts.append(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page["ids"])
+
+        if not parts:
+            raise RuntimeError(f"Collection '{self.collection_name}' in {self.db_dir} is empty.")
+        return np.vstack(parts)
+
+    def make_queries(self, vectors: np.ndarray) -> np.ndarray:
+        """Losowe wektory chunków + szum gaussowski, znormalizowane."""
+        rows = self.rng.choice(len(vectors), size=min(self.n_queries, len(vectors)), replace=False)
+        queries = vectors[rows] + self.rng.normal(0.0, self.noise, (len(rows), vectors.shape[1]))
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        return queries.astype(np.float32)
+
+    @staticmethod
+    def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+        """Dokładne top-k (brute force) - (n_queries, k) indeksy wierszy."""
+        scores = queries @ vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    # ---------- KANDYDACI ----------
+
+    @staticmethod
+    def candidates(
+        spaces: Sequence[str] = HNSW_TUNE_SPACES,
+        ms: Sequence[int] = HNSW_TUNE_M,
+        construction_efs: Sequence[int] = HNSW_TUNE_CONSTRUCTION_EF,
+        search_efs: Sequence[int] = HNSW_TUNE_SEARCH_EF,
+    ) -> List[Dict[str, Any]]:
+        return [
+            {"space": space, "M": m, "construction_ef": c_ef, "search_ef": s_ef}
+            for space, m, c_ef, s_ef in itertools.product(spaces, ms, construction_efs, search_efs)
+        ]
+
+    def evaluate(
+        self,
+        settings: Dict[str, Any],
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        truth: np.ndarray,
+        work_dir: Path,
+    ) -> Dict[str, Any]:
+        """Buduje kolekcję z danymi ustawieniami i mierzy recall / latencję / rozmiar."""
+        persist_dir = Path(tempfile.mkdtemp(dir=work_dir))
+        client = chromadb.PersistentClient(path=str(persist_dir))
+        collection = client.create_collection(_TUNE_COLLECTION, metadata=hnsw_metadata(settings))
+
+        ids = [str(i) for i in range(len(vectors))]
+        started = time.perf_counter()
+        for start in range(0, len(vectors), _BATCH):
+            collection.add(ids=ids[start : start + _BATCH], embeddings=vectors[start : start + _BATCH])
+        build_seconds = time.perf_counter() - started
+
+        # pojedyncze zapytania, jak w serwowaniu
+        latencies: List[float] = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            res = collection.query(query_embeddings=[query], n_results=self.k, include=[])
+            latencies.append(time.perf_counter() - started)
+            hits += len({int(i) for i in res["ids"][0]} & set(expected.tolist()))
+
+        segment_bytes = sum(_dir_size(p) for p in persist_dir.iterdir() if p.is_dir())
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+        latencies_ms = np.asarray(latencies) * 1000.0
+        return {
+            "settings": settings,
+            "recall": round(hits / truth.size, 4),
+            "latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "latency_ms_p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "build_seconds": round(build_seconds, 3),
+            "index_bytes": segment_bytes,
+        }
+
+    @staticmethod
+    def choose(results: List[Dict[str, Any]], target_recall: float) -> Dict[str, Any]:
+        """Najszybsza konfiguracja z recall >= target; inaczej najwyższy recall."""
+        passing = [r for r in results if r["recall"] >= target_recall]
+        if passing:
+            return min(passing, key=lambda r: (r["latency_ms_p50"], r["index_bytes"]))
+        return max(results, key=lambda r: (r["recall"], -r["latency_ms_p50"]))
+
+    # ---------- PIPELINE ----------
+
+    def run(self, candidates: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        vectors = self.load_vectors()
+        # mała kolekcja: k nie większe niż liczba wektorów
+        self.k = min(self.k, len(vectors))
+        queries = self.make_queries(vectors)
+        truth = self.exact_top_k(vectors, queries, self.k)
+
+        candidates = candidates or self.candidates()
+        print(
+            f"[INFO] HNSW tuning: {len(vectors)} vectors, {len(queries)} queries, "
+            f"recall@{self.k}, {len(candidates)} candidates"
+        )
+
+        results: List[Dict[str, Any]] = []
+        with tempfile.TemporaryDirectory(prefix="hnsw_tune_") as work_dir:
+            # punkt odniesienia: domyślne ustawienia Chroma
+            baseline = self.evaluate({}, vectors, queries, truth, Path(work_dir))
+            for settings in candidates:
+                result = self.evaluate(settings, vectors, queries, truth, Path(work_dir))
+                results.append(result)
+                print(
+                    f"[INFO]   {settings}: recall={result['recall']:.4f} "
+                    f"p50={result['latency_ms_p50']:.2f}ms p95={result['latency_ms_p95']:.2f}ms "
+                    f"size={result['index_bytes'] / 1024:.0f}KB"
+                )
+
+        # domyślne Chroma też mogą wygrać - wtedy settings = {} i build zostaje przy nich
+        chosen = self.choose([baseline] + results, self.target_recall)
+        print(
+            f"[INFO] Chroma defaults: recall={baseline['recall']:.4f} "
+            f"p50={baseline['latency_ms_p50']:.2f}ms"
+        )
+        print(
+            f"[INFO] Chosen: {chosen['settings'] or 'Chroma defaults'} recall={chosen['recall']:.4f} "
+            f"p50={chosen['latency_ms_p50']:.2f}ms"
+        )
+
+        return {
+            "settings": chosen["settings"],
+            "tuned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "collection": self.collection_name,
+            "k": self.k,
+            "target_recall": self.target_recall,
+            "n_vectors": len(vectors),
+            "n_queries": len(queries),
+            "chosen": chosen,
+            "baseline": baseline,
+            "candidates": results,
+        }
+
+    def write_to_manifest(self, report: Dict[str, Any]) -> Path:
+        """Zapisuje raport (z wybranymi ustawieniami) w manifeście indexu."""
+        manifest = load_manifest(self.db_dir)
+        if manifest is None:
+            print("[WARN] Index has no manifest — writing HNSW settings only; rebuild to record the rest.")
+            manifest = {}
+        manifest["hnsw"] = report
+        path = write_manifest(self.db_dir, manifest)
+        print(f"[INFO] HNSW settings written to {path} — rebuild the index to apply them.")
+        return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tune Chroma HNSW settings for the QuantLib index.")
+    parser.add_argument("--db-dir", type=Path, default=CHROMA_BGE_MD)
+    parser.add_argument("--collection", default=CHROMA_COLLECTION)
+    parser.add_argument("--k", type=int, default=HNSW_TUNE_K)
+    parser.add_argument("--queries", type=int, default=HNSW_TUNE_QUERIES)
+    parser.add_argument("--target-recall", type=float, default=HNSW_TUNE_TARGET_RECALL)
+    parser.add_argument("--dry-run", action="store_true", help="measure only, do not touch the manifest")
+    args = parser.parse_args()
+
+    tuner = HnswTuner(
+        db_dir=args.db_dir,
+        collection_name=args.collection,
+        k=args.k,
+        n_queries=args.queries,
+        target_recall=args.target_recall,
+    )
+    report = tuner.run()
+    if not args.dry_run:
+        tuner.write_to_manifest(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Przenośne snapshoty zbudowanego indexu Chroma.
+
+Jeden plik .qlsnap zawiera:
+- nagłówek JSON (manifest: model, konfiguracja, hashe źródeł + layout sekcji)
+- dla każdej kolekcji: macierz wektorów float32 (wyrównaną do 64 B, do mmap)
+  oraz rekordy (id, tekst chunka, metadane) jako JSON lines
+- sha256 całego payloadu, sprawdzany przed odtworzeniem
+
+Layout pliku:
+    MAGIC (8 B) | format version (u32) | reserved (u32) | header len (u64)
+    | header JSON | padding do 64 B | payload (sekcje)
+
+Usage:
+    python -m src.quantlib_rag.ingestion.index_snapshot export [out.qlsnap]
+    python -m src.quantlib_rag.ingestion.index_snapshot restore [in.qlsnap]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+
+from ..config import (
+    CHROMA_BGE_MD,
+    EMBEDDING_MODEL,
+    INDEX_SNAPSHOT,
+    SNAPSHOT_FORMAT_VERSION,
+)
+from ..rag.chunk_store import ChunkStore
+from .manifest import build_index_manifest, check_manifest, load_manifest, write_manifest
+
+
+MAGIC = b"QLSNAP\x00\x00"
+_PREFIX = struct.Struct("<8sIIQ")
+_ALIGN = 64
+_BATCH = 1000
+
+
+class SnapshotError(RuntimeError):
+    """Uszkodzony lub niekompatybilny plik snapshotu."""
+
+
+class SnapshotMismatchError(SnapshotError):
+    """Manifest snapshotu nie zgadza się z bieżącą konfiguracją."""
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _collection_names(client: Any) -> List[str]:
+    # chromadb < 0.6 zwraca obiekty Collection, nowsze - same nazwy
+    return sorted(c if isinstance(c, str) else c.name for c in client.list_collections())
+
+
+def _read_collection(collection: Any) -> Tuple[List[str], np.ndarray, List[str], List[Dict]]:
+    """Czyta całą kolekcję stronami: ids, wektory, teksty, metadane."""
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    documents: List[str] = []
+    metadatas: List[Dict] = []
+
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=_BATCH,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        documents.extend(page["documents"])
+        metadatas.extend(m or {} for m in page["metadatas"])
+        offset += len(page["ids"])
+
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    return ids, matrix, documents, metadatas
+
+
+class QuantLibIndexSnapshot:
+    """
+    Snapshot indexu w jednym, wersjonowanym pliku z sumą kontrolną.
+
+    - export(...)  -> zrzut katalogu Chroma do pliku .qlsnap
+    - open(...)    -> odczyt nagłówka (wektory opcjonalnie przez mmap)
+    - restore(...) -> odtworzenie katalogu Chroma (+ chunk store) bez ponownego embedowania
+    """
+
+    def __init__(self, path: Path, header: Dict[str, Any], payload_start: int, mmap: bool) -> None:
+        self.path = Path(path)
+        self.header = header
+        self.payload_start = payload_start
+        self.mmap = mmap
+
+    # ---------- EXPORT ----------
+
+    @classmethod
+    def export(
+        cls,
+        db_dir: Optional[Path] = None,
+        out_path: Optional[Path] = None,
+    ) -> Path:
+        """Zrzuca wszystkie kolekcje z katalogu Chroma do jednego pliku."""
+        db_dir = Path(db_dir or CHROMA_BGE_MD)
+        out_path = Path(out_path or INDEX_SNAPSHOT)
+
+        if not db_dir.exists():
+            raise SnapshotError(f"Index directory not found: {db_dir}")
+
+        manifest = load_manifest(db_dir) or build_index_manifest()
+        client = chromadb.PersistentClient(path=str(db_dir))
+
+        sections: List[bytes] = []
+        collections: Dict[str, Any] = {}
+        offset = 0
+
+        for name in _collection_names(client):
+            collection = client.get_collection(name)
+            ids, matrix, documents, metadatas = _read_collection(collection)
+
+            vec_bytes = np.ascontiguousarray(matrix, dtype=np.float32).tobytes()
+            rec_bytes = "".join(
+                json.dumps({"id": i, "document": d, "metadata": m}, ensure_ascii=False) + "\n"
+                for i, d, m in zip(ids, documents, metadatas)
+            ).encode("utf-8")
+
+            entry: Dict[str, Any] = {
+                "metadata": collection.metadata or {},
+                "count": len(ids),
+                "dim": int(matrix.shape[1]) if matrix.size else 0,
+            }
+            for key, blob in (("vectors", vec_bytes), ("records", rec_bytes)):
+                padded = _align(len(blob))
+                entry[key] = {"offset": offset, "nbytes": len(blob)}
+                sections.append(blob + b"\x00" * (padded - len(blob)))
+                offset += padded
+
+            collections[name] = entry
+            print(f"[INFO] Snapshot: collection '{name}' -> {len(ids)} chunks")
+
+        digest = hashlib.sha256()
+        for blob in sections:
+            digest.update(blob)
+
+        header = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "snapshot_id": digest.hexdigest()[:16],
+            "manifest": manifest,
+            "collections": collections,
+            "payload_sha256": digest.hexdigest(),
+            "payload_nbytes": offset,
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        prefix = _PREFIX.pack(MAGIC, SNAPSHOT_FORMAT_VERSION, 0, len(header_bytes))
+        head = prefix + header_bytes
+        head += b"\x00" * (_align(len(head)) - len(head))
+
+        # zapis do pliku tymczasowego + atomowy rename
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = out_path.with_name(out_path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            f.write(head)
+            for blob in sections:
+                f.write(blob)
+        os.replace(tmp_path, out_path)
+
+        print(f"[INFO] Snapshot {header['snapshot_id']} written to: {out_path}")
+        return out_path
+
+    # ---------- OPEN ----------
+
+    @classmethod
+    def open(cls, path: Optional[Path] = None, mmap: bool = True, verify: bool = True) -> "QuantLibIndexSnapshot":
+        """Czyta nagłówek snapshotu i (domyślnie) sprawdza sumę kontrolną."""
+        path = Path(path or INDEX_SNAPSHOT)
+        if not path.exists():
+            raise SnapshotError(f"Snapshot not found: {path}")
+
+        with path.open("rb") as f:
+            raw = f.read(_PREFIX.size)
+            if len(raw) < _PREFIX.size:
+                raise SnapshotError(f"Truncated snapshot: {path}")
+            magic, version, _, header_len = _PREFIX.unpack(raw)
+            if magic != MAGIC:
+                raise SnapshotError(f"Not a QuantLib index snapshot: {path}")
+            if version != SNAPSHOT_FORMAT_VERSION:
+                raise SnapshotError(
+                    f"Unsupported snapshot format version {version} "
+                    f"(expected {SNAPSHOT_FORMAT_VERSION})"
+                )
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+        snapshot = cls(path, header, _align(_PREFIX.size + header_len), mmap)
+        if verify:
+            snapshot.verify_checksum()
+        return snapshot
+
+    def verify_checksum(self) -> None:
+        """Liczy sha256 payloadu i porównuje z nagłówkiem."""
+        digest = hashlib.sha256()
+        remaining = self.header["payload_nbytes"]
+        with self.path.open("rb") as f:
+            f.seek(self.payload_start)
+            while remaining > 0:
+                block = f.read(min(remaining, 1 << 20))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+
+        if remaining or digest.hexdigest() != self.header["payload_sha256"]:
+            raise SnapshotError(f"Checksum mismatch, snapshot is corrupted: {self.path}")
+
+    # ---------- ACCESS ----------
+
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        return self.header["manifest"]
+
+    @property
+    def snapshot_id(self) -> str:
+        return self.header["snapshot_id"]
+
+    @property
+    def collection_names(self) -> List[str]:
+        return sorted(self.header["collections"])
+
+    def vectors(self, name: str) -> np.ndarray:
+        """Macierz (count, dim) float32; przy mmap=True bez kopiowania do RAM."""
+        entry = self.header["collections"][name]
+        shape = (entry["count"], entry["dim"])
+        if not entry["count"]:
+            return np.zeros(shape, dtype=np.float32)
+
+        offset = self.payload_start + entry["vectors"]["offset"]
+        if self.mmap:
+            return np.memmap(self.path, dtype=np.float32, mode="r", offset=offset, shape=shape)
+
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            return np.fromfile(f, dtype=np.float32, count=shape[0] * shape[1]).reshape(shape)
+
+    def records(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Rekordy {id, document, metadata} w kolejności wierszy macierzy wektorów."""
+        entry = self.header["collections"][name]["records"]
+        with self.path.open("rb") as f:
+            f.seek(self.payload_start + entry["offset"])
+            blob = f.read(entry["nbytes"])
+        # dzielimy bajty po b"\n" - str.splitlines() tnie też po U+0085/U+2028/U+2029,
+        # które json.dumps(ensure_ascii=False) zostawia w tekście chunków
+        for line in blob.split(b"\n"):
+            if line:
+                yield json.loads(line.decode("utf-8"))
+
+    # ---------- RESTORE ----------
+
+    def check(self, model_name: str = EMBEDDING_MODEL, source_dir: Optional[Path] = None) -> List[str]:
+        """Rozbieżności manifestu względem bieżącej konfiguracji."""
+        return check_manifest(self.manifest, model_name=model_name, source_dir=source_dir)
+
+    def restore(
+        self,
+        db_dir: Optional[Path] = None,
+        overwrite: bool = False,
+        allow_mismatch: bool = False,
+    ) -> Path:
+        """
+        Odtwarza katalog Chroma z zapisanych wektorów (bez embedowania).
+        Niezgodny manifest -> SnapshotMismatchError, zanim cokolwiek zapiszemy.
+        """
+        db_dir = Path(db_dir or CHROMA_BGE_MD)
+
+        problems = self.check()
+        if problems and not allow_mismatch:
+            raise SnapshotMismatchError(
+                "Snapshot manifest does not match current configuration:\n  - "
+                + "\n  - ".join(problems)
+            )
+        for problem in problems:
+            print(f"[WARN] Snapshot mismatch ignored: {problem}")
+
+        if db_dir.exists() and any(db_dir.iterdir()) and not overwrite:
+            raise SnapshotError(f"Target index directory is not empty: {db_dir}")
+
+        # odtwarzamy obok i podmieniamy katalog na końcu: przerwany restore
+        # (zły rekord, pełny dysk, kill) nie zostawi półpełnego indexu w db_dir
+        tmp_dir = db_dir.with_name(f".{db_dir.name}.restore-{os.getpid()}")
+        old_dir = db_dir.with_name(f".{db_dir.name}.old-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            self._restore_into(tmp_dir)
+            if db_dir.exists():
+                os.replace(db_dir, old_dir)
+            os.replace(tmp_dir, db_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        print(f"[INFO] Snapshot {self.snapshot_id} restored into: {db_dir}")
+        return db_dir
+
+    def _restore_into(self, db_dir: Path) -> None:
+        """Kolekcje, chunk store i manifest w (pustym) katalogu db_dir."""
+        db_dir.mkdir(parents=True)
+        client = chromadb.PersistentClient(path=str(db_dir))
+        try:
+            for name in self.collection_names:
+                entry = self.header["collections"][name]
+                collection = client.get_or_create_collection(name, metadata=entry["metadata"] or None)
+                matrix = self.vectors(name)
+                records = list(self.records(name))
+
+                for start in range(0, len(records), _BATCH):
+                    batch = records[start : start + _BATCH]
+                    collection.add(
+                        ids=[r["id"] for r in batch],
+                        embeddings=np.asarray(matrix[start : start + len(batch)]).tolist(),
+                        documents=[r["document"] for r in batch],
+                        metadatas=[r["metadata"] or None for r in batch],
+                    )
+                ChunkStore.write(
+                    ChunkStore.path_for(db_dir, name),
+                    ids=[r["id"] for r in records],
+                    texts=[r["document"] for r in records],
+                    metadatas=[r["metadata"] for r in records],
+                )
+                print(f"[INFO] Restored collection '{name}' ({len(records)} chunks)")
+        finally:
+            # katalog zaraz zmieni nazwę - Chroma nie może go trzymać otwartego
+            client.close()
+
+        write_manifest(db_dir, dict(self.manifest, snapshot_id=self.snapshot_id))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export / restore QuantLib index snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="dump the Chroma index into a .qlsnap file")
+    p_export.add_argument("path", nargs="?", type=Path, default=INDEX_SNAPSHOT)
+    p_export.add_argument("--db-dir", type=Path, default=CHROMA_BGE_MD)
+
+    p_restore = sub.add_parser("restore", help="rebuild the Chroma index from a .qlsnap file")
+    p_restore.add_argument("path", nargs="?", type=Path, default=INDEX_SNAPSHOT)
+    p_restore.add_argument("--db-dir", type=Path, default=CHROMA_BGE_MD)
+    p_restore.add_argument("--overwrite", action="store_true")
+    p_restore.add_argument("--allow-mismatch", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        QuantLibIndexSnapshot.export(db_dir=args.db_dir, out_path=args.path)
+    else:
+        QuantLibIndexSnapshot.open(args.path).restore(
+            db_dir=args.db_dir,
+            overwrite=args.overwrite,
+            allow_mismatch=args.allow_mismatch,
+        )
+
+
+if __name__ == "__main__":
+    main()
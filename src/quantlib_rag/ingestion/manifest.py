@@ -0,0 +1,117 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..config import (
+    MD_DIR,
+    EMBEDDING_MODEL,
+    BGE_QUERY_INSTRUCTION,
+    MARKDOWN_HEADERS,
+    INDEX_MANIFEST_NAME,
+)
+
+
+# ---------- HASHE ŹRÓDEŁ ----------
+
+def sha256_file(path: Path, block_size: int = 1 << 20) -> str:
+    """Zwraca sha256 (hex) pliku, czytanego blokami."""
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compute_source_hashes(source_dir: Optional[Path] = None) -> Dict[str, str]:
+    """
+    Hashe wszystkich .md w katalogu źródłowym:
+    {ścieżka względna: sha256}. Pusty dict, jeśli katalogu nie ma.
+    """
+    source_dir = Path(source_dir or MD_DIR)
+    if not source_dir.exists():
+        return {}
+
+    return {
+        p.relative_to(source_dir).as_posix(): sha256_file(p)
+        for p in sorted(source_dir.glob("**/*.md"))
+    }
+
+
+# ---------- MANIFEST ----------
+
+def build_index_manifest(
+    source_dir: Optional[Path] = None,
+    model_name: str = EMBEDDING_MODEL,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Opis zbudowanego indexu:
+    - model embeddingów i instrukcja zapytań
+    - konfiguracja chunkowania
+    - hashe plików źródłowych
+    """
+    manifest: Dict[str, Any] = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "embedding_model": model_name,
+        "config": {
+            "normalize_embeddings": True,
+            "query_instruction": BGE_QUERY_INSTRUCTION,
+            "markdown_headers": [list(h) for h in MARKDOWN_HEADERS],
+        },
+        "source_hashes": compute_source_hashes(source_dir),
+    }
+    if extra:
+        manifest.update(extra)
+    return manifest
+
+
+def write_manifest(db_dir: Path, manifest: Dict[str, Any]) -> Path:
+    """Zapisuje manifest jako JSON w katalogu indexu."""
+    db_dir = Path(db_dir)
+    db_dir.mkdir(parents=True, exist_ok=True)
+    path = db_dir / INDEX_MANIFEST_NAME
+    path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    return path
+
+
+def load_manifest(db_dir: Path) -> Optional[Dict[str, Any]]:
+    """Wczytuje manifest z katalogu indexu albo None, jeśli go nie ma."""
+    path = Path(db_dir) / INDEX_MANIFEST_NAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def check_manifest(
+    manifest: Dict[str, Any],
+    model_name: str = EMBEDDING_MODEL,
+    source_dir: Optional[Path] = None,
+) -> List[str]:
+    """
+    Porównuje manifest z bieżącą konfiguracją.
+    Zwraca listę rozbieżności (pusta lista = zgodny).
+
+    Hashe źródeł sprawdzamy tylko wtedy, gdy markdowny są na dysku
+    (świeży kontener może serwować index bez docs).
+    """
+    problems: List[str] = []
+    expected = build_index_manifest(source_dir=source_dir, model_name=model_name)
+
+    if manifest.get("embedding_model") != expected["embedding_model"]:
+        problems.append(
+            f"embedding_model: {manifest.get('embedding_model')!r} "
+            f"!= {expected['embedding_model']!r}"
+        )
+
+    config = manifest.get("config", {})
+    for key, value in expected["config"].items():
+        if config.get(key) != value:
+            problems.append(f"config.{key}: {config.get(key)!r} != {value!r}")
+
+    current_hashes = expected["source_hashes"]
+    if current_hashes and manifest.get("source_hashes") != current_hashes:
+        problems.append("source_hashes: markdown docs differ from the indexed ones")
+
+    return problems
@@ -0,0 +1,250 @@
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+from ..config import CHUNK_STORE_DIRNAME, CHROMA_COLLECTION
+from ..ingestion.compress import compress_chunk
+from ..ingestion.grounding_sets import write_grounding_sets
+
+
+_CORPUS = "corpus.txt"
+_OFFSETS = "offsets.npy"
+_META_INDEX = "meta_index.npy"
+_META = "meta.json"
+_IDS = "ids.json"
+_COMPACT = "compact.txt"
+_COMPACT_OFFSETS = "compact_offsets.npy"
+
+
+class ChunkHandle:
+    """
+    Lekki uchwyt na chunk w ChunkStore (zamiast pełnego Document).
+
+    Tekst jest wycinany z zmapowanego korpusu dopiero przy odczycie,
+    więc context (800 znaków) i preview (300 znaków) nie dekodują całego chunka.
+    Udostępnia page_content / metadata, jak Document (duck typing).
+    """
+
+    __slots__ = ("_store", "row")
+
+    def __init__(self, store: "ChunkStore", row: int) -> None:
+        self._store = store
+        self.row = row
+
+    @property
+    def id(self) -> str:
+        return self._store.ids[self.row]
+
+    @property
+    def metadata(self) -> Mapping[str, Any]:
+        return self._store.metadata(self.row)
+
+    @property
+    def page_content(self) -> str:
+        return self._store.text(self.row)
+
+    def text(self, max_chars: Optional[int] = None) -> str:
+        return self._store.text(self.row, max_chars=max_chars)
+
+    def compact_text(self, max_chars: Optional[int] = None) -> str:
+        return self._store.compact_text(self.row, max_chars=max_chars)
+
+    def __repr__(self) -> str:
+        return f"ChunkHandle(id={self.id!r}, row={self.row})"
+
+
+class ChunkStore:
+    """
+    Kompaktowy magazyn tekstów chunków dla jednej kolekcji:
+    - corpus.txt      -> wszystkie teksty jako jeden ciągły UTF-8 (mmap)
+    - offsets.npy     -> (n, 2) int64: [offset bajtowy, długość w bajtach]
+    - meta_index.npy  -> (n,) int32: indeks do tabeli metadanych
+    - meta.json       -> unikalne (internowane) słowniki metadanych
+    - ids.json        -> id chunków (takie same jak w Chroma), w kolejności wierszy
+    - compact.txt + compact_offsets.npy -> wersja kompaktowa do promptu
+      (compress_chunk, liczona przy zapisie store = build time)
+    - grounding_*     -> zbiory tokenów / symboli ql.* per chunk (BatchGroundingChecker)
+    """
+
+    def __init__(self, store_dir: Path) -> None:
+        self.store_dir = Path(store_dir)
+
+        self.ids: List[str] = json.loads((self.store_dir / _IDS).read_text(encoding="utf-8"))
+        self.row_by_id: Dict[str, int] = {cid: row for row, cid in enumerate(self.ids)}
+
+        self.offsets = np.load(self.store_dir / _OFFSETS, mmap_mode="r")
+        self.meta_index = np.load(self.store_dir / _META_INDEX, mmap_mode="r")
+        self._meta = [
+            MappingProxyType(m)
+            for m in json.loads((self.store_dir / _META).read_text(encoding="utf-8"))
+        ]
+
+        self._files = []
+        self._corpus = self._map(self.store_dir / _CORPUS)
+
+        # store sprzed wersji kompaktowej -> compact_text zwraca pełny tekst
+        self.compact_offsets = None
+        self._compact = None
+        if (self.store_dir / _COMPACT_OFFSETS).exists():
+            self.compact_offsets = np.load(self.store_dir / _COMPACT_OFFSETS, mmap_mode="r")
+            self._compact = self._map(self.store_dir / _COMPACT)
+
+    def _map(self, path: Path) -> mmap.mmap | bytes:
+        f = path.open("rb")
+        self._files.append(f)
+        if not path.stat().st_size:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # ---------- ZAPIS ----------
+
+    @staticmethod
+    def write(
+        store_dir: Path,
+        ids: Iterable[str],
+        texts: Iterable[str],
+        metadatas: Iterable[Optional[Dict[str, Any]]],
+        compact_texts: Optional[Iterable[str]] = None,
+    ) -> Path:
+        """
+        Zapisuje chunki do katalogu store_dir (nadpisuje istniejące pliki).
+        Bez compact_texts wersja kompaktowa jest liczona tutaj (compress_chunk).
+
+        Pliki powstają w katalogu tymczasowym obok i są podmieniane przez os.replace:
+        serwer z tym store zmapowanym (mmap) czyta dalej stare pliki (nowy inode),
+        zamiast dostać SIGBUS na obciętym corpus.txt.
+        """
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = store_dir.with_name(f".{store_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir()
+
+        texts = list(texts)
+        if compact_texts is None:
+            compact_texts = [compress_chunk(t or "") for t in texts]
+
+        try:
+            offsets = ChunkStore._write_corpus(tmp_dir / _CORPUS, texts)
+            compact_offsets = ChunkStore._write_corpus(tmp_dir / _COMPACT, compact_texts)
+
+            id_list: List[str] = []
+            meta_index: List[int] = []
+            meta_table: List[Dict[str, Any]] = []
+            meta_rows: Dict[str, int] = {}
+            for cid, meta in zip(ids, metadatas):
+                key = json.dumps(meta or {}, sort_keys=True, ensure_ascii=False)
+                if key not in meta_rows:
+                    meta_rows[key] = len(meta_table)
+                    meta_table.append(meta or {})
+                meta_index.append(meta_rows[key])
+                id_list.append(cid)
+
+            np.save(tmp_dir / _OFFSETS, offsets)
+            np.save(tmp_dir / _COMPACT_OFFSETS, compact_offsets)
+            np.save(tmp_dir / _META_INDEX, np.asarray(meta_index, dtype=np.int32))
+            (tmp_dir / _META).write_text(json.dumps(meta_table, ensure_ascii=False), encoding="utf-8")
+            (tmp_dir / _IDS).write_text(json.dumps(id_list), encoding="utf-8")
+            write_grounding_sets(tmp_dir, texts)
+
+            # ids.json na końcu: open_if_exists widzi nowy store dopiero z kompletem plików
+            for path in sorted(tmp_dir.iterdir(), key=lambda p: p.name == _IDS):
+                os.replace(path, store_dir / path.name)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        size = int(offsets[:, 1].sum())
+        compact_size = int(compact_offsets[:, 1].sum())
+        print(
+            f"[INFO] Chunk store: {len(id_list)} chunks, {size} bytes "
+            f"(compact: {compact_size}), {len(meta_table)} unique metadata -> {store_dir}"
+        )
+        return store_dir
+
+    @staticmethod
+    def _write_corpus(path: Path, texts: Iterable[str]) -> np.ndarray:
+        """Teksty jeden za drugim jako UTF-8; zwraca (n, 2) [offset, długość]."""
+        offsets: List[List[int]] = []
+        position = 0
+        with path.open("wb") as f:
+            for text in texts:
+                data = (text or "").encode("utf-8")
+                f.write(data)
+                offsets.append([position, len(data)])
+                position += len(data)
+        return np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+
+    @classmethod
+    def write_from_collection(cls, store_dir: Path, collection: Any, batch_size: int = 1000) -> Path:
+        """Buduje store z istniejącej kolekcji Chroma (np. index sprzed tej zmiany)."""
+        ids: List[str] = []
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            metadatas.extend(page["metadatas"])
+            offset += len(page["ids"])
+
+        return cls.write(store_dir, ids, texts, metadatas)
+
+    # ---------- ODCZYT ----------
+
+    @staticmethod
+    def path_for(db_dir: Path, collection_name: str = CHROMA_COLLECTION) -> Path:
+        return Path(db_dir) / CHUNK_STORE_DIRNAME / collection_name
+
+    @classmethod
+    def open_if_exists(cls, db_dir: Path, collection_name: str = CHROMA_COLLECTION) -> Optional["ChunkStore"]:
+        store_dir = cls.path_for(db_dir, collection_name)
+        if not (store_dir / _IDS).exists():
+            return None
+        return cls(store_dir)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _slice(corpus: mmap.mmap | bytes, offsets: np.ndarray, row: int, max_chars: Optional[int]) -> str:
+        start, length = (int(v) for v in offsets[row])
+        if max_chars is not None:
+            # UTF-8: max 4 bajty na znak; ucięty znak na końcu pomijamy
+            length = min(length, max_chars * 4)
+            return corpus[start : start + length].decode("utf-8", errors="ignore")[:max_chars]
+        return corpus[start : start + length].decode("utf-8")
+
+    def text(self, row: int, max_chars: Optional[int] = None) -> str:
+        return self._slice(self._corpus, self.offsets, row, max_chars)
+
+    def compact_text(self, row: int, max_chars: Optional[int] = None) -> str:
+        if self._compact is None:
+            return self.text(row, max_chars=max_chars)
+        return self._slice(self._compact, self.compact_offsets, row, max_chars)
+
+    def metadata(self, row: int) -> Mapping[str, Any]:
+        return self._meta[int(self.meta_index[row])]
+
+    def handle(self, row: int) -> ChunkHandle:
+        return ChunkHandle(self, row)
+
+    def handles_for_ids(self, ids: Iterable[str]) -> List[ChunkHandle]:
+        """Uchwyty dla id zwróconych przez Chroma (nieznane id są pomijane)."""
+        return [ChunkHandle(self, self.row_by_id[cid]) for cid in ids if cid in self.row_by_id]
+
+    def close(self) -> None:
+        for corpus in (self._corpus, self._compact):
+            if isinstance(corpus, mmap.mmap):
+                corpus.close()
+        for f in self._files:
+            f.close()
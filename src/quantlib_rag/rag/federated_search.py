@@ -0,0 +1,320 @@
+import atexit
+import multiprocessing as mp
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+
+from ..config import (
+    CHROMA_COLLECTION,
+    FEDERATION_TIMEOUT_SECONDS,
+    FEDERATION_CALIBRATION_SAMPLE,
+)
+from .chunk_store import ChunkHandle, ChunkStore
+
+
+def distance_to_similarity(distances: List[float], space: str) -> np.ndarray:
+    """Dystans Chroma -> cosine similarity (embeddingi są znormalizowane)."""
+    d = np.asarray(distances, dtype=np.float32)
+    if space == "l2":
+        # Chroma zwraca kwadrat odległości L2: |a-b|^2 = 2 - 2cos
+        return 1.0 - d / 2.0
+    return 1.0 - d
+
+
+def _space(collection: Any) -> str:
+    return (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def calibrate(collection: Any, sample: int = FEDERATION_CALIBRATION_SAMPLE, seed: int = 0) -> Dict[str, Any]:
+    """
+    Kalibracja: rozkład podobieństw między chunkami kolekcji (tło).
+    Shard gęsty tematycznie ma wysokie tło, więc surowy cosine z różnych
+    shardów nie jest porównywalny - porównujemy odległość od tła (z-score).
+    Próbka to losowe id (seed -> powtarzalnie), nie pierwsze wiersze:
+    te pochodzą z kilku pierwszych plików i zawyżałyby tło.
+    """
+    ids = collection.get(include=[])["ids"]
+    count = len(ids)
+    if count > sample:
+        ids = np.random.default_rng(seed).choice(ids, size=sample, replace=False).tolist()
+    page = collection.get(ids=ids, include=["embeddings"]) if ids else {"ids": [], "embeddings": []}
+    vectors = np.asarray(page["embeddings"], dtype=np.float32).reshape(len(page["ids"]), -1)
+    if len(vectors) < 2:
+        return {"count": count, "mean": 0.0, "std": 1.0}
+
+    sims = vectors @ vectors.T
+    background = sims[~np.eye(len(vectors), dtype=bool)]
+    return {
+        "count": count,
+        "mean": float(background.mean()),
+        "std": float(max(background.std(), 1e-6)),
+    }
+
+
+def search_collection(
+    collection: Any,
+    query_embeddings: List[List[float]],
+    k: int,
+    with_vectors: bool,
+    count: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Jedno zapytanie Chroma z listą wektorów -> ids, similarity (+ wektory), czas."""
+    started = time.perf_counter()
+    count = collection.count() if count is None else count
+    include = ["distances", "embeddings"] if with_vectors else ["distances"]
+    res = collection.query(
+        query_embeddings=query_embeddings,
+        n_results=max(1, min(k, count)),
+        include=include,
+    )
+    space = _space(collection)
+    return {
+        "ids": res["ids"],
+        "scores": [distance_to_similarity(d, space).tolist() for d in res["distances"]],
+        "vectors": [np.asarray(v, dtype=np.float32) for v in res["embeddings"]] if with_vectors else None,
+        "search_ms": (time.perf_counter() - started) * 1000.0,
+    }
+
+
+def local_shard(name: str, collection: Any, store: ChunkStore) -> Dict[str, Any]:
+    """Shard przeszukiwany w procesie wołającym (główny index - kolekcja już otwarta)."""
+    return {"name": name, "collection": collection, "store": store, "calibration": calibrate(collection)}
+
+
+# ---------- WORKER SHARDU (osobny proces) ----------
+
+_SHARD: Dict[str, Any] = {}
+
+
+def _open_shard(db_dir: str, collection_name: str) -> None:
+    client = chromadb.PersistentClient(path=db_dir)
+    _SHARD["collection"] = client.get_collection(collection_name)
+    _SHARD["count"] = _SHARD["collection"].count()
+
+
+def _shard_info(sample: int) -> Dict[str, Any]:
+    return calibrate(_SHARD["collection"], sample)
+
+
+def _search_shard(query_embeddings: List[List[float]], k: int, with_vectors: bool) -> Dict[str, Any]:
+    return search_collection(_SHARD["collection"], query_embeddings, k, with_vectors, count=_SHARD["count"])
+
+
+# ---------- FEDERACJA ----------
+
+class FederatedSearch:
+    """
+    Wyszukiwanie po wielu shardach (nazwane korpusy, każdy shard = osobny index):
+    - każdy shard ma własny proces z otwartą kolekcją Chroma (HNSW w pamięci workera),
+      teksty czyta rodzic z chunk store shardu (mmap)
+    - główny index (local w search) przeszukiwany w procesie wołającym, równolegle z shardami
+    - zapytanie (wektor policzony raz w rodzicu) idzie do wszystkich shardów naraz,
+      jeden wspólny timeout na wszystkie
+    - wyniki scalane po skalibrowanym score: (cosine - tło shardu) / std tła
+    - shard, który nie wstał, jest pomijany; shard, który nie odpowie w timeout albo
+      rzuci błąd, jest pomijany w tym wyniku (degraded), a jego worker startuje od nowa
+    last_report -> czasy per shard ostatniego wyszukiwania.
+
+    Jedna instancja na proces i zestaw shardów: get_federation(...).
+    """
+
+    def __init__(
+        self,
+        shards: Dict[str, Path],
+        collection_name: str = CHROMA_COLLECTION,
+        timeout: float = FEDERATION_TIMEOUT_SECONDS,
+        calibration_sample: int = FEDERATION_CALIBRATION_SAMPLE,
+    ) -> None:
+        self.collection_name = collection_name
+        self.timeout = timeout
+        self.stores: Dict[str, ChunkStore] = {}
+        self.calibration: Dict[str, Dict[str, Any]] = {}
+        self.last_report: Dict[str, Any] = {}
+        self._dirs: Dict[str, Path] = {}
+        self._executors: Dict[str, ProcessPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._ctx = mp.get_context("spawn")
+
+        for name, db_dir in shards.items():
+            store = ChunkStore.open_if_exists(db_dir, collection_name)
+            if store is None:
+                print(f"[WARN] Shard '{name}' has no chunk store ({db_dir}) — skipped.")
+                continue
+            self.stores[name] = store
+            self._dirs[name] = Path(db_dir)
+            self._executors[name] = self._start(name)
+
+        # kalibracja = pierwsze zadanie workera; shard bez kolekcji / z błędem odpada
+        infos = {name: ex.submit(_shard_info, calibration_sample) for name, ex in self._executors.items()}
+        wait(list(infos.values()), timeout=max(timeout, 60.0))
+        for name, future in infos.items():
+            try:
+                if not future.done():
+                    raise TimeoutError("no answer during start-up")
+                self.calibration[name] = future.result()
+            except Exception as exc:
+                print(f"[WARN] Shard '{name}' skipped: {exc!r}")
+                self._drop(name)
+
+        chunks = sum(c["count"] for c in self.calibration.values())
+        print(f"[INFO] Federated search: {len(self.calibration)} shards, {chunks} chunks")
+
+    def __len__(self) -> int:
+        return len(self._executors)
+
+    def _start(self, name: str) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self._ctx,
+            initializer=_open_shard,
+            initargs=(str(self._dirs[name]), self.collection_name),
+        )
+
+    @staticmethod
+    def _kill(ex: ProcessPoolExecutor) -> None:
+        # zawieszony worker nie odda się sam (shutdown nie przerywa zadania) -> kończymy proces
+        for process in list((getattr(ex, "_processes", None) or {}).values()):
+            process.terminate()
+        ex.shutdown(wait=False, cancel_futures=True)
+
+    def _drop(self, name: str) -> None:
+        self._kill(self._executors.pop(name))
+        self.stores.pop(name).close()
+        self._dirs.pop(name)
+
+    def _recycle(self, name: str, ex: ProcessPoolExecutor) -> None:
+        """Nowy worker dla shardu, który nie odpowiedział (o ile nikt go już nie wymienił)."""
+        with self._lock:
+            if self._executors.get(name) is not ex:
+                return
+            self._kill(ex)
+            self._executors[name] = self._start(name)
+        print(f"[WARN] Shard '{name}' worker restarted.")
+
+    def search(
+        self,
+        query_embeddings: List[List[float]],
+        k: int,
+        with_vectors: bool = False,
+        local: Optional[Dict[str, Any]] = None,
+        status: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[List[ChunkHandle], Optional[np.ndarray]]]:
+        """
+        Dla każdego wektora: top-k ze wszystkich shardów (+ local) po skalibrowanym score
+        (+ wektory trafień, jeśli with_vectors - do adaptive k / MMR).
+        status -> dict wołającego, dostaje raport tego wyszukiwania; "degraded": True,
+        jeśli któryś shard nie odpowiedział (wynik częściowy - nie do cache).
+        last_report jest wspólny dla wątków, status - per wywołanie.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            executors = dict(self._executors)
+        futures: Dict[str, Future] = {
+            name: ex.submit(_search_shard, query_embeddings, k, with_vectors)
+            for name, ex in executors.items()
+        }
+
+        report: Dict[str, Dict[str, Any]] = {}
+        # per zapytanie: id -> (skalibrowany score, handle, wektor)
+        merged: List[Dict[str, Tuple[float, ChunkHandle, Optional[np.ndarray]]]] = [
+            {} for _ in query_embeddings
+        ]
+
+        def add(name: str, res: Dict[str, Any], store: ChunkStore, calibration: Dict[str, Any]) -> None:
+            for q, (ids, scores) in enumerate(zip(res["ids"], res["scores"])):
+                for j, (cid, score) in enumerate(zip(ids, scores)):
+                    row = store.row_by_id.get(cid)
+                    if row is None:
+                        continue
+                    calibrated = (score - calibration["mean"]) / calibration["std"]
+                    # ten sam chunk w dwóch shardach -> zostaje lepszy score
+                    if cid not in merged[q] or merged[q][cid][0] < calibrated:
+                        vector = res["vectors"][q][j] if with_vectors else None
+                        merged[q][cid] = (calibrated, store.handle(row), vector)
+            report[name] = {
+                "search_ms": round(res["search_ms"], 2),
+                "roundtrip_ms": round((time.perf_counter() - started) * 1000.0, 2),
+                "hits": sum(len(ids) for ids in res["ids"]),
+            }
+
+        # główny index w tym procesie, w czasie gdy workery szukają
+        if local is not None:
+            res = search_collection(local["collection"], query_embeddings, k, with_vectors)
+            add(local["name"], res, local["store"], local["calibration"])
+
+        # jeden termin dla wszystkich shardów (nie timeout x liczba shardów)
+        remaining = self.timeout - (time.perf_counter() - started)
+        wait(list(futures.values()), timeout=max(0.0, remaining))
+
+        for name, future in futures.items():
+            if not future.done():
+                future.cancel()
+                report[name] = {"error": f"timeout after {self.timeout:.1f}s"}
+                self._recycle(name, executors[name])
+                continue
+            try:
+                res = future.result()
+            except Exception as exc:
+                report[name] = {"error": repr(exc)}
+                self._recycle(name, executors[name])
+                continue
+            add(name, res, self.stores[name], self.calibration[name])
+
+        degraded = False
+        for name, shard in report.items():
+            if "error" in shard:
+                degraded = True
+                print(f"[WARN] Shard '{name}' skipped: {shard['error']}")
+        self.last_report = {
+            "shards": report,
+            "degraded": degraded,
+            "total_ms": round((time.perf_counter() - started) * 1000.0, 2),
+        }
+        if status is not None:
+            status.update(self.last_report)
+
+        results: List[Tuple[List[ChunkHandle], Optional[np.ndarray]]] = []
+        for hits in merged:
+            top = sorted(hits.values(), key=lambda h: -h[0])[:k]
+            handles = [h[1] for h in top]
+            vectors = np.vstack([h[2] for h in top]) if with_vectors and top else None
+            results.append((handles, vectors))
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            for name in list(self._executors):
+                self._drop(name)
+
+
+# ---------- JEDNA FEDERACJA NA PROCES ----------
+
+_FEDERATIONS: Dict[Tuple[Tuple[str, str], ...], FederatedSearch] = {}
+_FEDERATIONS_LOCK = threading.Lock()
+
+
+def get_federation(shards: Dict[str, Path]) -> Optional[FederatedSearch]:
+    """
+    Federacja dla zestawu shardów, współdzielona przez wszystkie QuantLibIndex w procesie
+    (sesje Streamlit, wersje indexu w watch mode) - workery startują raz.
+    None, jeśli żaden shard nie wstał.
+    """
+    key = tuple(sorted((name, str(Path(d).resolve())) for name, d in shards.items()))
+    with _FEDERATIONS_LOCK:
+        if key not in _FEDERATIONS:
+            _FEDERATIONS[key] = FederatedSearch(shards)
+        federation = _FEDERATIONS[key]
+    return federation if len(federation) else None
+
+
+@atexit.register
+def close_federations() -> None:
+    with _FEDERATIONS_LOCK:
+        for federation in _FEDERATIONS.values():
+            federation.close()
+        _FEDERATIONS.clear()
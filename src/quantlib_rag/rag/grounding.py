@@ -0,0 +1,280 @@
+"""
+Wsadowa ocena ugruntowania odpowiedzi (grounding / halucynacje).
+
+Wejście: wiele par (odpowiedź, id chunków, które były w kontekście).
+Dla każdej pary - te same liczby co analyze_answer_vs_context (pełne chunki,
+bez max_chars_per_doc), ale bez printów i bez retrievalu:
+- overlap_percent     -> % tokenów odpowiedzi obecnych w kontekście
+- api_in_answer       -> symbole ql.* z odpowiedzi
+- api_in_both         -> ... które są też w kontekście
+- api_only_in_answer  -> ... których w kontekście nie ma (potencjalna halucynacja)
+
+Zbiory tokenów / symboli chunków są policzone przy budowie (chunk store, grounding_*),
+więc kontekst to tylko suma kilku tablic id -> maska bitowa na słowniku.
+Id chunków szukamy we wszystkich store, które mogą je zwrócić: główny index,
+przykłady kodu (routing) i shardy aktywnych korpusów (federated search);
+każdy store ma własny słownik, więc token jest "w kontekście", jeśli znalazł go którykolwiek.
+Duże batche idą przez pulę procesów; każdy worker mapuje pliki store (mmap).
+
+Usage:
+    python -m src.quantlib_rag.rag.grounding pairs.jsonl [--out results.jsonl] [--corpora a,b]
+    (linie: {"answer": "...", "chunk_ids": ["...", ...], ...inne pola przechodzą dalej})
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import (
+    ACTIVE_CORPORA,
+    CHROMA_COLLECTION,
+    CHROMA_CODE_COLLECTION,
+    GROUNDING_PROCESSES,
+    GROUNDING_MIN_POOL_BATCH,
+    GROUNDING_POOL_CHUNKSIZE,
+)
+from ..ingestion.corpora import corpus_shards
+from ..ingestion.grounding_sets import (
+    GROUNDING_VOCAB,
+    GROUNDING_TOKENS,
+    GROUNDING_TOKEN_OFFSETS,
+    GROUNDING_SYMBOLS,
+    GROUNDING_SYMBOL_OFFSETS,
+    text_symbols,
+    text_tokens,
+    write_grounding_sets,
+)
+from .chunk_store import ChunkStore
+
+
+# analyze_answer_vs_context skleja chunki separatorem "--- DOC SPLIT ---",
+# więc przy 2+ chunkach jego tokeny też są "w kontekście"
+_SEPARATOR_TOKENS = text_tokens("--- DOC SPLIT ---")
+
+
+class GroundingIndex:
+    """Odczyt zbiorów tokenów / symboli chunków z katalogu chunk store (mmap)."""
+
+    def __init__(self, store_dir: Path) -> None:
+        store_dir = Path(store_dir)
+        vocab = json.loads((store_dir / GROUNDING_VOCAB).read_text(encoding="utf-8"))
+        self.token_ids: Dict[str, int] = {t: i for i, t in enumerate(vocab["tokens"])}
+        self.symbol_ids: Dict[str, int] = {s: i for i, s in enumerate(vocab["symbols"])}
+
+        self.tokens = np.load(store_dir / GROUNDING_TOKENS, mmap_mode="r")
+        self.token_offsets = np.load(store_dir / GROUNDING_TOKEN_OFFSETS, mmap_mode="r")
+        self.symbols = np.load(store_dir / GROUNDING_SYMBOLS, mmap_mode="r")
+        self.symbol_offsets = np.load(store_dir / GROUNDING_SYMBOL_OFFSETS, mmap_mode="r")
+
+        # maski wielokrotnego użytku: ustawiamy bity kontekstu, sprawdzamy, zerujemy
+        self._token_mask = np.zeros(len(self.token_ids) + 1, dtype=bool)
+        self._symbol_mask = np.zeros(len(self.symbol_ids) + 1, dtype=bool)
+
+    @classmethod
+    def open_for(cls, store: ChunkStore) -> "GroundingIndex":
+        """Store sprzed tej zmiany -> zbiory liczone raz i dopisywane do katalogu store."""
+        if not (store.store_dir / GROUNDING_VOCAB).exists():
+            print(f"[INFO] Computing grounding sets for {store.store_dir} ...")
+            write_grounding_sets(store.store_dir, (store.text(r) for r in range(len(store))))
+        return cls(store.store_dir)
+
+    @staticmethod
+    def _gather(values: np.ndarray, offsets: np.ndarray, rows: Sequence[int]) -> np.ndarray:
+        if not len(rows):
+            return np.zeros(0, dtype=np.int32)
+        return np.concatenate([values[offsets[r] : offsets[r + 1]] for r in rows])
+
+    @staticmethod
+    def _lookup(ids: Dict[str, int], items: List[str]) -> np.ndarray:
+        # spoza słownika -> ostatni bit maski, który nigdy nie jest ustawiony
+        missing = len(ids)
+        return np.fromiter((ids.get(i, missing) for i in items), dtype=np.int64, count=len(items))
+
+    def _in_context(self, mask: np.ndarray, context: np.ndarray, query: np.ndarray) -> np.ndarray:
+        mask[context] = True
+        found = mask[query]
+        mask[context] = False
+        return found
+
+    def found(self, tokens: List[str], symbols: List[str], rows: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Maski: które tokeny / symbole odpowiedzi są w chunkach rows."""
+        token_found = self._in_context(
+            self._token_mask,
+            self._gather(self.tokens, self.token_offsets, rows),
+            self._lookup(self.token_ids, tokens),
+        )
+        symbol_found = self._in_context(
+            self._symbol_mask,
+            self._gather(self.symbols, self.symbol_offsets, rows),
+            self._lookup(self.symbol_ids, symbols),
+        )
+        return token_found, symbol_found
+
+    def score_rows(self, answer: str, rows: Sequence[int]) -> Dict[str, Any]:
+        return score_across([self], answer, [(0, list(rows))])
+
+
+def score_across(
+    indexes: Sequence[GroundingIndex],
+    answer: str,
+    rows_by_store: Sequence[Tuple[int, List[int]]],
+) -> Dict[str, Any]:
+    """Ocena jednej odpowiedzi; kontekst = chunki z kilku store (numer store, wiersze)."""
+    tokens = sorted(text_tokens(answer))
+    symbols = sorted(text_symbols(answer))
+
+    token_found = np.zeros(len(tokens), dtype=bool)
+    symbol_found = np.zeros(len(symbols), dtype=bool)
+    for store_no, rows in rows_by_store:
+        t, s = indexes[store_no].found(tokens, symbols, rows)
+        token_found |= t
+        symbol_found |= s
+    if sum(len(rows) for _, rows in rows_by_store) > 1:
+        token_found |= np.fromiter((t in _SEPARATOR_TOKENS for t in tokens), dtype=bool, count=len(tokens))
+
+    overlap = float(token_found.sum()) / len(tokens) * 100 if tokens else 0.0
+    return {
+        "overlap_percent": round(overlap, 2),
+        "n_answer_tokens": len(tokens),
+        "api_in_answer": symbols,
+        "api_in_both": [s for s, ok in zip(symbols, symbol_found) if ok],
+        "api_only_in_answer": [s for s, ok in zip(symbols, symbol_found) if not ok],
+    }
+
+
+# ---------- WORKERY PULI ----------
+
+_WORKER_INDEXES: List[GroundingIndex] = []
+
+
+def _init_worker(store_dirs: List[str]) -> None:
+    _WORKER_INDEXES[:] = [GroundingIndex(Path(d)) for d in store_dirs]
+
+
+def _score_job(job: Tuple[str, List[Tuple[int, List[int]]]]) -> Dict[str, Any]:
+    answer, rows_by_store = job
+    return score_across(_WORKER_INDEXES, answer, rows_by_store)
+
+
+# ---------- CHECKER ----------
+
+def _default_stores(db_dir: Optional[Path] = None, corpora: Optional[Sequence[str]] = None) -> List[ChunkStore]:
+    """
+    Wszystkie store, z których log może mieć id chunków:
+    główny index, przykłady kodu i shardy korpusów (domyślnie ACTIVE_CORPORA).
+    """
+    # import tutaj: quantlib_index ciągnie langchain, a workery puli (spawn) go nie potrzebują
+    from .quantlib_index import resolve_active_index_dir
+
+    db_dir = db_dir or resolve_active_index_dir()
+    store = ChunkStore.open_if_exists(db_dir, CHROMA_COLLECTION)
+    if store is None:
+        raise RuntimeError("Chunk store not found — build the index first.")
+
+    stores = [store]
+    code_store = ChunkStore.open_if_exists(db_dir, CHROMA_CODE_COLLECTION)
+    if code_store is not None:
+        stores.append(code_store)
+    for shard_dir in corpus_shards(ACTIVE_CORPORA if corpora is None else corpora).values():
+        shard_store = ChunkStore.open_if_exists(shard_dir, CHROMA_COLLECTION)
+        if shard_store is not None:
+            stores.append(shard_store)
+    return stores
+
+
+class BatchGroundingChecker:
+    """
+    score(pairs) -> lista wyników (dict) w kolejności wejścia, bez printów.
+    Id chunków szukane we wszystkich stores (pierwszy, który je ma);
+    id nieobecne nigdzie (np. index przebudowany od czasu logu)
+    są pomijane i raportowane w "missing_chunk_ids".
+    """
+
+    def __init__(
+        self,
+        stores: Optional[Sequence[ChunkStore]] = None,
+        processes: Optional[int] = GROUNDING_PROCESSES,
+        min_pool_batch: int = GROUNDING_MIN_POOL_BATCH,
+        chunksize: int = GROUNDING_POOL_CHUNKSIZE,
+    ) -> None:
+        self.stores = list(stores) if stores else _default_stores()
+        self.indexes = [GroundingIndex.open_for(store) for store in self.stores]
+        self.processes = processes or mp.cpu_count()
+        self.min_pool_batch = min_pool_batch
+        self.chunksize = chunksize
+
+    def _locate(self, chunk_ids: Sequence[str]) -> Tuple[List[Tuple[int, List[int]]], List[str]]:
+        """Id chunków -> [(numer store, wiersze)] + id nieznalezione w żadnym store."""
+        rows: Dict[int, List[int]] = {}
+        missing: List[str] = []
+        for cid in chunk_ids:
+            for store_no, store in enumerate(self.stores):
+                row = store.row_by_id.get(cid)
+                if row is not None:
+                    rows.setdefault(store_no, []).append(row)
+                    break
+            else:
+                missing.append(cid)
+        return sorted(rows.items()), missing
+
+    def score(self, pairs: Sequence[Tuple[str, Sequence[str]]]) -> List[Dict[str, Any]]:
+        jobs: List[Tuple[str, List[Tuple[int, List[int]]]]] = []
+        missing: List[List[str]] = []
+        for answer, chunk_ids in pairs:
+            rows_by_store, missing_ids = self._locate(chunk_ids)
+            jobs.append((answer or "", rows_by_store))
+            missing.append(missing_ids)
+
+        if self.processes <= 1 or len(jobs) < self.min_pool_batch:
+            results = [score_across(self.indexes, answer, rows) for answer, rows in jobs]
+        else:
+            ctx = mp.get_context("spawn")
+            with ctx.Pool(
+                self.processes,
+                initializer=_init_worker,
+                initargs=([str(store.store_dir) for store in self.stores],),
+            ) as pool:
+                results = pool.map(_score_job, jobs, chunksize=self.chunksize)
+
+        for result, missing_ids in zip(results, missing):
+            result["missing_chunk_ids"] = missing_ids
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch grounding check of answers against their chunks.")
+    parser.add_argument("pairs", type=Path, help="JSONL with 'answer' and 'chunk_ids' per line")
+    parser.add_argument("--out", type=Path, default=None, help="results JSONL (default: stdout)")
+    parser.add_argument("--db-dir", type=Path, default=None)
+    parser.add_argument("--processes", type=int, default=GROUNDING_PROCESSES)
+    parser.add_argument(
+        "--corpora",
+        default=None,
+        help="comma-separated extra corpora whose shards are searched for chunk ids (default: QUANTLIB_RAG_CORPORA)",
+    )
+    args = parser.parse_args()
+
+    corpora = [c.strip() for c in args.corpora.split(",") if c.strip()] if args.corpora is not None else None
+    stores = _default_stores(args.db_dir, corpora)
+
+    with args.pairs.open(encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    checker = BatchGroundingChecker(stores, processes=args.processes)
+    results = checker.score([(r.get("answer", ""), r.get("chunk_ids", [])) for r in records])
+
+    lines = [json.dumps({**r, "grounding": g}, ensure_ascii=False) for r, g in zip(records, results)]
+    if args.out is None:
+        print("\n".join(lines))
+    else:
+        args.out.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        flagged = sum(1 for g in results if g["api_only_in_answer"])
+        print(f"[INFO] {len(results)} answers scored, {flagged} with ql.* symbols not in context -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
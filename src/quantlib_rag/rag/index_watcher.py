@@ -0,0 +1,191 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from ..config import (
+    MD_DIR,
+    INDEX_VERSIONS_DIR,
+    ACTIVE_INDEX_POINTER,
+    WATCH_POLL_SECONDS,
+)
+from ..ingestion.build_index import QuantLibMarkdownIndexBuilder
+from ..ingestion.manifest import compute_source_hashes
+from .quantlib_index import QuantLibIndex
+
+
+class _Generation:
+    """Jedna wersja indexu + licznik zapytań, które jej jeszcze używają."""
+
+    __slots__ = ("index", "db_dir", "refs", "retired")
+
+    def __init__(self, index: QuantLibIndex, db_dir: Path) -> None:
+        self.index = index
+        self.db_dir = Path(db_dir)
+        self.refs = 0
+        self.retired = False
+
+
+class LiveQuantLibIndex:
+    """
+    Blue/green holder dla QuantLibIndex.
+
+    - acquire()  -> context manager z bieżącą wersją indexu;
+                    zapytanie do końca pracuje na wersji, którą dostało
+    - swap(...)  -> atomowe przełączenie na nową wersję;
+                    stara jest sprzątana, gdy ostatnie zapytanie ją odda
+    """
+
+    def __init__(self, index: Optional[QuantLibIndex] = None) -> None:
+        index = index or QuantLibIndex()
+        self._lock = threading.Lock()
+        self._current = _Generation(index, index.db_path)
+
+    @property
+    def current(self) -> QuantLibIndex:
+        return self._current.index
+
+    @contextmanager
+    def acquire(self) -> Iterator[QuantLibIndex]:
+        with self._lock:
+            generation = self._current
+            generation.refs += 1
+        try:
+            yield generation.index
+        finally:
+            with self._lock:
+                generation.refs -= 1
+                release = generation.retired and generation.refs == 0
+            if release:
+                self._dispose(generation)
+
+    def swap(self, index: QuantLibIndex) -> None:
+        with self._lock:
+            old = self._current
+            self._current = _Generation(index, index.db_path)
+            old.retired = True
+            release = old.refs == 0
+        print(f"[INFO] Live index switched: {old.db_dir.name} -> {index.db_path.name}")
+        if release:
+            self._dispose(old)
+
+    @staticmethod
+    def _dispose(generation: _Generation) -> None:
+        """
+        Zamyka starą wersję (chunk store + system Chroma - inaczej Chroma trzyma
+        ją w cache do końca procesu); kasujemy tylko katalogi wersji (nigdy bazowy index).
+        """
+        generation.index.close()
+
+        versions_dir = INDEX_VERSIONS_DIR.resolve()
+        if versions_dir in generation.db_dir.resolve().parents:
+            shutil.rmtree(generation.db_dir, ignore_errors=True)
+            print(f"[INFO] Removed old index version: {generation.db_dir.name}")
+
+
+@contextmanager
+def pinned_index(index: "QuantLibIndex | LiveQuantLibIndex") -> Iterator[QuantLibIndex]:
+    """Wersja indexu przypięta na czas jednego zapytania (zwykły index -> on sam)."""
+    if isinstance(index, LiveQuantLibIndex):
+        with index.acquire() as current:
+            yield current
+    else:
+        yield index
+
+
+def write_active_pointer(db_dir: Path) -> None:
+    """Atomowo zapisuje, która wersja indexu jest aktywna (na restart procesu)."""
+    ACTIVE_INDEX_POINTER.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ACTIVE_INDEX_POINTER.with_name(ACTIVE_INDEX_POINTER.name + ".tmp")
+    tmp.write_text(str(Path(db_dir).resolve()), encoding="utf-8")
+    os.replace(tmp, ACTIVE_INDEX_POINTER)
+
+
+class IndexWatcher(threading.Thread):
+    """
+    Wątek w tle, który pilnuje katalogu z markdownami:
+    - co poll_interval sekund liczy hashe .md
+    - po zmianie (stabilnej przez 2 odczyty) buduje index w nowym katalogu wersji
+    - po zbudowaniu przełącza LiveQuantLibIndex (zapytania nie czekają na rebuild)
+    """
+
+    def __init__(
+        self,
+        live_index: LiveQuantLibIndex,
+        source_dir: Optional[Path] = None,
+        poll_interval: float = WATCH_POLL_SECONDS,
+    ) -> None:
+        super().__init__(name="quantlib-index-watcher", daemon=True)
+        self.live_index = live_index
+        self.source_dir = Path(source_dir or MD_DIR)
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+        manifest = live_index.current.manifest or {}
+        self._indexed_hashes: Dict[str, str] = (
+            manifest.get("source_hashes") or compute_source_hashes(self.source_dir)
+        )
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        print(f"[INFO] Watching {self.source_dir} every {self.poll_interval:.0f}s")
+        pending: Optional[Dict[str, str]] = None
+
+        while not self._stop_event.wait(self.poll_interval):
+            hashes = compute_source_hashes(self.source_dir)
+            if not hashes or hashes == self._indexed_hashes:
+                pending = None
+                continue
+
+            # pliki mogą być jeszcze w trakcie zapisu -> czekamy na stabilny stan
+            if hashes != pending:
+                pending = hashes
+                continue
+
+            try:
+                self.rebuild(hashes)
+            except Exception as exc:
+                print(f"[ERROR] Index rebuild failed, keeping current version: {exc}")
+            pending = None
+
+    def rebuild(self, hashes: Dict[str, str]) -> Path:
+        """Buduje nową wersję indexu obok bieżącej i przełącza na nią."""
+        digest = hashlib.sha256("".join(sorted(hashes.values())).encode("utf-8")).hexdigest()
+        version = f"v{datetime.now():%Y%m%d-%H%M%S}-{digest[:8]}"
+        db_dir = INDEX_VERSIONS_DIR / version
+
+        print(f"[INFO] Docs changed — building index version {version} ...")
+        started = time.perf_counter()
+
+        current = self.live_index.current
+        try:
+            builder = QuantLibMarkdownIndexBuilder(
+                source_dir=self.source_dir,
+                db_dir=db_dir,
+                embeddings=current.embeddings,
+                hnsw=(current.manifest or {}).get("hnsw"),
+            )
+            builder.run()
+
+            index = QuantLibIndex(
+                db_path=db_dir,
+                k_default=current.k_default,
+                embeddings=current.embeddings,
+            )
+        except Exception:
+            # niedokończona wersja nie może zostać na dysku (nigdy nie była aktywna)
+            shutil.rmtree(db_dir, ignore_errors=True)
+            raise
+        write_active_pointer(db_dir)
+        self.live_index.swap(index)
+        self._indexed_hashes = hashes
+
+        print(f"[INFO] Index version {version} live after {time.perf_counter() - started:.1f}s")
+        return db_dir
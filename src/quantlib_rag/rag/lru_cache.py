@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def normalize_question(question: str) -> str:
+    """Klucz cache / logu: pytanie bez nadmiarowych białych znaków."""
+    return " ".join(question.split())
+
+
+class LRUCache:
+    """
+    Mały, wątkowo-bezpieczny cache LRU (Streamlit obsługuje sesje w wątkach).
+    maxsize=0 -> cache wyłączony (get_or_compute zawsze liczy).
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        cacheable: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """cacheable() == False po compute -> wynik zwracany, ale nie zapisywany (np. częściowy)."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        # liczymy poza lockiem (embedding / wyszukiwanie trwa); wyścig = podwójne liczenie
+        value = compute()
+        if self.maxsize <= 0 or (cacheable is not None and not cacheable()):
+            return value
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def peek(self, key: Hashable) -> Any:
+        """Wartość z cache albo None (bez liczenia i bez statystyk)."""
+        with self._lock:
+            return self._data.get(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
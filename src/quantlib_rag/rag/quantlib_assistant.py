@@ -2,28 +2,48 @@
 
 import os
 import re
-from typing import Any, Dict, List, Optional
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 
 from langchain_ollama import ChatOllama
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.documents import Document
 
+from .chunk_store import ChunkHandle
+from .index_watcher import LiveQuantLibIndex, pinned_index
 from .quantlib_index import QuantLibIndex
+from .query_decomposer import QueryDecomposer
+from .query_log import QueryLog, shared_query_log
+from .query_router import QueryIntentRouter
+from .warmup import READINESS, prewarm_queries, warm_up
 from ..config import *
 
 
+# indexy już rozgrzane z logu (pre-warm raz na obiekt indexu w procesie, nie na sesję)
+_PREWARMED: "weakref.WeakSet[QuantLibIndex]" = weakref.WeakSet()
+_PREWARM_LOCK = threading.Lock()
+
+
 class QuantLibQuoteAssistant:
     """
     Quote-only assistant dla dokumentacji QuantLib-Python.
 
     Używa:
     - QuantLibIndex -> retriever (Chroma + BGE)
+      (albo LiveQuantLibIndex -> index przełączany w tle przez watch mode)
     - ChatOllama(model="mistral", temperature=0.0)
 
     Metody:
     - quote_only_answer(...)          -> LLM TYLKO cytuje kontekst
     - debug_retrieval(...)            -> podgląd, co zwraca retriever
     - analyze_answer_vs_context(...)  -> ile odpowiedzi jest z docs, a ile z 'głowy'
+    - warm_up(...)                    -> rozgrzanie embeddingów / indexu / LLM na starcie
+                                         (+ pre-warm cache najczęstszymi pytaniami z logu)
+
+    Opcjonalnie QueryLog: pytanie, id chunków i czasy każdego quote_only_answer.
     """
 
     def __init__(
@@ -32,11 +52,15 @@ class QuantLibQuoteAssistant:
         llm_model: str = "mistral",
         temperature: float = 0.0,
         k_default: int = DEFAULT_K,
-        llm = None
+        llm = None,
+        index: Optional[QuantLibIndex | LiveQuantLibIndex] = None,
+        query_log: Optional[QueryLog] = None,
     ) -> None:
         # Index + retriever
-        self.index = QuantLibIndex(db_path=db_path, k_default=k_default)
-        self.retriever = self.index.get_retriever()
+        if index is None:
+            index = QuantLibIndex(db_path=db_path, k_default=k_default)
+        self.index = index
+        self.retriever = index.get_retriever() if isinstance(index, QuantLibIndex) else None
 
 
         
@@ -46,18 +70,78 @@ class QuantLibQuoteAssistant:
             self.llm_en = ChatOllama(
                 model=llm_model,
                 temperature=temperature,
-            )  
+                base_url=OLLAMA_BASE_URL,
+                keep_alive=OLLAMA_KEEP_ALIVE,
+            )
 
         self.k_default = k_default
+        self.router = QueryIntentRouter()
+        self.decomposer = QueryDecomposer(llm=self.llm_en if MULTI_QUERY_USE_LLM else None)
+
+        # log zapytań: podany wprost albo z configu (QUANTLIB_RAG_QUERY_LOG=1),
+        # wtedy jeden na proces - wspólny dla sesji
+        if query_log is None and QUERY_LOG_ENABLED:
+            query_log = shared_query_log()
+        self.query_log = query_log
 
     # ---------- INTERNAL UTILS ----------
 
     @staticmethod
-    def _format_context(docs: List[Document], max_chars_per_doc: int = 800) -> str:
+    def _snippet(doc: Document | ChunkHandle, max_chars: int, compact: bool = False) -> str:
+        """
+        Początek tekstu chunka; ChunkHandle dekoduje tylko potrzebny fragment.
+        compact=True -> wersja kompaktowa policzona przy budowie indexu.
+        """
+        if isinstance(doc, ChunkHandle):
+            return doc.compact_text(max_chars) if compact else doc.text(max_chars)
+        return doc.page_content[:max_chars]
+
+    @classmethod
+    def _format_context(
+        cls,
+        docs: List[Document | ChunkHandle],
+        max_chars_per_doc: int = 800,
+        compact: bool = False,
+    ) -> str:
         """Składa context z kilku chunków, każdy przycięty osobno."""
-        snippets = [d.page_content[:max_chars_per_doc] for d in docs]
+        snippets = [cls._snippet(d, max_chars_per_doc, compact=compact) for d in docs]
         return "\n\n--- DOC SPLIT ---\n\n".join(snippets)
 
+    @contextmanager
+    def _acquire_index(self) -> Iterator[QuantLibIndex]:
+        """Wersja indexu przypięta na czas jednego zapytania (blue/green swap)."""
+        with pinned_index(self.index) as index:
+            yield index
+
+    @staticmethod
+    def _retrieve(
+        index: QuantLibIndex,
+        question_en: str,
+        k: int,
+        adaptive: bool = False,
+        router: Optional[QueryIntentRouter] = None,
+        decomposer: Optional[QueryDecomposer] = None,
+    ) -> List[Document | ChunkHandle]:
+        """
+        Chunk store -> lekkie uchwyty; bez store -> klasyczny retriever.
+        Kolejność (pierwsza pasująca):
+        1) decomposer + pytanie złożone -> multi_search po pod-pytaniach (bez adaptive)
+        2) router + index kodu + pytanie o przykład -> routed_search
+           (adaptive -> dopełnienie z głównego indexu przez odcięcie + MMR)
+        3) adaptive -> adaptive_search, inaczej search_handles
+        """
+        if index.chunk_store is not None:
+            if decomposer is not None:
+                queries = decomposer.split(question_en)
+                if len(queries) > 1:
+                    return index.multi_search(queries, k=k)
+            if router is not None and index.code_store is not None and router.is_code_query(question_en):
+                return index.routed_search(question_en, k=k, router=router, adaptive=adaptive)
+            if adaptive:
+                return index.adaptive_search(question_en, k_max=k)
+            return index.search_handles(question_en, k=k)
+        return index.get_retriever(k=k).invoke(question_en)
+
     # ---------- GŁÓWNA METODA: QUOTE-ONLY ----------
 
     def quote_only_answer(
@@ -65,26 +149,70 @@ class QuantLibQuoteAssistant:
         question_en: str,
         k: Optional[int] = None,
         max_chars_per_doc: int = 800,
+        adaptive: bool = False,
+        compact: bool = True,
+        route_code: bool = True,
+        multi_query: bool = False,
     ) -> Dict[str, Any]:
         """
         Tryb: LLM jako 'inteligentny filtr':
         - MA PRAWO TYLKO CYTOWAĆ fragmenty kontekstu
         - NIE WOLNO mu dodawać nowego kodu ani tekstu
+
+        adaptive=True -> k to górny limit; liczbę chunków wybiera
+        odcięcie po score + MMR (QuantLibIndex.adaptive_search).
+        compact=True -> do LLM idzie kompaktowa wersja chunków
+        (bez boilerplate, skrócone tabele, kod bez zmian).
+        route_code=True -> pytania o przykład idą najpierw do indexu
+        przykładów kodu (QuantLibIndex.routed_search); adaptive dotyczy wtedy
+        dopełnienia z głównego indexu.
+        multi_query=True -> pytanie złożone jest rozbijane na pod-pytania,
+        wyniki scalane pod wspólnym k (QuantLibIndex.multi_search).
+
+        Całe zapytanie (retrieval + LLM) pracuje na jednej wersji indexu.
         """
         if k is None:
             k = self.k_default
 
-        retriever = self.index.get_retriever(k=k)
-        docs = retriever.invoke(question_en)
+        with self._acquire_index() as index:
+            return self._quote_only_answer(
+                index, question_en, k, max_chars_per_doc, adaptive, compact, route_code, multi_query
+            )
+
+    def _quote_only_answer(
+        self,
+        index: QuantLibIndex,
+        question_en: str,
+        k: int,
+        max_chars_per_doc: int,
+        adaptive: bool = False,
+        compact: bool = True,
+        route_code: bool = True,
+        multi_query: bool = False,
+    ) -> Dict[str, Any]:
+        """quote_only_answer na konkretnej (przypiętej) wersji indexu."""
+        started = time.perf_counter()
+        docs = self._retrieve(
+            index,
+            question_en,
+            k,
+            adaptive=adaptive,
+            router=self.router if route_code else None,
+            decomposer=self.decomposer if multi_query else None,
+        )
+        timings = {"retrieval": (time.perf_counter() - started) * 1000.0}
+        params = {"k": k, "adaptive": adaptive, "route_code": route_code, "multi_query": multi_query}
 
         if not docs:
+            timings["total"] = timings["retrieval"]
+            self._log_query(question_en, docs, timings, params)
             return {
                 "question_en": question_en,
                 "answer_en": "I couldn't find any relevant context in the documentation.",
                 "sources": [],
             }
 
-        context = self._format_context(docs, max_chars_per_doc=max_chars_per_doc)
+        context = self._format_context(docs, max_chars_per_doc=max_chars_per_doc, compact=compact)
 
         messages = [
             SystemMessage(
@@ -112,13 +240,17 @@ class QuantLibQuoteAssistant:
             ),
         ]
 
+        llm_started = time.perf_counter()
         resp = self.llm_en.invoke(messages)
         answer = resp.content.strip()
+        timings["llm"] = (time.perf_counter() - llm_started) * 1000.0
+        timings["total"] = (time.perf_counter() - started) * 1000.0
+        self._log_query(question_en, docs, timings, params)
 
         sources = [
             {
                 "source": os.path.basename(d.metadata.get("source", "")),
-                "preview": d.page_content[:300],
+                "preview": self._snippet(d, 300),
             }
             for d in docs[:k]
         ]
@@ -129,6 +261,74 @@ class QuantLibQuoteAssistant:
             "sources": sources,
         }
 
+    def _log_query(
+        self,
+        question_en: str,
+        docs: List[Document | ChunkHandle],
+        timings: Dict[str, float],
+        params: Dict[str, Any],
+    ) -> None:
+        if self.query_log is None:
+            return
+        chunk_ids = [getattr(d, "id", None) for d in docs]
+        self.query_log.record(question_en, chunk_ids, timings, **params)
+
+    # ---------- WARM-UP ----------
+
+    def warm_up(
+        self,
+        warm_llm: bool = True,
+        prewarm_top_n: int = PREWARM_TOP_N,
+        warm_index: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Pierwsze (wolne) inference przed pierwszym pytaniem użytkownika.
+        warm_llm=False -> bez wywołania LLM (np. płatne API).
+        warm_index=False -> index współdzielony i już rozgrzany (UI: raz na proces).
+        prewarm_top_n > 0 i włączony log -> odtwarza najczęstsze pytania
+        (z ich parametrami), żeby wypełnić cache indexu (raz na index, patrz prewarm).
+        """
+        with self._acquire_index() as index:
+            status = warm_up(index, llm=self.llm_en if warm_llm else None, warm_index=warm_index)
+            if self.prewarm(index, self.query_log, prewarm_top_n, self.k_default):
+                status = READINESS.status()
+            return status
+
+    @classmethod
+    def prewarm(
+        cls,
+        index: QuantLibIndex,
+        query_log: Optional[QueryLog],
+        top_n: int = PREWARM_TOP_N,
+        k_default: int = DEFAULT_K,
+    ) -> int:
+        """
+        Odtwarza najczęstsze pytania z logu (z ich parametrami) na podanym indexie,
+        żeby wypełnić jego cache. Raz na obiekt indexu w procesie - kolejne sesje
+        na współdzielonym indexie nic nie powtarzają. Pod-pytania tylko z heurystyk
+        (bez LLM, także przy MULTI_QUERY_USE_LLM). Zwraca liczbę odtworzonych pytań.
+        """
+        if query_log is None or top_n <= 0:
+            return 0
+        with _PREWARM_LOCK:
+            if index in _PREWARMED:
+                return 0
+            _PREWARMED.add(index)
+
+        router = QueryIntentRouter()
+        decomposer = QueryDecomposer()
+        return prewarm_queries(
+            lambda question, params: cls._retrieve(
+                index,
+                question,
+                params.get("k", k_default),
+                adaptive=params.get("adaptive", False),
+                router=router if params.get("route_code", True) else None,
+                decomposer=decomposer if params.get("multi_query", False) else None,
+            ),
+            query_log.top_queries(top_n),
+        )
+
     # ---------- DEBUG: RETRIEVER ----------
 
     def debug_retrieval(
@@ -144,8 +344,8 @@ class QuantLibQuoteAssistant:
         if k is None:
             k = self.k_default
 
-        retriever = self.index.get_retriever(k=k)
-        docs = retriever.invoke(question_en)
+        with self._acquire_index() as index:
+            docs = index.get_retriever(k=k).invoke(question_en)
 
         print(f"\n[QUESTION]\n{question_en}\n")
         print(f"Retrieved {len(docs)} docs (showing first {min(k, len(docs))})\n")
@@ -185,8 +385,8 @@ class QuantLibQuoteAssistant:
         if k is None:
             k = self.k_default
 
-        retriever = self.index.get_retriever(k=k)
-        docs = retriever.invoke(question_en)
+        with self._acquire_index() as index:
+            docs = index.get_retriever(k=k).invoke(question_en)
         docs = docs[:k]
 
         if max_chars_per_doc is None:
@@ -1,12 +1,56 @@
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
+
+from chromadb.api.shared_system_client import SharedSystemClient
 from langchain_community.embeddings import HuggingFaceBgeEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.vectorstores import VectorStoreRetriever
 
 
 from ..config import *
+from ..ingestion.corpora import corpus_shards
+from ..ingestion.manifest import check_manifest, load_manifest
+from .chunk_store import ChunkHandle, ChunkStore
+from .federated_search import FederatedSearch, distance_to_similarity, get_federation, local_shard
+from .lru_cache import LRUCache, normalize_question
+from .query_router import QueryIntentRouter
+from .shared_index import SharedIndexSegment
+
+
+def resolve_active_index_dir() -> Path:
+    """
+    Katalog aktywnej wersji indexu: wskazany w ACTIVE_INDEX (watch mode),
+    a jeśli go nie ma / nie istnieje -> CHROMA_BGE_MD.
+    """
+    if ACTIVE_INDEX_POINTER.exists():
+        active = Path(ACTIVE_INDEX_POINTER.read_text(encoding="utf-8").strip())
+        if active.exists():
+            return active
+    return CHROMA_BGE_MD
+
+
+def release_chroma_system(db_dir: str | Path) -> None:
+    """
+    Zatrzymuje system Chroma dla katalogu indexu.
+    Chroma trzyma jeden System na ścieżkę (SQLite + segmenty HNSW) w cache klasy
+    do końca procesu, także po zniknięciu klientów - bez tego stara wersja indexu
+    zostaje w pamięci po swapie.
+    """
+    target = Path(db_dir).resolve()
+    with SharedSystemClient._refcount_lock:
+        keys = [
+            key for key in SharedSystemClient._identifier_to_system
+            if key != "ephemeral" and Path(key).resolve() == target
+        ]
+        systems = [SharedSystemClient._identifier_to_system.pop(key) for key in keys]
+        for key in keys:
+            SharedSystemClient._identifier_to_refcount.pop(key, None)
+    for system in systems:
+        system.stop()
+
 
 class QuantLibIndex:
     """
@@ -14,6 +58,16 @@ class QuantLibIndex:
     - wczytanie embeddings (BAAI/bge-m3)
     - wczytanie ChromaDB z dysku
     - wystawienie retrievera (as_retriever)
+    - lekkie wyszukiwanie po chunk store (search_handles)
+    - adaptive k + MMR (adaptive_search)
+    - index przykładów kodu + routing pytań o przykłady (routed_search)
+    - cache LRU embeddingów zapytań i wyników wyszukiwania (pre-warm z logu)
+    - multi-query: kilka pod-pytań, jeden batch embeddingów i zapytań (multi_search)
+    - opcjonalnie: dodatkowe korpusy (corpora) - wyszukiwanie federacyjne po shardach
+      w osobnych procesach (jedna federacja na proces), główny index szukany lokalnie,
+      scalanie po skalibrowanym score (federation.last_report)
+    - opcjonalnie: współdzielony segment wektorów dla wielu procesów
+      (share() w rodzicu, shared_segment=spec w workerach - bez Chroma)
 
     Zakładamy, że index został wcześniej zbudowany
     (np. build_index.py) w katalogu db/quantlib_chroma_bge_md_v2.
@@ -24,30 +78,474 @@ class QuantLibIndex:
         db_path: Optional[str | Path] = None,
         model_name: str = EMBEDDING_MODEL,
         k_default: int = DEFAULT_K,
+        embeddings: Optional[HuggingFaceBgeEmbeddings] = None,
+        shared_segment: Optional[Dict[str, Any]] = None,
+        corpora: Optional[Sequence[str]] = None,
     ) -> None:
+        # Worker: podpinamy segment rodzica zamiast własnej kopii Chroma
+        self.shared: Optional[SharedIndexSegment] = None
+        if shared_segment is not None:
+            self.shared = SharedIndexSegment.attach(shared_segment)
+            db_path = self.shared.db_dir
+
         if db_path is None:
-            db_path = CHROMA_BGE_MD
+            db_path = resolve_active_index_dir()
 
         self.db_path = Path(db_path)
         self.k_default = k_default
 
-        # Embeddings BGE (enterprise mode)
-        self.embeddings = HuggingFaceBgeEmbeddings(
+        # cache per wersja indexu - po blue/green swap nowy index startuje pusty
+        self.embed_cache = LRUCache(QUERY_EMBED_CACHE_SIZE)
+        self.retrieval_cache = LRUCache(RETRIEVAL_CACHE_SIZE)
+        # per wątek (sesję): czy bieżące wyszukiwanie dostało wynik częściowy z federacji
+        self._search_state = threading.local()
+
+        # Embeddings BGE (enterprise mode); gotowy model można współdzielić
+        self.embeddings = embeddings or HuggingFaceBgeEmbeddings(
             model_name=model_name,
             encode_kwargs={"normalize_embeddings": True},
             query_instruction=BGE_QUERY_INSTRUCTION,
         )
 
+        # Manifest: ostrzeżenie, jeśli index zbudowano inną konfiguracją
+        # (manifest z samą sekcją "hnsw" = stary index po hnsw_tuner - nie ma czego sprawdzać)
+        self.manifest = load_manifest(self.db_path)
+        if self.manifest is not None and "embedding_model" in self.manifest:
+            for problem in check_manifest(self.manifest, model_name=model_name):
+                print(f"[WARN] Index manifest mismatch: {problem}")
+
+        # index przykładów kodu (tylko w trybie Chroma)
+        self.code_vectorstore: Optional[Chroma] = None
+        self.code_store: Optional[ChunkStore] = None
+        # federacja shardów (tylko w trybie Chroma i gdy są dodatkowe korpusy)
+        self.federation: Optional[FederatedSearch] = None
+        self._local_shard: Optional[Dict[str, Any]] = None
+
+        if self.shared is not None:
+            self.vectorstore = None
+            self.chunk_store = ChunkStore(self.shared.store_dir)
+            return
+
         # Podpięcie Chroma
         self.vectorstore = Chroma(
             embedding_function=self.embeddings,
             persist_directory=str(self.db_path),
+            collection_name=CHROMA_COLLECTION,
+        )
+
+        # Kompaktowy chunk store (mmap); stary index bez store -> budujemy z Chroma
+        self.chunk_store = self._open_chunk_store(self.vectorstore, CHROMA_COLLECTION)
+
+        # Kolekcja przykładów kodu - jeśli index zbudowano z nią
+        client = self.vectorstore._client
+        names = {c if isinstance(c, str) else c.name for c in client.list_collections()}
+        if CHROMA_CODE_COLLECTION in names:
+            self.code_vectorstore = Chroma(
+                client=client,
+                embedding_function=self.embeddings,
+                collection_name=CHROMA_CODE_COLLECTION,
+            )
+            self.code_store = self._open_chunk_store(self.code_vectorstore, CHROMA_CODE_COLLECTION)
+
+        # Dodatkowe korpusy: workery shardów współdzielone w procesie (get_federation);
+        # główny index to shard "<DEFAULT_CORPUS>:000" szukany na już otwartej kolekcji,
+        # index kodu i retriever zostają przy głównym korpusie
+        extra = corpus_shards(ACTIVE_CORPORA if corpora is None else corpora)
+        if extra and self.chunk_store is not None:
+            self.federation = get_federation(extra)
+            if self.federation is not None:
+                self._local_shard = local_shard(
+                    f"{DEFAULT_CORPUS}:000", self.vectorstore._collection, self.chunk_store
+                )
+
+    def _open_chunk_store(self, vectorstore: Chroma, collection_name: str) -> Optional[ChunkStore]:
+        store = ChunkStore.open_if_exists(self.db_path, collection_name)
+        if store is not None:
+            return store
+
+        collection = vectorstore._collection
+        if not collection.count():
+            return None
+        try:
+            ChunkStore.write_from_collection(
+                ChunkStore.path_for(self.db_path, collection_name), collection
+            )
+        except OSError as exc:
+            print(f"[WARN] Could not write chunk store ({exc}) — using full Documents.")
+            return None
+        return ChunkStore.open_if_exists(self.db_path, collection_name)
+
+    @staticmethod
+    def _to_similarity(distances: List[float], collection: Any) -> np.ndarray:
+        """Dystans Chroma -> cosine similarity (embeddingi są znormalizowane)."""
+        return distance_to_similarity(distances, (collection.metadata or {}).get("hnsw:space", "l2"))
+
+    def embed_query(self, query: str) -> List[float]:
+        query = normalize_question(query)
+        return self.embed_cache.get_or_compute(query, lambda: self.embeddings.embed_query(query))
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeddingi wielu zapytań: trafienia z cache, reszta jednym batchem
+        (bge: instrukcja zapytania + encode na liście, jak embed_query).
+        """
+        queries = [normalize_question(q) for q in queries]
+        cached: Dict[str, List[float]] = {}
+        for q in queries:
+            vector = self.embed_cache.peek(q)
+            if vector is not None:
+                cached[q] = vector
+        missing = [q for q in dict.fromkeys(queries) if q not in cached]
+
+        if missing:
+            if isinstance(self.embeddings, HuggingFaceBgeEmbeddings):
+                texts = [self.embeddings.query_instruction + q for q in missing]
+                vectors = self.embeddings.client.encode(texts, **self.embeddings.encode_kwargs).tolist()
+            else:
+                vectors = [self.embeddings.embed_query(q) for q in missing]
+            for q, v in zip(missing, vectors):
+                cached[q] = self.embed_cache.get_or_compute(q, lambda v=v: v)
+
+        return [cached[q] for q in queries]
+
+    def _cached_search(self, key: Tuple[Any, ...], search: Any) -> List[ChunkHandle]:
+        """
+        Wynik wyszukiwania z cache (kopia listy - wołający może ją modyfikować).
+        Wynik częściowy (shard federacji nie odpowiedział) nie trafia do cache,
+        żeby chwilowy problem shardu nie został w odpowiedziach do eviction.
+        """
+        def compute() -> List[ChunkHandle]:
+            self._search_state.partial = False
+            return search()
+
+        return list(self.retrieval_cache.get_or_compute(
+            key, compute, cacheable=lambda: not self._search_state.partial
+        ))
+
+    def _federated_search(
+        self,
+        query_embeddings: List[List[float]],
+        k: int,
+        with_vectors: bool = False,
+    ) -> List[Tuple[List[ChunkHandle], Optional[np.ndarray]]]:
+        status: Dict[str, Any] = {}
+        results = self.federation.search(
+            query_embeddings, k, with_vectors=with_vectors, local=self._local_shard, status=status
+        )
+        if status.get("degraded"):
+            self._search_state.partial = True
+        return results
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        return {"embeddings": self.embed_cache.stats(), "retrieval": self.retrieval_cache.stats()}
+
+    def search_handles(self, query: str, k: Optional[int] = None) -> List[ChunkHandle]:
+        """
+        Top-k jako ChunkHandle: Chroma zwraca tylko id,
+        tekst jest wycinany z chunk store dopiero przy odczycie.
+        """
+        if k is None:
+            k = self.k_default
+        if self.chunk_store is None:
+            raise RuntimeError("Chunk store is not available for this index.")
+
+        query = normalize_question(query)
+        return self._cached_search(
+            ("search", query, k),
+            lambda: self.search_by_vector(self.embed_query(query), k),
+        )
+
+    def search_by_vector(self, query_embedding: List[float], k: int) -> List[ChunkHandle]:
+        """Top-k z głównej kolekcji (albo ze wszystkich shardów) dla gotowego wektora zapytania."""
+        if self.federation is not None:
+            return self._federated_search([query_embedding], k)[0][0]
+        if self.shared is not None:
+            rows, _ = self.shared.search(query_embedding, k)
+            return [self.chunk_store.handle(int(r)) for r in rows]
+
+        res = self.vectorstore._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            include=[],
+        )
+        return self.chunk_store.handles_for_ids(res["ids"][0])
+
+    def search_by_vectors(self, query_embeddings: List[List[float]], k: int) -> List[List[ChunkHandle]]:
+        """Top-k dla wielu wektorów naraz (Chroma: jedno zapytanie z listą wektorów)."""
+        if self.federation is not None:
+            return [handles for handles, _ in self._federated_search(query_embeddings, k)]
+        if self.shared is not None:
+            return [
+                [self.chunk_store.handle(int(r)) for r in self.shared.search(q, k)[0]]
+                for q in query_embeddings
+            ]
+
+        res = self.vectorstore._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            include=[],
+        )
+        return [self.chunk_store.handles_for_ids(ids) for ids in res["ids"]]
+
+    def multi_search(self, queries: List[str], k: Optional[int] = None) -> List[ChunkHandle]:
+        """
+        Multi-query retrieval pod wspólnym budżetem k:
+        - embeddingi wszystkich pod-pytań jednym batchem
+        - wyszukiwania jednym zapytaniem do Chroma (k na pod-pytanie)
+        - scalanie round-robin po rangach (każde pod-pytanie dostaje swój udział
+          w k, pierwsze - zwykle pytanie oryginalne - wybiera pierwsze), bez duplikatów
+        """
+        if k is None:
+            k = self.k_default
+        if self.chunk_store is None:
+            raise RuntimeError("Chunk store is not available for this index.")
+
+        queries = [normalize_question(q) for q in queries]
+        return self._cached_search(
+            ("multi", tuple(queries), k),
+            lambda: self._multi_search(queries, k),
+        )
+
+    def _multi_search(self, queries: List[str], k: int) -> List[ChunkHandle]:
+        ranked = self.search_by_vectors(self.embed_queries(queries), k)
+
+        merged: List[ChunkHandle] = []
+        seen = set()
+        for rank in range(k):
+            for hits in ranked:
+                if rank < len(hits) and hits[rank].id not in seen:
+                    seen.add(hits[rank].id)
+                    merged.append(hits[rank])
+                    if len(merged) == k:
+                        return merged
+        return merged
+
+    def search_code_by_vector(self, query_embedding: List[float], k: int) -> List[Tuple[ChunkHandle, float]]:
+        """Top-k przykładów kodu z podobieństwem (pusta lista, jeśli brak indexu kodu)."""
+        if self.code_vectorstore is None or self.code_store is None:
+            return []
+
+        collection = self.code_vectorstore._collection
+        res = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            include=["distances"],
+        )
+        scores = self._to_similarity(res["distances"][0], collection)
+        return [
+            (self.code_store.handle(self.code_store.row_by_id[cid]), float(score))
+            for cid, score in zip(res["ids"][0], scores)
+            if cid in self.code_store.row_by_id
+        ]
+
+    def routed_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        router: Optional[QueryIntentRouter] = None,
+        min_code_score: float = CODE_ROUTE_MIN_SCORE,
+        adaptive: bool = False,
+    ) -> List[ChunkHandle]:
+        """
+        Pytanie o przykład -> najpierw index kodu (mały, same bloki ``` + podpis),
+        trafienia poniżej min_code_score odpadają, resztę k dopełnia główny index
+        (bez chunków, z których pochodzą już wybrane przykłady).
+        adaptive=True -> dopełnienie z głównego indexu przez odcięcie po score + MMR
+        (jak adaptive_search, k = górny limit).
+        Inne pytania -> search_handles albo adaptive_search.
+        """
+        if k is None:
+            k = self.k_default
+        if self.chunk_store is None:
+            raise RuntimeError("Chunk store is not available for this index.")
+
+        router = router or QueryIntentRouter()
+        query = normalize_question(query)
+        if self.code_store is None or not router.is_code_query(query):
+            return self.adaptive_search(query, k_max=k) if adaptive else self.search_handles(query, k)
+
+        return self._cached_search(
+            ("routed", query, k, min_code_score, adaptive),
+            lambda: self._routed_search(query, k, min_code_score, adaptive),
+        )
+
+    def _routed_search(self, query: str, k: int, min_code_score: float, adaptive: bool = False) -> List[ChunkHandle]:
+        query_embedding = self.embed_query(query)
+        code_hits = [
+            h for h, score in self.search_code_by_vector(query_embedding, k)
+            if score >= min_code_score
+        ]
+        if len(code_hits) >= k:
+            return code_hits
+
+        parents = {h.metadata.get("parent_id") for h in code_hits}
+        if adaptive:
+            return code_hits + self._adaptive_select(
+                query_embedding,
+                k_max=k - len(code_hits),
+                fetch_k=ADAPTIVE_FETCH_K,
+                min_score=ADAPTIVE_MIN_SCORE,
+                max_gap=ADAPTIVE_MAX_GAP,
+                lambda_mult=MMR_LAMBDA,
+                exclude=parents,
+            )
+
+        prose = [
+            h for h in self.search_by_vector(query_embedding, k)
+            if h.id not in parents
+        ]
+        return code_hits + prose[: k - len(code_hits)]
+
+    def _candidates(self, query_embedding: List[float], n: int) -> Tuple[List[ChunkHandle], np.ndarray]:
+        """Top-n kandydatów razem z ich wektorami (do score i MMR)."""
+        if self.federation is not None:
+            handles, vectors = self._federated_search([query_embedding], n, with_vectors=True)[0]
+            if vectors is None:
+                vectors = np.zeros((0, len(query_embedding)), dtype=np.float32)
+            return handles, vectors
+        if self.shared is not None:
+            rows, _ = self.shared.search(query_embedding, n)
+            return [self.chunk_store.handle(int(r)) for r in rows], self.shared.vectors[rows]
+
+        res = self.vectorstore._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n,
+            include=["embeddings"],
+        )
+        ids = res["ids"][0]
+        vectors = np.asarray(res["embeddings"][0], dtype=np.float32).reshape(len(ids), -1)
+        known = [i for i, cid in enumerate(ids) if cid in self.chunk_store.row_by_id]
+        return self.chunk_store.handles_for_ids(ids), vectors[known]
+
+    def adaptive_search(
+        self,
+        query: str,
+        k_max: int = ADAPTIVE_K_MAX,
+        fetch_k: int = ADAPTIVE_FETCH_K,
+        min_score: float = ADAPTIVE_MIN_SCORE,
+        max_gap: float = ADAPTIVE_MAX_GAP,
+        lambda_mult: float = MMR_LAMBDA,
+    ) -> List[ChunkHandle]:
+        """
+        Retrieval z adaptacyjnym k:
+        1) over-fetch fetch_k kandydatów z wektorami
+        2) odcięcie: score < min_score albo skok score > max_gap (min. 1 chunk)
+        3) MMR na pozostałych - jedna macierz podobieństw w NumPy, max k_max chunków
+        Łatwe pytanie -> 1-2 chunki, trudne -> do k_max, bez bliźniaczych sąsiadów.
+        """
+        if self.chunk_store is None:
+            raise RuntimeError("Chunk store is not available for this index.")
+
+        query = normalize_question(query)
+        return self._cached_search(
+            ("adaptive", query, k_max, fetch_k, min_score, max_gap, lambda_mult),
+            lambda: self._adaptive_search(query, k_max, fetch_k, min_score, max_gap, lambda_mult),
+        )
+
+    def _adaptive_search(
+        self,
+        query: str,
+        k_max: int,
+        fetch_k: int,
+        min_score: float,
+        max_gap: float,
+        lambda_mult: float,
+    ) -> List[ChunkHandle]:
+        return self._adaptive_select(
+            self.embed_query(query), k_max, fetch_k, min_score, max_gap, lambda_mult
+        )
+
+    def _adaptive_select(
+        self,
+        query_embedding: List[float],
+        k_max: int,
+        fetch_k: int,
+        min_score: float,
+        max_gap: float,
+        lambda_mult: float,
+        exclude: Optional[set] = None,
+    ) -> List[ChunkHandle]:
+        """Odcięcie po score + MMR dla gotowego wektora; exclude -> id pomijanych chunków."""
+        handles, vectors = self._candidates(query_embedding, max(fetch_k, k_max))
+        if exclude:
+            keep = [i for i, h in enumerate(handles) if h.id not in exclude]
+            handles, vectors = [handles[i] for i in keep], vectors[keep]
+        if not handles:
+            return []
+
+        # embeddingi znormalizowane -> iloczyn skalarny = cosine similarity
+        scores = vectors @ np.asarray(query_embedding, dtype=np.float32)
+        order = np.argsort(-scores)
+        scores = scores[order]
+
+        keep = self._cutoff(scores, min_score, max_gap)
+        order = order[:keep]
+
+        return [handles[i] for i in self._mmr(vectors[order], scores[:keep], k_max, lambda_mult, order)]
+
+    @staticmethod
+    def _cutoff(scores: np.ndarray, min_score: float, max_gap: float) -> int:
+        """Ile kandydatów (score malejąco) zostaje: do pierwszego score < min_score albo skoku > max_gap; min. 1."""
+        gaps = np.diff(scores) < -max_gap
+        cut = np.flatnonzero((scores[1:] < min_score) | gaps)
+        return int(cut[0]) + 1 if cut.size else len(scores)
+
+    @staticmethod
+    def _mmr(
+        vectors: np.ndarray,
+        relevance: np.ndarray,
+        k: int,
+        lambda_mult: float,
+        index_map: np.ndarray,
+    ) -> List[int]:
+        """Maximal marginal relevance; zwraca indeksy z index_map w kolejności wyboru."""
+        n = len(relevance)
+        similarity = vectors @ vectors.T
+        selected = [0]
+        max_sim = similarity[0].copy()
+        available = np.ones(n, dtype=bool)
+        available[0] = False
+
+        while len(selected) < min(k, n):
+            mmr = lambda_mult * relevance - (1.0 - lambda_mult) * max_sim
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_sim, similarity[best], out=max_sim)
+
+        return [int(index_map[i]) for i in selected]
+
+    def close(self) -> None:
+        """
+        Zwalnia wersję indexu: chunk store (mmap) i system Chroma dla db_path.
+        Federacja jest współdzielona w procesie (get_federation) - zostaje.
+        """
+        for store in (self.chunk_store, self.code_store):
+            if store is not None:
+                store.close()
+        if self.shared is not None:
+            self.shared.close()
+            return
+        release_chroma_system(self.db_path)
+
+    def share(self, name: Optional[str] = None) -> SharedIndexSegment:
+        """
+        Proces-rodzic: tworzy współdzielony segment wektorów.
+        Workery dostają segment.spec() i tworzą QuantLibIndex(shared_segment=spec).
+        """
+        if self.vectorstore is None or self.chunk_store is None:
+            raise RuntimeError("Only a Chroma-backed index with a chunk store can be shared.")
+        return SharedIndexSegment.create(
+            self.vectorstore._collection, self.chunk_store, self.db_path, name=name
         )
 
     def get_retriever(self, k: Optional[int] = None) -> VectorStoreRetriever:
         """
         Zwraca VectorStoreRetriever z ustawionym k.
         """
+        if self.vectorstore is None:
+            raise RuntimeError("Index attached to a shared segment has no Chroma retriever.")
         if k is None:
             k = self.k_default
         return self.vectorstore.as_retriever(search_kwargs={"k": k})
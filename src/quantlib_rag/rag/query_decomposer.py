@@ -0,0 +1,86 @@
+import re
+from typing import Any, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from ..config import MULTI_QUERY_MAX_PARTS, MULTI_QUERY_MIN_WORDS
+
+
+# "... and price a bond" - 'and' przed czasownikiem zaczyna nowe zadanie,
+# 'deposits and swaps' zostaje razem
+_ACTION_VERBS = (
+    "build|create|construct|define|set|setup|bootstrap|compute|calculate|price|value|"
+    "get|use|make|plot|compare|show|evaluate|add|convert|generate|discount|interpolate|"
+    "calibrate|check|find|list|explain|print|apply"
+)
+_SPLIT_RE = re.compile(
+    rf"\s*(?:;|\?\s+|,?\s+and\s+then\s+|,?\s+then\s+|,?\s+and\s+(?=(?:{_ACTION_VERBS})\b)|,?\s+also\s+)\s*",
+    re.IGNORECASE,
+)
+_LEADING_RE = re.compile(r"^(?:and|then|also)\s+", re.IGNORECASE)
+_LIST_PREFIX_RE = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
+
+
+class QueryDecomposer:
+    """
+    Rozbija pytanie złożone na pod-pytania (multi-query retrieval):
+    - domyślnie heurystyki: ';', '?', 'then', 'and' + czasownik
+    - opcjonalnie LLM (jedno krótkie wywołanie), z fallbackiem na heurystyki
+
+    split() zwraca [pytanie] dla pytań prostych, a dla złożonych
+    [pytanie, pod-pytanie 1, ...] - oryginał zostaje jako kontekst całości.
+    """
+
+    def __init__(
+        self,
+        llm: Optional[Any] = None,
+        max_parts: int = MULTI_QUERY_MAX_PARTS,
+        min_words: int = MULTI_QUERY_MIN_WORDS,
+    ) -> None:
+        self.llm = llm
+        self.max_parts = max_parts
+        self.min_words = min_words
+
+    def heuristic_parts(self, question: str) -> List[str]:
+        parts: List[str] = []
+        for part in _SPLIT_RE.split(question.strip()):
+            part = _LEADING_RE.sub("", part.strip(" ,.?"))
+            if not part:
+                continue
+            # za krótki fragment ("swaps") dokleja się do poprzedniego
+            if parts and len(part.split()) < self.min_words:
+                parts[-1] = f"{parts[-1]} {part}"
+            else:
+                parts.append(part)
+        return parts
+
+    def llm_parts(self, question: str) -> List[str]:
+        messages = [
+            SystemMessage(
+                content=(
+                    "Split the user's QuantLib-Python question into independent search queries, "
+                    f"at most {self.max_parts}, one per line, no numbering, no extra text. "
+                    "If the question asks for only one thing, return it unchanged."
+                )
+            ),
+            HumanMessage(content=question),
+        ]
+        resp = self.llm.invoke(messages)
+        lines = [_LIST_PREFIX_RE.sub("", line).strip() for line in resp.content.splitlines()]
+        return [line for line in lines if len(line.split()) >= self.min_words]
+
+    def split(self, question: str) -> List[str]:
+        question = " ".join(question.split())
+        parts: List[str] = []
+        if self.llm is not None:
+            try:
+                parts = self.llm_parts(question)
+            except Exception as exc:
+                print(f"[WARN] LLM query decomposition failed ({exc}) — using heuristics.")
+        if not parts:
+            parts = self.heuristic_parts(question)
+
+        parts = [p for p in parts if p.lower() != question.lower()][: self.max_parts]
+        if len(parts) < 2:
+            return [question]
+        return [question] + parts
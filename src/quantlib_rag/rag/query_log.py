@@ -0,0 +1,265 @@
+"""
+Lokalny log zapytań asystenta (opcjonalny, domyślnie wyłączony).
+
+Każdy wpis: znacznik czasu, znormalizowane pytanie (albo tylko jego hash -
+QUERY_LOG_PRIVACY="hash"), parametry retrievalu, id zwróconych chunków i czasy.
+Backend: rotowane pliki JSONL albo sqlite (przycinany do QUERY_LOG_MAX_ROWS).
+
+Log zasila:
+- pre-warm na starcie (najczęstsze pytania -> cache embeddingów i wyników)
+- offline analizę gorących pytań / chunków
+
+Usage:
+    python -m src.quantlib_rag.rag.query_log [--top 20]
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from ..config import (
+    QUERY_LOG_DIR,
+    QUERY_LOG_BACKEND,
+    QUERY_LOG_PRIVACY,
+    QUERY_LOG_MAX_BYTES,
+    QUERY_LOG_BACKUPS,
+    QUERY_LOG_MAX_ROWS,
+)
+from .lru_cache import normalize_question
+
+
+_PRIVACY_MODES = ("text", "hash")
+_PRUNE_EVERY = 1000
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+# ---------- BACKENDY ----------
+
+class _JsonlBackend:
+    """queries.jsonl + queries.jsonl.1..N (rotacja po rozmiarze, jak RotatingFileHandler)."""
+
+    def __init__(self, path: Path, max_bytes: int, backups: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                src.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+            self._rotate()
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(line)
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        # od najstarszego pliku do bieżącego
+        paths = [self.path.with_name(f"{self.path.name}.{i}") for i in range(self.backups, 0, -1)]
+        for path in paths + [self.path]:
+            if not path.exists():
+                continue
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # ucięta linia po awarii procesu
+
+
+class _SqliteBackend:
+    """Jedna tabela query_log; najstarsze wiersze ponad max_rows są usuwane."""
+
+    def __init__(self, path: Path, max_rows: int) -> None:
+        self.max_rows = max_rows
+        self._inserts = 0
+        # Streamlit: zapisy z różnych wątków, serializowane przez lock QueryLog
+        # (jeden QueryLog na proces - shared_query_log)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_log ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT, question TEXT, "
+            "question_hash TEXT, record TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS query_log_hash ON query_log (question_hash)")
+        self._conn.commit()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._conn.execute(
+            "INSERT INTO query_log (ts, question, question_hash, record) VALUES (?, ?, ?, ?)",
+            (record["ts"], record["question"], record["question_hash"], json.dumps(record, ensure_ascii=False)),
+        )
+        self._inserts += 1
+        if self._inserts % _PRUNE_EVERY == 0:
+            self._conn.execute(
+                "DELETE FROM query_log WHERE id <= (SELECT MAX(id) FROM query_log) - ?",
+                (self.max_rows,),
+            )
+        self._conn.commit()
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for (raw,) in self._conn.execute("SELECT record FROM query_log ORDER BY id"):
+            yield json.loads(raw)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ---------- LOG ----------
+
+class QueryLog:
+    """
+    Log zapytań z konfigurowalną prywatnością:
+    - privacy="text" -> znormalizowane pytanie + hash
+    - privacy="hash" -> tylko hash (liczymy gorące pytania, ale pre-warm nie ma czego odtworzyć)
+
+    Lock serializuje zapisy (i rotację plików) tylko w obrębie instancji,
+    więc w aplikacji: jedna instancja na proces - shared_query_log().
+    """
+
+    def __init__(
+        self,
+        log_dir: Optional[Path] = None,
+        backend: str = QUERY_LOG_BACKEND,
+        privacy: str = QUERY_LOG_PRIVACY,
+        max_bytes: int = QUERY_LOG_MAX_BYTES,
+        backups: int = QUERY_LOG_BACKUPS,
+        max_rows: int = QUERY_LOG_MAX_ROWS,
+    ) -> None:
+        if privacy not in _PRIVACY_MODES:
+            raise ValueError(f"Unknown query log privacy mode: {privacy!r} (expected one of {_PRIVACY_MODES})")
+
+        self.log_dir = Path(log_dir or QUERY_LOG_DIR)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.privacy = privacy
+        self._lock = threading.Lock()
+
+        if backend == "jsonl":
+            self._backend = _JsonlBackend(self.log_dir / "queries.jsonl", max_bytes, backups)
+        elif backend == "sqlite":
+            self._backend = _SqliteBackend(self.log_dir / "queries.sqlite3", max_rows)
+        else:
+            raise ValueError(f"Unknown query log backend: {backend!r} (expected 'jsonl' or 'sqlite')")
+
+    def record(
+        self,
+        question: str,
+        chunk_ids: Sequence[Optional[str]],
+        timings_ms: Dict[str, float],
+        **params: Any,
+    ) -> None:
+        """Zapisuje jedno zapytanie; błąd zapisu logu nie może zepsuć odpowiedzi."""
+        normalized = normalize_question(question)
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "question": normalized if self.privacy == "text" else None,
+            "question_hash": question_hash(normalized),
+            "params": params,
+            "chunk_ids": list(chunk_ids),
+            "timings_ms": {name: round(value, 2) for name, value in timings_ms.items()},
+        }
+        try:
+            with self._lock:
+                self._backend.write(record)
+        except (OSError, sqlite3.Error) as exc:
+            print(f"[WARN] Could not write query log: {exc}")
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            records = list(self._backend.records())
+        return iter(records)
+
+    # ---------- ANALIZA ----------
+
+    def top_queries(self, n: int) -> List[Dict[str, Any]]:
+        """
+        Najczęstsze pytania: hash, treść (jeśli logowana), liczba wystąpień,
+        średni czas całkowity i najczęstsze parametry retrievalu (do pre-warm).
+        """
+        counts: Counter = Counter()
+        questions: Dict[str, Optional[str]] = {}
+        totals: Dict[str, List[float]] = defaultdict(list)
+        params: Dict[str, Counter] = defaultdict(Counter)
+
+        for rec in self.records():
+            key = rec["question_hash"]
+            counts[key] += 1
+            questions[key] = rec.get("question") or questions.get(key)
+            if "total" in rec.get("timings_ms", {}):
+                totals[key].append(rec["timings_ms"]["total"])
+            params[key][json.dumps(rec.get("params", {}), sort_keys=True)] += 1
+
+        return [
+            {
+                "question": questions[key],
+                "question_hash": key,
+                "count": count,
+                "mean_total_ms": round(sum(totals[key]) / len(totals[key]), 2) if totals[key] else None,
+                "params": json.loads(params[key].most_common(1)[0][0]),
+            }
+            for key, count in counts.most_common(n)
+        ]
+
+    def hot_chunks(self, n: int) -> List[Dict[str, Any]]:
+        """Chunki najczęściej trafiające do kontekstu."""
+        counts: Counter = Counter()
+        for rec in self.records():
+            counts.update(cid for cid in rec.get("chunk_ids", []) if cid)
+        return [{"chunk_id": cid, "count": count} for cid, count in counts.most_common(n)]
+
+
+# ---------- JEDEN LOG NA PROCES ----------
+
+_SHARED_LOGS: Dict[tuple, QueryLog] = {}
+_SHARED_LOGS_LOCK = threading.Lock()
+
+
+def shared_query_log(log_dir: Optional[Path] = None, backend: str = QUERY_LOG_BACKEND) -> QueryLog:
+    """
+    QueryLog współdzielony przez wszystkie sesje Streamlit w procesie:
+    osobne instancje miałyby osobne locki i ścigałyby się przy rotacji plików.
+    """
+    key = (str(Path(log_dir or QUERY_LOG_DIR).resolve()), backend)
+    with _SHARED_LOGS_LOCK:
+        if key not in _SHARED_LOGS:
+            _SHARED_LOGS[key] = QueryLog(log_dir=log_dir, backend=backend)
+        return _SHARED_LOGS[key]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize the local QuantLib query log.")
+    parser.add_argument("--log-dir", type=Path, default=QUERY_LOG_DIR)
+    parser.add_argument("--backend", default=QUERY_LOG_BACKEND, choices=("jsonl", "sqlite"))
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    log = QueryLog(log_dir=args.log_dir, backend=args.backend)
+
+    print(f"Top {args.top} queries:")
+    for q in log.top_queries(args.top):
+        text = q["question"] or f"<hash {q['question_hash'][:12]}>"
+        print(f"  {q['count']:5d}  {q['mean_total_ms'] or '-':>8} ms  {text}")
+
+    print(f"\nTop {args.top} chunks:")
+    for c in log.hot_chunks(args.top):
+        print(f"  {c['count']:5d}  {c['chunk_id']}")
+
+
+if __name__ == "__main__":
+    main()
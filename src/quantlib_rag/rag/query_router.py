@@ -0,0 +1,63 @@
+import re
+from typing import List, Optional
+
+
+# jawna prośba o kod: "give a QuantLib-Python example of ...", "show code for ..."
+_EXPLICIT_CODE_PATTERNS: List[str] = [
+    r"\bexamples?\b",
+    r"\bsnippets?\b",
+    r"\bsample code\b",
+    r"\bcode\b",
+]
+
+# słabszy sygnał: pytania "jak zrobić", nazwy API
+_HOWTO_PATTERNS: List[str] = [
+    r"\bshow (me )?how\b",
+    r"\bhow (do|can|should) (i|we|you)\b",
+    r"\bhow to (build|create|construct|compute|calculate|price|set ?up|use|make|get)\b",
+    r"\b(write|implement)\b",
+    r"\bql\.\w+",
+]
+
+# pytania definicyjne - przy słabym sygnale zostają w prozie
+_PROSE_PATTERNS: List[str] = [
+    r"^\s*(what|which|why|when) (is|are|does|do)\b",
+    r"\b(explain|describe|difference between|meaning of|definition)\b",
+]
+
+
+def _compile(patterns: List[str]) -> List[re.Pattern]:
+    return [re.compile(p, re.IGNORECASE) for p in patterns]
+
+
+class QueryIntentRouter:
+    """
+    Tani klasyfikator intencji pytania (reguły, bez modelu):
+    - "code"  -> użytkownik chce przykładu kodu -> najpierw index przykładów
+    - "prose" -> reszta -> zwykły index chunków
+
+    Jawna prośba o przykład / kod zawsze wygrywa; pytania "how to ..."
+    trafiają do kodu, o ile nie wyglądają na pytanie definicyjne.
+    """
+
+    def __init__(
+        self,
+        explicit_patterns: Optional[List[str]] = None,
+        howto_patterns: Optional[List[str]] = None,
+        prose_patterns: Optional[List[str]] = None,
+    ) -> None:
+        self.explicit_re = _compile(explicit_patterns or _EXPLICIT_CODE_PATTERNS)
+        self.howto_re = _compile(howto_patterns or _HOWTO_PATTERNS)
+        self.prose_re = _compile(prose_patterns or _PROSE_PATTERNS)
+
+    def classify(self, question: str) -> str:
+        if any(r.search(question) for r in self.explicit_re):
+            return "code"
+        if any(r.search(question) for r in self.howto_re) and not any(
+            r.search(question) for r in self.prose_re
+        ):
+            return "code"
+        return "prose"
+
+    def is_code_query(self, question: str) -> bool:
+        return self.classify(question) == "code"
@@ -0,0 +1,108 @@
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import CHROMA_COLLECTION
+from .chunk_store import ChunkStore
+
+
+class SharedIndexSegment:
+    """
+    Read-only segment z macierzą wektorów indexu, współdzielony między procesami.
+
+    - create(...) -> proces-rodzic kopiuje wektory (w kolejności wierszy chunk store)
+                     do multiprocessing.shared_memory, raz
+    - attach(...) -> worker podpina ten sam blok bez kopiowania (np.ndarray na buforze)
+
+    Teksty chunków nie są kopiowane: chunk store to plik mmap,
+    więc strony korpusu i tak są współdzielone przez page cache.
+    spec() zwraca mały, picklowalny opis segmentu dla workerów.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, int], db_dir: Path, owner: bool) -> None:
+        self._shm = shm
+        self.shape = shape
+        self.db_dir = Path(db_dir)
+        self.owner = owner
+        self.vectors = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        self.vectors.flags.writeable = False
+
+    # ---------- CREATE / ATTACH ----------
+
+    @classmethod
+    def create(
+        cls,
+        collection: Any,
+        chunk_store: ChunkStore,
+        db_dir: Path,
+        name: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> "SharedIndexSegment":
+        """Kopiuje wektory kolekcji Chroma do nowego bloku shared memory."""
+        n = len(chunk_store)
+        first = collection.get(limit=1, include=["embeddings"])
+        if not n or not first["ids"]:
+            raise RuntimeError("Cannot share an empty index.")
+        dim = len(first["embeddings"][0])
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=n * dim * 4)
+        matrix = np.ndarray((n, dim), dtype=np.float32, buffer=shm.buf)
+
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            rows = [chunk_store.row_by_id[cid] for cid in page["ids"]]
+            matrix[rows] = np.asarray(page["embeddings"], dtype=np.float32)
+            offset += len(page["ids"])
+
+        del matrix
+        print(f"[INFO] Shared index segment '{shm.name}': {n} x {dim} float32 ({n * dim * 4 / 1e6:.1f} MB)")
+        return cls(shm, (n, dim), db_dir, owner=True)
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any]) -> "SharedIndexSegment":
+        """Podpina istniejący segment (w workerze) bez kopiowania danych."""
+        try:
+            shm = shared_memory.SharedMemory(name=spec["name"], create=False, track=False)
+        except TypeError:
+            # Python < 3.13: niezależny proces ma własny resource_tracker, który
+            # przy wyjściu skasowałby segment rodzica; dzieci multiprocessing
+            # dzielą trackera z rodzicem, więc im nic nie wyrejestrowujemy
+            shm = shared_memory.SharedMemory(name=spec["name"], create=False)
+            if mp.parent_process() is None:
+                resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, tuple(spec["shape"]), Path(spec["db_dir"]), owner=False)
+
+    def spec(self) -> Dict[str, Any]:
+        return {"name": self._shm.name, "shape": list(self.shape), "db_dir": str(self.db_dir)}
+
+    @property
+    def store_dir(self) -> Path:
+        return ChunkStore.path_for(self.db_dir, CHROMA_COLLECTION)
+
+    # ---------- SEARCH ----------
+
+    def search(self, query_embedding: List[float] | np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dokładny top-k po iloczynie skalarnym (embeddingi są znormalizowane,
+        więc to cosine similarity). Zwraca (wiersze, score) malejąco.
+        """
+        q = np.asarray(query_embedding, dtype=np.float32)
+        scores = self.vectors @ q
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        order = top[np.argsort(-scores[top])]
+        return order, scores[order]
+
+    # ---------- CLEANUP ----------
+
+    def close(self) -> None:
+        self.vectors = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
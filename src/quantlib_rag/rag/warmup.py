@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import HumanMessage
+
+from ..config import (
+    OLLAMA_BASE_URL,
+    OLLAMA_KEEP_ALIVE,
+    WARMUP_BATCH_SIZES,
+)
+
+
+class Readiness:
+    """
+    Flagi gotowości procesu (health / readiness):
+    - index       -> Chroma / chunk store odpowiadają
+    - embeddings  -> bge-m3 załadowany, pierwsze inference za nami
+    - llm         -> backend LLM odpowiedział (albo pominięty)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._checks: Dict[str, Dict[str, Any]] = {}
+
+    def mark(self, name: str, ok: bool, seconds: float = 0.0, detail: str = "") -> None:
+        with self._lock:
+            self._checks[name] = {"ok": ok, "seconds": round(seconds, 3), "detail": detail}
+
+    def _is_ready(self) -> bool:
+        required = ("index", "embeddings")
+        return all(n in self._checks for n in required) and all(
+            c["ok"] for c in self._checks.values()
+        )
+
+    @property
+    def is_ready(self) -> bool:
+        with self._lock:
+            return self._is_ready()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ready": self._is_ready(), "checks": dict(self._checks)}
+
+
+# jeden stan gotowości na proces
+READINESS = Readiness()
+
+
+# ---------- OLLAMA ----------
+
+def ollama_ready(base_url: str = OLLAMA_BASE_URL, timeout: float = 2.0) -> bool:
+    """Czy serwer Ollama odpowiada (GET /api/tags)."""
+    try:
+        with urllib.request.urlopen(f"{base_url}/api/tags", timeout=timeout) as resp:
+            return resp.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def preload_ollama(
+    model: str = "mistral",
+    keep_alive: str | int = OLLAMA_KEEP_ALIVE,
+    base_url: str = OLLAMA_BASE_URL,
+    timeout: float = 300.0,
+) -> bool:
+    """
+    Ładuje model do pamięci Ollamy i przypina go na keep_alive
+    (pusty prompt = tylko load, bez generowania). Działa między procesami,
+    więc main.py może to zrobić przed startem Streamlit.
+    """
+    payload = json.dumps({"model": model, "prompt": "", "keep_alive": keep_alive}).encode("utf-8")
+    req = urllib.request.Request(
+        f"{base_url}/api/generate",
+        data=payload,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status == 200
+    except (urllib.error.URLError, OSError) as exc:
+        print(f"[WARN] Could not preload Ollama model '{model}': {exc}")
+        return False
+
+
+# ---------- WARM-UP ----------
+
+def warm_up(
+    index: Any,
+    llm: Optional[Any] = None,
+    batch_sizes: Sequence[int] = WARMUP_BATCH_SIZES,
+    readiness: Readiness = READINESS,
+    warm_index: bool = True,
+) -> Dict[str, Any]:
+    """
+    Rozgrzewa proces przed pierwszym pytaniem:
+    - embeddingi dla batchy o rozmiarach batch_sizes (query i documents)
+    - jedno wyszukiwanie (HNSW + chunk store w page cache)
+    - opcjonalnie jedno krótkie wywołanie LLM
+    warm_index=False -> tylko LLM (index rozgrzany wcześniej w tym procesie).
+    Wynik ląduje w readiness; zwraca readiness.status().
+    """
+    if warm_index:
+        started = time.perf_counter()
+        try:
+            index.embeddings.embed_query("warm-up")
+            for size in batch_sizes:
+                index.embeddings.embed_documents(["QuantLib warm-up sentence."] * size)
+            readiness.mark("embeddings", True, time.perf_counter() - started)
+        except Exception as exc:
+            readiness.mark("embeddings", False, time.perf_counter() - started, str(exc))
+
+        started = time.perf_counter()
+        try:
+            if index.chunk_store is not None:
+                hits = index.search_handles("yield term structure", k=1)
+                detail = f"{len(index.chunk_store)} chunks"
+            else:
+                hits = index.get_retriever(k=1).invoke("yield term structure")
+                detail = "no chunk store"
+            readiness.mark("index", bool(hits), time.perf_counter() - started, detail)
+        except Exception as exc:
+            readiness.mark("index", False, time.perf_counter() - started, str(exc))
+
+    if llm is not None:
+        started = time.perf_counter()
+        try:
+            llm.invoke([HumanMessage(content="Reply with: ok")])
+            readiness.mark("llm", True, time.perf_counter() - started)
+        except Exception as exc:
+            readiness.mark("llm", False, time.perf_counter() - started, str(exc))
+
+    status = readiness.status()
+    for name, check in status["checks"].items():
+        state = "OK" if check["ok"] else "FAILED"
+        print(f"[INFO] Warm-up {name}: {state} in {check['seconds']:.2f}s {check['detail']}".rstrip())
+    return status
+
+
+# ---------- PRE-WARM Z LOGU ZAPYTAŃ ----------
+
+def prewarm_queries(
+    retrieve: Callable[[str, Dict[str, Any]], Any],
+    queries: List[Dict[str, Any]],
+    readiness: Readiness = READINESS,
+) -> int:
+    """
+    Odtwarza najczęstsze pytania z logu (QueryLog.top_queries) przez retrieve(question, params),
+    żeby wypełnić cache embeddingów i wyników wyszukiwania. Zwraca liczbę odtworzonych pytań.
+    Pre-warm jest opcjonalny: błędy tylko logujemy, readiness zostaje bez zmian.
+    """
+    replayable = [q for q in queries if q.get("question")]
+    if not replayable:
+        if queries:
+            print("[INFO] Pre-warm skipped: query log stores hashes only (privacy=hash).")
+        return 0
+
+    started = time.perf_counter()
+    done = 0
+    for q in replayable:
+        try:
+            retrieve(q["question"], q.get("params") or {})
+            done += 1
+        except Exception as exc:
+            print(f"[WARN] Pre-warm query failed ({exc}): {q['question'][:80]}")
+
+    seconds = time.perf_counter() - started
+    readiness.mark("prewarm", True, seconds, f"{done}/{len(replayable)} queries")
+    print(f"[INFO] Pre-warm: {done}/{len(replayable)} top queries replayed in {seconds:.2f}s")
+    return done
@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+
+
+def unit(*xs: float) -> np.ndarray:
+    v = np.asarray(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+# ---------- ADAPTIVE CUT-OFF ----------
+
+def test_cutoff_keeps_all_when_scores_are_close_and_high():
+    scores = np.array([0.82, 0.80, 0.79, 0.77], dtype=np.float32)
+    assert QuantLibIndex._cutoff(scores, min_score=0.5, max_gap=0.1) == 4
+
+
+def test_cutoff_stops_at_large_gap():
+    scores = np.array([0.85, 0.83, 0.60, 0.59], dtype=np.float32)
+    assert QuantLibIndex._cutoff(scores, min_score=0.5, max_gap=0.1) == 2
+
+
+def test_cutoff_stops_below_min_score():
+    scores = np.array([0.70, 0.65, 0.48, 0.47], dtype=np.float32)
+    assert QuantLibIndex._cutoff(scores, min_score=0.5, max_gap=0.1) == 2
+
+
+def test_cutoff_always_keeps_best_candidate():
+    scores = np.array([0.30, 0.29], dtype=np.float32)
+    assert QuantLibIndex._cutoff(scores, min_score=0.5, max_gap=0.1) == 1
+
+
+# ---------- MMR ----------
+
+def test_mmr_skips_near_twin_of_first_pick():
+    vectors = np.vstack([unit(1, 0, 0), unit(1, 0.01, 0), unit(0, 1, 0)])
+    relevance = np.array([0.9, 0.89, 0.7], dtype=np.float32)
+
+    picked = QuantLibIndex._mmr(vectors, relevance, k=2, lambda_mult=0.5, index_map=np.arange(3))
+
+    assert picked == [0, 2]
+
+
+def test_mmr_with_lambda_one_is_relevance_order():
+    vectors = np.vstack([unit(1, 0, 0), unit(1, 0.01, 0), unit(0, 1, 0)])
+    relevance = np.array([0.9, 0.89, 0.7], dtype=np.float32)
+
+    picked = QuantLibIndex._mmr(vectors, relevance, k=3, lambda_mult=1.0, index_map=np.arange(3))
+
+    assert picked == [0, 1, 2]
+
+
+def test_mmr_maps_indices_and_caps_at_k():
+    vectors = np.vstack([unit(1, 0), unit(0, 1), unit(1, 1)])
+    relevance = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    index_map = np.array([7, 3, 5])
+
+    picked = QuantLibIndex._mmr(vectors, relevance, k=2, lambda_mult=0.5, index_map=index_map)
+
+    assert picked == [7, 3]
+    assert sorted(QuantLibIndex._mmr(vectors, relevance, k=10, lambda_mult=0.5, index_map=index_map)) == [3, 5, 7]
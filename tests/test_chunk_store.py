@@ -0,0 +1,63 @@
+import pytest
+
+from src.quantlib_rag.rag.chunk_store import ChunkStore
+
+
+TEXTS = [
+    "ql.Schedule builds the coupon dates.",
+    "Zero-coupon curve: zł € ∑ — multibyte text.",
+    "",
+]
+METADATAS = [{"source": "dates.md"}, {"source": "curves.md"}, {"source": "dates.md"}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    ChunkStore.write(tmp_path / "store", ids=["a", "b", "c"], texts=TEXTS, metadatas=METADATAS)
+    opened = ChunkStore(tmp_path / "store")
+    yield opened
+    opened.close()
+
+
+def test_write_read_round_trip(store):
+    assert len(store) == 3
+    assert [store.text(r) for r in range(3)] == TEXTS
+    assert [dict(store.metadata(r)) for r in range(3)] == METADATAS
+    # identyczne metadane zapisane raz
+    assert store.meta_index[0] == store.meta_index[2]
+
+
+def test_max_chars_never_splits_multibyte_characters(store):
+    for n in range(len(TEXTS[1]) + 2):
+        assert store.text(1, max_chars=n) == TEXTS[1][:n]
+    assert store.handle(0).text(max_chars=2) == "ql"
+
+
+def test_handles_for_ids_skip_unknown_ids(store):
+    handles = store.handles_for_ids(["c", "gone", "a"])
+
+    assert [h.id for h in handles] == ["c", "a"]
+    assert handles[1].page_content == TEXTS[0]
+    assert handles[1].metadata["source"] == "dates.md"
+
+
+def test_open_if_exists(tmp_path, store):
+    assert ChunkStore.open_if_exists(tmp_path / "missing") is None
+
+    ChunkStore.write(ChunkStore.path_for(tmp_path / "db"), ids=["x"], texts=["text"], metadatas=[None])
+    opened = ChunkStore.open_if_exists(tmp_path / "db")
+    assert opened.text(0) == "text" and dict(opened.metadata(0)) == {}
+    opened.close()
+
+
+def test_rewrite_keeps_open_mmap_readable(tmp_path, store):
+    # przebudowa shardu przy działającym serwerze: stary mmap czyta stare pliki
+    ChunkStore.write(tmp_path / "store", ids=["z"], texts=["short"], metadatas=[{}])
+
+    assert store.text(0) == TEXTS[0]
+    assert store.text(1, max_chars=200) == TEXTS[1]
+
+    rebuilt = ChunkStore(tmp_path / "store")
+    assert rebuilt.ids == ["z"] and rebuilt.text(0) == "short"
+    rebuilt.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
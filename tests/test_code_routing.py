@@ -0,0 +1,88 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.quantlib_rag.ingestion.code_examples import example_id, extract_code_examples
+from src.quantlib_rag.rag.query_router import QueryIntentRouter
+
+
+# ---------- ROUTER ----------
+
+@pytest.mark.parametrize(
+    "question, intent",
+    [
+        ("Give a QuantLib-Python example of building a flat yield curve", "code"),
+        ("Show code for a vanilla swap", "code"),
+        ("How do I price a fixed rate bond?", "code"),
+        ("how to build a Schedule", "code"),
+        ("Use ql.FlatForward with ql.Actual360", "code"),
+        ("What is a day counter?", "prose"),
+        ("Explain how to build a curve", "prose"),
+        # słaby sygnał (ql.*, "how do I") przegrywa z pytaniem definicyjnym
+        ("What is ql.Actual360 and how do I use it?", "prose"),
+        # jawna prośba o przykład wygrywa zawsze
+        ("What is a good example of a Schedule?", "code"),
+    ],
+)
+def test_classify(question, intent):
+    assert QueryIntentRouter().classify(question) == intent
+
+
+def test_custom_patterns():
+    router = QueryIntentRouter(explicit_patterns=[r"\bpython\b"], howto_patterns=[r"^$"])
+
+    assert router.is_code_query("python please")
+    assert not router.is_code_query("Give an example")
+
+
+# ---------- PRZYKŁADY KODU ----------
+
+CHUNK = Document(
+    page_content=(
+        "# Term structures\n"
+        "## Flat forward\n"
+        "A flat curve is the simplest term structure.\n"
+        "Build it from a reference date and a rate:\n"
+        "```python\n"
+        "curve = ql.FlatForward(today, 0.05, ql.Actual360())\n"
+        "```\n"
+        "Short snippet:\n"
+        "```\n"
+        "x = 1\n"
+        "```\n"
+        "Discount factors come from the handle:\n"
+        "```python\n"
+        "handle = ql.YieldTermStructureHandle(curve)\n"
+        "df = handle.discount(1.0)\n"
+        "```\n"
+    ),
+    metadata={"source": "termstructures.md", "h1": "Term structures", "h2": "Flat forward"},
+)
+
+
+def test_extracts_code_blocks_with_headers_and_caption():
+    examples = extract_code_examples([CHUNK], ["parent-1"])
+
+    assert len(examples) == 2  # blok "x = 1" jest krótszy niż min_chars
+    first = examples[0].page_content
+    assert first.startswith("Term structures > Flat forward\n")
+    assert "A flat curve is the simplest term structure. Build it from a reference date and a rate:" in first
+    assert first.endswith("```\ncurve = ql.FlatForward(today, 0.05, ql.Actual360())\n```")
+    assert "Discount factors come from the handle:" in examples[1].page_content
+    assert [e.metadata["example_index"] for e in examples] == [0, 1]
+    assert all(e.metadata["parent_id"] == "parent-1" for e in examples)
+    assert examples[0].metadata["source"] == "termstructures.md"
+
+
+def test_caption_is_capped_and_ids_are_stable():
+    [example] = extract_code_examples([CHUNK], ["parent-1"], caption_max_chars=20)[:1]
+
+    assert "rate:" in example.page_content and "simplest" not in example.page_content
+    again = extract_code_examples([CHUNK], ["parent-1"])
+    assert example_id(again[0]) == example_id(extract_code_examples([CHUNK], ["parent-1"])[0])
+    assert example_id(again[0]) != example_id(again[1])
+
+
+def test_unclosed_fence_is_ignored():
+    chunk = Document(page_content="Intro\n```python\nno_end = ql.Schedule(a, b, c, d, e, f)\n", metadata={})
+
+    assert extract_code_examples([chunk], ["p"]) == []
@@ -0,0 +1,56 @@
+from src.quantlib_rag.ingestion.compress import compress_chunk
+
+
+CODE = """```python
+import QuantLib as ql
+helpers = [ql.DepositRateHelper(q,
+                                ql.Period(t),    fixingDays,
+    calendar, ql.ModifiedFollowing, False, ql.Actual360())]
+
+| not | a | table |
+- .NPV()
+- .cleanPrice()
+- .dirtyPrice()
+*fixedRate* ¶
+```"""
+
+
+def test_code_blocks_are_verbatim():
+    text = "Intro text ¶\n\n" + CODE + "\n\nprevious\n| a | b |\n|---|---|\n" + "| 1 | 2 |\n" * 20
+
+    compact = compress_chunk(text, table_max_rows=3)
+
+    assert CODE in compact
+
+
+def test_code_right_after_open_signature_is_not_glued():
+    text = "ql.Schedule(\n```\nschedule = ql.Schedule(a, b)\n```"
+
+    assert compress_chunk(text) == text
+
+
+def test_broken_signature_is_joined_with_spaces():
+    text = "*class*ql.VanillaSwap(*type*,\n*nominal*,\nfixedSchedule)\nUsed for swaps."
+
+    assert compress_chunk(text) == "class ql.VanillaSwap(type, nominal, fixedSchedule)\nUsed for swaps."
+
+
+def test_prose_and_bullets_ending_with_comma_stay_separate():
+    text = "The rate is computed below,\nwhere t is the year fraction.\n- receiveFixed,\n- swapType"
+
+    assert compress_chunk(text) == text
+
+
+def test_boilerplate_tables_and_method_bullets_are_compacted():
+    text = (
+        "Edit on GitHub\n"
+        "| col | val |\n|---|---|\n" + "".join(f"| r{i} | {i} |\n" for i in range(10))
+        + "\n- .NPV()\n\n- .cleanPrice()\n- .dirtyPrice()\n"
+    )
+
+    lines = compress_chunk(text, table_max_rows=2).splitlines()
+
+    assert "Edit on GitHub" not in lines
+    assert lines[:4] == ["| col | val |", "|---|---|", "| r0 | 0 |", "| r1 | 1 |"]
+    assert lines[4] == "| … (+8 rows) |"
+    assert lines[-1] == "Methods: .NPV(), .cleanPrice(), .dirtyPrice()"
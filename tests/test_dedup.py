@@ -0,0 +1,70 @@
+from langchain_core.documents import Document
+
+from src.quantlib_rag.ingestion.dedup import ChunkDeduplicator
+
+
+BASE = (
+    "The PiecewiseLogCubicDiscount curve is bootstrapped from a list of rate helpers "
+    "such as DepositRateHelper and SwapRateHelper using the given day counter and "
+    "calendar, and it can be linked to a RelinkableYieldTermStructureHandle for pricing"
+)
+
+
+def doc(text: str, source: str) -> Document:
+    return Document(page_content=text, metadata={"source": f"/docs/{source}"})
+
+
+def test_exact_duplicates_ignore_case_and_punctuation():
+    chunks = [doc(BASE, "a.md"), doc(BASE.upper() + " !!", "b.md"), doc("Something else entirely here", "c.md")]
+
+    kept, report = ChunkDeduplicator().deduplicate(chunks)
+
+    assert len(kept) == 2
+    assert report["chunks_in"] == 3
+    assert report["chunks_out"] == 2
+    assert report["exact_removed"] == 1
+    assert report["near_removed"] == 0
+
+
+def test_near_duplicates_collapse_to_longest_with_merged_sources():
+    near = BASE + " in QuantLib"
+    chunks = [doc(BASE, "termstructures.md"), doc(near, "reference.md")]
+
+    kept, report = ChunkDeduplicator(threshold=0.8).deduplicate(chunks)
+
+    assert len(kept) == 1
+    assert kept[0].page_content == near
+    assert kept[0].metadata["duplicate_sources"] == "reference.md;termstructures.md"
+    assert kept[0].metadata["duplicate_count"] == 2
+    assert report["exact_removed"] == 0
+    assert report["near_removed"] == 1
+    assert report["chars_removed"] == len(BASE)
+
+
+def test_exact_and_near_groups_merge_into_one():
+    near = BASE + " in QuantLib"
+    chunks = [doc(BASE, "a.md"), doc(BASE, "b.md"), doc(near, "c.md")]
+
+    kept, report = ChunkDeduplicator(threshold=0.8).deduplicate(chunks)
+
+    assert len(kept) == 1
+    assert kept[0].metadata["duplicate_sources"] == "a.md;b.md;c.md"
+    assert kept[0].metadata["duplicate_count"] == 3
+    assert report["exact_removed"] == 1
+    assert report["near_removed"] == 1
+    assert report["chars_removed"] == 2 * len(BASE)
+
+
+def test_distinct_chunks_are_kept_untouched():
+    chunks = [
+        doc(BASE, "a.md"),
+        doc("ql.Schedule builds payment dates from an effective date, termination date and tenor", "b.md"),
+        doc("FixedRateBond prices a bullet bond with a fixed coupon from a discount curve", "c.md"),
+    ]
+
+    kept, report = ChunkDeduplicator().deduplicate(chunks)
+
+    assert [d.metadata["source"] for d in kept] == ["/docs/a.md", "/docs/b.md", "/docs/c.md"]
+    assert all("duplicate_sources" not in d.metadata for d in kept)
+    assert report["chunks_out"] == 3
+    assert report["chars_removed"] == 0
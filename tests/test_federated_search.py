@@ -0,0 +1,180 @@
+import time
+
+import chromadb
+import numpy as np
+import pytest
+from langchain_core.embeddings import FakeEmbeddings
+
+from src.quantlib_rag.rag.chunk_store import ChunkStore
+from src.quantlib_rag.rag.federated_search import FederatedSearch, calibrate, local_shard
+from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+
+
+DIM = 8
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def make_shard(db_dir, prefix: str, vectors: np.ndarray, with_collection: bool = True):
+    ids = [f"{prefix}-{i}" for i in range(len(vectors))]
+    if with_collection:
+        client = chromadb.PersistentClient(path=str(db_dir))
+        client.create_collection("langchain", metadata={"hnsw:space": "cosine"}).add(
+            ids=ids, embeddings=vectors.tolist(), documents=[f"{prefix} text {i}" for i in range(len(ids))]
+        )
+        client.close()
+    ChunkStore.write(
+        ChunkStore.path_for(db_dir), ids=ids, texts=[f"{prefix} text {i}" for i in range(len(ids))],
+        metadatas=[{"source": f"{prefix}.md"}] * len(ids),
+    )
+    return db_dir
+
+
+@pytest.fixture(scope="module")
+def shards(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    root = tmp_path_factory.mktemp("shards")
+    e1 = np.eye(DIM)[0]
+    vectors = {
+        # gęsty tematycznie shard: wysokie tło, surowy cosine zawyżony
+        "dense": normalized(e1 + 0.3 * rng.normal(size=(40, DIM))),
+        "sparse": normalized(rng.normal(size=(40, DIM))),
+        "main": normalized(rng.normal(size=(40, DIM))),
+    }
+    dirs = {name: make_shard(root / name, name, v) for name, v in vectors.items()}
+    return dirs, vectors
+
+
+@pytest.fixture(scope="module")
+def federation(shards):
+    dirs, _ = shards
+    fed = FederatedSearch({"dense": dirs["dense"], "sparse": dirs["sparse"]}, timeout=60.0)
+    yield fed
+    fed.close()
+
+
+@pytest.fixture(scope="module")
+def main_shard(shards):
+    dirs, _ = shards
+    client = chromadb.PersistentClient(path=str(dirs["main"]))
+    store = ChunkStore(ChunkStore.path_for(dirs["main"]))
+    yield local_shard("main", client.get_collection("langchain"), store)
+    store.close()
+    client.close()
+
+
+def calibrated_top_k(shards, calibration, query: np.ndarray, k: int):
+    _, vectors = shards
+    scored = []
+    for name, v in vectors.items():
+        c = calibration[name]
+        scored += [((s - c["mean"]) / c["std"], f"{name}-{i}") for i, s in enumerate(v @ query)]
+    return [cid for _, cid in sorted(scored, reverse=True)[:k]]
+
+
+def test_results_are_merged_by_calibrated_score(shards, federation, main_shard):
+    _, vectors = shards
+    calibration = dict(federation.calibration, main=main_shard["calibration"])
+    assert calibration["dense"]["mean"] > calibration["sparse"]["mean"] + 0.3
+
+    queries = normalized(np.random.default_rng(1).normal(size=(4, DIM)) + np.eye(DIM)[0])
+    results = federation.search(queries.tolist(), 6, local=main_shard)
+
+    for query, (handles, vectors_) in zip(queries, results):
+        assert [h.id for h in handles] == calibrated_top_k(shards, calibration, query, 6)
+        assert vectors_ is None
+    raw = sorted(
+        ((float(s), f"{n}-{i}") for n, v in vectors.items() for i, s in enumerate(v @ queries[0])),
+        reverse=True,
+    )
+    # kalibracja faktycznie zmienia kolejność względem surowego cosine
+    assert [cid for _, cid in raw[:6]] != [h.id for h in results[0][0]]
+    assert set(federation.last_report["shards"]) == {"dense", "sparse", "main"}
+    assert not federation.last_report["degraded"]
+
+
+def test_with_vectors_returns_hit_vectors(shards, federation):
+    _, vectors = shards
+    query = vectors["sparse"][5]
+
+    [(handles, hit_vectors)] = federation.search([query.tolist()], 3, with_vectors=True)
+
+    assert handles[0].id == "sparse-5" and handles[0].page_content == "sparse text 5"
+    np.testing.assert_allclose(hit_vectors[0], query, atol=1e-5)
+
+
+def test_timed_out_shard_is_skipped_and_restarted(shards, federation):
+    _, vectors = shards
+    query = [vectors["sparse"][3].tolist()]
+    hung = federation._executors["sparse"]
+    hung.submit(time.sleep, 30)  # worker zajęty -> nie odpowie w terminie
+    federation.timeout = 0.5
+    try:
+        status = {}
+        started = time.perf_counter()
+        [(handles, _)] = federation.search(query, 5, status=status)
+
+        assert time.perf_counter() - started < 5
+        assert status["degraded"] and "timeout" in status["shards"]["sparse"]["error"]
+        assert all(h.id.startswith("dense-") for h in handles)
+        assert federation._executors["sparse"] is not hung
+    finally:
+        federation.timeout = 60.0
+
+    status = {}
+    [(handles, _)] = federation.search(query, 5, status=status)
+    assert not status["degraded"] and handles[0].id == "sparse-3"
+
+
+def test_shards_that_cannot_start_are_dropped(tmp_path, shards):
+    dirs, vectors = shards
+    broken = make_shard(tmp_path / "broken", "broken", vectors["main"][:3], with_collection=False)
+
+    fed = FederatedSearch(
+        {"ok": dirs["sparse"], "broken": broken, "empty": tmp_path / "empty"}, timeout=60.0
+    )
+    try:
+        assert len(fed) == 1 and set(fed.calibration) == {"ok"}
+        [(handles, _)] = fed.search([vectors["sparse"][0].tolist()], 2)
+        assert handles[0].id == "sparse-0"
+    finally:
+        fed.close()
+
+
+def test_degraded_results_are_not_cached(shards, federation, main_shard):
+    dirs, _ = shards
+    index = QuantLibIndex(db_path=dirs["main"], embeddings=FakeEmbeddings(size=DIM), corpora=[])
+    index.federation, index._local_shard = federation, main_shard
+    hung = federation._executors["dense"]
+    hung.submit(time.sleep, 30)
+    federation.timeout = 0.5
+    try:
+        partial = index.search_handles("How to build a curve?", 4)
+        assert len(index.retrieval_cache) == 0
+    finally:
+        federation.timeout = 60.0
+
+    complete = index.search_handles("How to build a curve?", 4)
+    assert len(index.retrieval_cache) == 1
+    assert index.search_handles("How to build a curve?", 4) == complete
+    assert not any(h.id.startswith("dense-") for h in partial)
+    index.chunk_store.close()
+
+
+def test_calibration_samples_whole_collection():
+    # pierwsze wiersze (pierwsze pliki) prawie identyczne, reszta losowa
+    rng = np.random.default_rng(0)
+    head = normalized(np.eye(DIM)[0] + 0.01 * rng.normal(size=(300, DIM)))
+    tail = normalized(rng.normal(size=(300, DIM)))
+    collection = chromadb.EphemeralClient().create_collection("calibration")
+    vectors = np.vstack([head, tail])
+    collection.add(ids=[str(i) for i in range(len(vectors))], embeddings=vectors.tolist())
+
+    info = calibrate(collection, sample=100)
+
+    sims = vectors @ vectors.T
+    assert info["count"] == 600
+    assert abs(info["mean"] - sims[~np.eye(600, dtype=bool)].mean()) < 0.1
+    assert calibrate(collection, sample=100) == info
@@ -0,0 +1,95 @@
+import re
+
+import pytest
+
+from src.quantlib_rag.rag.chunk_store import ChunkStore
+from src.quantlib_rag.rag.grounding import BatchGroundingChecker
+
+
+@pytest.fixture
+def stores(tmp_path):
+    ChunkStore.write(
+        tmp_path / "main",
+        ids=["doc-1", "doc-2"],
+        texts=[
+            "A schedule is built with ql.Schedule from a calendar and a tenor.",
+            "Discount curves use ql.FlatForward or ql.ZeroCurve.",
+        ],
+        metadatas=[{"source": "dates.md"}, {"source": "termstructures.md"}],
+    )
+    ChunkStore.write(
+        tmp_path / "code",
+        ids=["ex-1"],
+        texts=["```python\ncal = ql.TARGET()\nsched = ql.MakeSchedule(start, end, ql.Period('6M'))\n```"],
+        metadatas=[{"parent_id": "doc-1"}],
+    )
+    opened = [ChunkStore(tmp_path / "main"), ChunkStore(tmp_path / "code")]
+    yield opened
+    for store in opened:
+        store.close()
+
+
+def test_ids_resolve_across_stores(stores):
+    checker = BatchGroundingChecker(stores, processes=1)
+    answer = "Use ql.Schedule, or ql.MakeSchedule with ql.TARGET()."
+
+    [result] = checker.score([(answer, ["doc-1", "ex-1"])])
+
+    assert result["missing_chunk_ids"] == []
+    assert result["api_in_answer"] == ["ql.MakeSchedule", "ql.Schedule", "ql.TARGET"]
+    assert result["api_only_in_answer"] == []
+    assert result["overlap_percent"] > 50
+
+
+def test_symbols_outside_context_are_flagged(stores):
+    checker = BatchGroundingChecker(stores, processes=1)
+
+    [result] = checker.score([("Build it with ql.FlatForward and ql.Schedule.", ["doc-1", "gone"])])
+
+    assert result["missing_chunk_ids"] == ["gone"]
+    assert result["api_in_both"] == ["ql.Schedule"]
+    assert result["api_only_in_answer"] == ["ql.FlatForward"]
+
+
+def test_single_store_misses_code_example_ids(stores):
+    checker = BatchGroundingChecker(stores[:1], processes=1)
+
+    [result] = checker.score([("ql.TARGET()", ["ex-1"])])
+
+    assert result["missing_chunk_ids"] == ["ex-1"]
+    assert result["api_only_in_answer"] == ["ql.TARGET"]
+
+
+def reference_analysis(answer, texts):
+    # liczenie jak w QuantLibQuoteAssistant.analyze_answer_vs_context
+    context = "\n\n--- DOC SPLIT ---\n\n".join(texts)
+    answer_tokens = set(re.findall(r"\w+", answer.lower()))
+    context_tokens = set(re.findall(r"\w+", context.lower()))
+    api_in_answer = set(re.findall(r"ql\.\w+", answer))
+    api_in_context = set(re.findall(r"ql\.\w+", context))
+    overlap = len(answer_tokens & context_tokens) / len(answer_tokens) * 100 if answer_tokens else 0.0
+    return round(overlap, 2), sorted(api_in_answer & api_in_context), sorted(api_in_answer - api_in_context)
+
+
+@pytest.mark.parametrize(
+    "answer, chunk_ids",
+    [
+        ("Split the doc: ql.Schedule with ql.TARGET().", ["doc-1"]),
+        ("Split the doc: ql.Schedule with ql.TARGET().", ["doc-1", "ex-1"]),
+        ("DOC SPLIT ql.ZeroCurve, ql.Bond", ["doc-1", "doc-2", "gone"]),
+        ("", ["doc-1", "doc-2"]),
+    ],
+)
+def test_scores_match_analyze_answer_vs_context(stores, answer, chunk_ids):
+    checker = BatchGroundingChecker(stores, processes=1)
+    texts = [
+        store.text(store.row_by_id[cid])
+        for cid in chunk_ids for store in stores if cid in store.row_by_id
+    ]
+
+    [result] = checker.score([(answer, chunk_ids)])
+
+    overlap, api_in_both, api_only_in_answer = reference_analysis(answer, texts)
+    assert result["overlap_percent"] == overlap
+    assert result["api_in_both"] == api_in_both
+    assert result["api_only_in_answer"] == api_only_in_answer
@@ -0,0 +1,45 @@
+import chromadb
+import numpy as np
+
+from src.quantlib_rag.ingestion.hnsw_tuner import HnswTuner, hnsw_metadata
+
+
+def result(settings, recall, p50, size=1000):
+    return {"settings": settings, "recall": recall, "latency_ms_p50": p50, "index_bytes": size}
+
+
+def test_choose_fastest_passing_candidate():
+    results = [result({}, 1.0, 0.9), result({"M": 8}, 0.99, 0.4), result({"M": 32}, 1.0, 0.6)]
+
+    assert HnswTuner.choose(results, target_recall=0.99)["settings"] == {"M": 8}
+
+
+def test_choose_keeps_defaults_when_no_candidate_reaches_target():
+    results = [result({}, 1.0, 0.9), result({"M": 8}, 0.91, 0.3), result({"M": 16}, 0.95, 0.5)]
+
+    assert HnswTuner.choose(results, target_recall=0.99)["settings"] == {}
+
+
+def test_choose_keeps_defaults_when_they_are_fastest():
+    results = [result({}, 0.995, 0.3), result({"M": 32}, 1.0, 0.7)]
+
+    assert HnswTuner.choose(results, target_recall=0.99)["settings"] == {}
+    assert hnsw_metadata({}) is None
+
+
+def test_run_considers_chroma_defaults(tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(200, 16))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    client.create_collection("langchain").add(
+        ids=[str(i) for i in range(len(vectors))], embeddings=vectors.tolist()
+    )
+    client.close()
+
+    tuner = HnswTuner(db_dir=tmp_path, k=5, n_queries=20, target_recall=1.01)
+    report = tuner.run(candidates=[{"space": "cosine", "M": 8, "construction_ef": 16, "search_ef": 8}])
+
+    # target nieosiągalny -> najwyższy recall spośród domyślnych i siatki
+    best = max([report["baseline"]] + report["candidates"], key=lambda r: r["recall"])
+    assert report["chosen"]["recall"] == best["recall"]
+    assert report["settings"] == report["chosen"]["settings"]
@@ -0,0 +1,125 @@
+import chromadb
+import numpy as np
+import pytest
+
+from src.quantlib_rag.ingestion.index_snapshot import (
+    QuantLibIndexSnapshot,
+    SnapshotError,
+    SnapshotMismatchError,
+)
+from src.quantlib_rag.ingestion.manifest import build_index_manifest, write_manifest
+from src.quantlib_rag.rag.chunk_store import ChunkStore
+
+
+DOCUMENTS = [
+    "ql.Schedule(start, end, period, calendar, ...)",
+    "Zero curve\u2028bootstrapped from deposits",
+    "Next line\u0085and paragraph separators",
+]
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    db_dir = tmp_path / "index"
+    client = chromadb.PersistentClient(path=str(db_dir))
+    collection = client.create_collection("langchain", metadata={"hnsw:space": "cosine"})
+    vectors = np.random.default_rng(0).normal(size=(len(DOCUMENTS), 8)).astype(np.float32)
+    collection.add(
+        ids=[f"c{i}" for i in range(len(DOCUMENTS))],
+        embeddings=vectors.tolist(),
+        documents=DOCUMENTS,
+        metadatas=[{"source": f"doc{i}.md"} for i in range(len(DOCUMENTS))],
+    )
+    write_manifest(db_dir, build_index_manifest())
+    return db_dir
+
+
+def test_export_restore_round_trip(index_dir, tmp_path):
+    path = QuantLibIndexSnapshot.export(index_dir, tmp_path / "index.qlsnap")
+    snapshot = QuantLibIndexSnapshot.open(path)
+
+    restored = snapshot.restore(tmp_path / "restored")
+
+    original = chromadb.PersistentClient(path=str(index_dir)).get_collection("langchain")
+    copy = chromadb.PersistentClient(path=str(restored)).get_collection("langchain")
+    a = original.get(include=["embeddings", "documents", "metadatas"])
+    b = copy.get(include=["embeddings", "documents", "metadatas"])
+
+    order_a, order_b = np.argsort(a["ids"]), np.argsort(b["ids"])
+    assert [a["ids"][i] for i in order_a] == [b["ids"][i] for i in order_b]
+    assert [a["documents"][i] for i in order_a] == [b["documents"][i] for i in order_b]
+    assert [a["metadatas"][i] for i in order_a] == [b["metadatas"][i] for i in order_b]
+    # Chroma dla space=cosine sama normalizuje wektory -> porównanie z tolerancją float32
+    np.testing.assert_allclose(
+        np.asarray(a["embeddings"])[order_a], np.asarray(b["embeddings"])[order_b], atol=1e-6
+    )
+    assert copy.metadata.get("hnsw:space") == "cosine"
+
+    store = ChunkStore.open_if_exists(restored, "langchain")
+    assert sorted(store.text(r) for r in range(len(store))) == sorted(DOCUMENTS)
+    store.close()
+
+
+def test_records_keep_unicode_line_separators(index_dir, tmp_path):
+    snapshot = QuantLibIndexSnapshot.open(QuantLibIndexSnapshot.export(index_dir, tmp_path / "s.qlsnap"))
+
+    records = list(snapshot.records("langchain"))
+
+    assert sorted(r["document"] for r in records) == sorted(DOCUMENTS)
+
+
+def test_corrupted_payload_is_rejected(index_dir, tmp_path):
+    path = QuantLibIndexSnapshot.export(index_dir, tmp_path / "s.qlsnap")
+    data = bytearray(path.read_bytes())
+    data[-100] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError, match="Checksum mismatch"):
+        QuantLibIndexSnapshot.open(path)
+
+
+def test_not_a_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "bogus.qlsnap"
+    path.write_bytes(b"not a snapshot at all, just some bytes")
+
+    with pytest.raises(SnapshotError, match="Not a QuantLib index snapshot"):
+        QuantLibIndexSnapshot.open(path)
+
+
+def test_restore_rejects_other_embedding_model(index_dir, tmp_path):
+    write_manifest(index_dir, build_index_manifest(model_name="other/model"))
+    snapshot = QuantLibIndexSnapshot.open(QuantLibIndexSnapshot.export(index_dir, tmp_path / "s.qlsnap"))
+
+    with pytest.raises(SnapshotMismatchError, match="embedding_model"):
+        snapshot.restore(tmp_path / "restored")
+    assert not (tmp_path / "restored").exists()
+
+
+def test_failed_restore_leaves_target_untouched(index_dir, tmp_path, monkeypatch):
+    snapshot = QuantLibIndexSnapshot.open(QuantLibIndexSnapshot.export(index_dir, tmp_path / "s.qlsnap"))
+    target = tmp_path / "served"
+    target.mkdir()
+    (target / "marker").write_text("current index")
+
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(ChunkStore, "write", disk_full)
+    with pytest.raises(OSError, match="No space left"):
+        snapshot.restore(target, overwrite=True)
+
+    assert [p.name for p in target.iterdir()] == ["marker"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index", "s.qlsnap", "served"]
+
+
+def test_restore_replaces_existing_index(index_dir, tmp_path):
+    snapshot = QuantLibIndexSnapshot.open(QuantLibIndexSnapshot.export(index_dir, tmp_path / "s.qlsnap"))
+    target = tmp_path / "served"
+    target.mkdir()
+    (target / "marker").write_text("old index")
+
+    snapshot.restore(target, overwrite=True)
+
+    assert not (target / "marker").exists()
+    assert chromadb.PersistentClient(path=str(target)).get_collection("langchain").count() == len(DOCUMENTS)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index", "s.qlsnap", "served"]
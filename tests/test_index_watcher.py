@@ -0,0 +1,64 @@
+import chromadb
+import numpy as np
+import pytest
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain_core.embeddings import FakeEmbeddings
+
+from src.quantlib_rag.rag import index_watcher
+from src.quantlib_rag.rag.index_watcher import LiveQuantLibIndex
+from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+
+
+def chroma_paths():
+    return {str(p) for p in SharedSystemClient._identifier_to_system}
+
+
+@pytest.fixture
+def make_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_watcher, "INDEX_VERSIONS_DIR", tmp_path)
+    embeddings = FakeEmbeddings(size=8)
+
+    def make(name: str) -> QuantLibIndex:
+        db_dir = tmp_path / name
+        client = chromadb.PersistentClient(path=str(db_dir))
+        collection = client.create_collection("langchain", metadata={"hnsw:space": "cosine"})
+        collection.add(
+            ids=[f"{name}-{i}" for i in range(3)],
+            embeddings=np.random.default_rng(0).normal(size=(3, 8)).tolist(),
+            documents=[f"{name} chunk {i}" for i in range(3)],
+            metadatas=[{"source": f"{name}.md"}] * 3,
+        )
+        client.close()
+        return QuantLibIndex(db_path=db_dir, embeddings=embeddings, corpora=[])
+
+    return make
+
+
+def test_swap_releases_old_versions(make_version):
+    first, second, third = make_version("v1"), make_version("v2"), make_version("v3")
+    live = LiveQuantLibIndex(first)
+    assert str(first.db_path) in chroma_paths()
+
+    live.swap(second)
+    live.swap(third)
+
+    paths = chroma_paths()
+    assert str(first.db_path) not in paths and str(second.db_path) not in paths
+    assert not first.db_path.exists() and not second.db_path.exists()
+    assert [h.id for h in live.current.search_by_vector([0.1] * 8, 3)][0].startswith("v3-")
+    live.current.close()
+
+
+def test_pinned_version_is_released_after_last_query(make_version):
+    first, second = make_version("v1"), make_version("v2")
+    live = LiveQuantLibIndex(first)
+
+    with live.acquire() as pinned:
+        live.swap(second)
+        # zapytanie w toku nadal czyta swoją wersję
+        assert pinned.chunk_store.text(0).startswith("v1")
+        assert str(first.db_path) in chroma_paths()
+
+    assert str(first.db_path) not in chroma_paths()
+    assert not first.db_path.exists()
+    live.current.close()
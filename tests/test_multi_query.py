@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.quantlib_rag.rag.chunk_store import ChunkStore
+from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+from src.quantlib_rag.rag.query_decomposer import QueryDecomposer
+
+
+# ---------- DECOMPOSER ----------
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "How do I build a schedule?",
+        # 'and' bez czasownika po nim - jedno zadanie
+        "Bootstrap a curve from deposits and swaps",
+    ],
+)
+def test_simple_questions_are_not_split(question):
+    assert QueryDecomposer().split(question) == [question]
+
+
+def test_and_before_verb_starts_a_new_part():
+    question = "Build a yield curve from deposits and swaps and price a fixed rate bond on it"
+
+    assert QueryDecomposer().split(question) == [
+        question,
+        "Build a yield curve from deposits and swaps",
+        "price a fixed rate bond on it",
+    ]
+
+
+def test_separators_and_max_parts():
+    question = "Build a curve and then price a bond, also plot the discount factors; print the NPV of it"
+
+    parts = QueryDecomposer(max_parts=2).split(question)
+
+    assert parts == [question, "Build a curve", "price a bond"]
+
+
+def test_short_fragment_is_glued_to_previous_part():
+    assert QueryDecomposer().heuristic_parts("Create a TARGET calendar; then list it") == [
+        "Create a TARGET calendar list it"
+    ]
+
+
+class _Llm:
+    def __init__(self, content=None, error=None):
+        self.content, self.error = content, error
+
+    def invoke(self, messages):
+        if self.error:
+            raise self.error
+        return SimpleNamespace(content=self.content)
+
+
+def test_llm_parts_strip_numbering_and_short_lines():
+    llm = _Llm("1. Build a flat forward curve\n- price a bond with it\nok\n")
+    question = "Build a flat forward curve and price a bond with it"
+
+    assert QueryDecomposer(llm=llm).split(question) == [
+        question,
+        "Build a flat forward curve",
+        "price a bond with it",
+    ]
+
+
+def test_llm_failure_falls_back_to_heuristics():
+    question = "Create a TARGET calendar; then compute the NPV of a vanilla swap"
+
+    parts = QueryDecomposer(llm=_Llm(error=TimeoutError("slow"))).split(question)
+
+    assert parts == [question, "Create a TARGET calendar", "compute the NPV of a vanilla swap"]
+
+
+# ---------- SCALANIE MULTI-SEARCH ----------
+
+@pytest.fixture
+def store(tmp_path):
+    ids = [f"c{i}" for i in range(8)]
+    ChunkStore.write(tmp_path, ids=ids, texts=ids, metadatas=[{}] * len(ids))
+    opened = ChunkStore(tmp_path)
+    yield opened
+    opened.close()
+
+
+def index_returning(ranked):
+    index = QuantLibIndex.__new__(QuantLibIndex)
+    index.embed_queries = lambda queries: queries
+    index.search_by_vectors = lambda vectors, k: [r[:k] for r in ranked]
+    return index
+
+
+def test_round_robin_merge_by_rank_without_duplicates(store):
+    h = {cid: store.handle(store.row_by_id[cid]) for cid in store.ids}
+    ranked = [
+        [h["c0"], h["c1"], h["c2"], h["c3"]],
+        [h["c1"], h["c4"], h["c5"], h["c6"]],
+        [h["c7"], h["c0"], h["c6"], h["c2"]],
+    ]
+
+    merged = index_returning(ranked)._multi_search(["q", "a", "b"], k=4)
+
+    assert [m.id for m in merged] == ["c0", "c1", "c7", "c4"]
+
+
+def test_merge_stops_when_sub_queries_run_out(store):
+    h = {cid: store.handle(store.row_by_id[cid]) for cid in store.ids}
+    ranked = [[h["c0"], h["c1"]], [h["c1"]]]
+
+    merged = index_returning(ranked)._multi_search(["q", "a"], k=5)
+
+    assert [m.id for m in merged] == ["c0", "c1"]
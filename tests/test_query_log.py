@@ -0,0 +1,42 @@
+import threading
+
+from src.quantlib_rag.rag.query_log import QueryLog, shared_query_log
+
+
+def test_shared_query_log_is_one_per_process(tmp_path):
+    first = shared_query_log(tmp_path)
+    assert shared_query_log(tmp_path) is first
+    assert shared_query_log(tmp_path, backend="sqlite") is not first
+
+
+def test_concurrent_writes_with_rotation_keep_every_line(tmp_path):
+    # sesje Streamlit = wątki piszące do tego samego logu; rotacja co kilka wpisów
+    log = QueryLog(log_dir=tmp_path, max_bytes=2048, backups=200)
+
+    def session(n: int) -> None:
+        for i in range(25):
+            log.record(f"question {n} {i}", ["c1"], {"total": 1.0}, k=5)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    records = list(log.records())
+    assert len(records) == 200
+    assert len({r["question"] for r in records}) == 200
+    assert len(list(tmp_path.glob("queries.jsonl.*"))) > 1
+
+
+def test_top_queries_counts_and_params(tmp_path):
+    log = QueryLog(log_dir=tmp_path)
+    for _ in range(3):
+        log.record("How to build a Schedule?", ["a"], {"total": 10.0}, k=5, adaptive=False)
+    log.record("What is a FlatForward curve?", ["b"], {"total": 20.0}, k=3)
+
+    top = log.top_queries(1)
+
+    assert top[0]["count"] == 3 and top[0]["mean_total_ms"] == 10.0
+    assert top[0]["params"] == {"k": 5, "adaptive": False}
+    assert log.hot_chunks(1) == [{"chunk_id": "a", "count": 3}]
@@ -0,0 +1,74 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import chromadb
+import numpy as np
+import pytest
+from langchain_core.embeddings import FakeEmbeddings
+
+from src.quantlib_rag.rag.quantlib_index import QuantLibIndex
+
+
+DIM = 16
+
+
+def _worker_search(spec: Dict[str, Any], queries: List[List[float]], k: int) -> List[List[str]]:
+    # ścieżka workera: QuantLibIndex podpięty do segmentu rodzica, bez Chroma
+    index = QuantLibIndex(shared_segment=spec, embeddings=FakeEmbeddings(size=DIM))
+    assert index.vectorstore is None
+    try:
+        return [[h.id for h in index.search_by_vector(q, k)] for q in queries]
+    finally:
+        index.close()
+
+
+@pytest.fixture
+def index(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(60, DIM))
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.create_collection("langchain", metadata={"hnsw:space": "cosine"})
+    collection.add(
+        ids=[f"c{i}" for i in range(len(vectors))],
+        embeddings=(vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist(),
+        documents=[f"chunk {i}" for i in range(len(vectors))],
+        metadatas=[{"source": f"doc{i % 7}.md"} for i in range(len(vectors))],
+    )
+    client.close()
+
+    opened = QuantLibIndex(db_path=tmp_path, embeddings=FakeEmbeddings(size=DIM), corpora=[])
+    yield opened
+    opened.close()
+
+
+def test_spawned_worker_matches_chroma(index):
+    rng = np.random.default_rng(1)
+    queries = rng.normal(size=(5, DIM))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).tolist()
+    expected = [[h.id for h in index.search_by_vector(q, 5)] for q in queries]
+
+    segment = index.share()
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+            got = pool.submit(_worker_search, segment.spec(), queries, 5).result(timeout=120)
+    finally:
+        segment.close()
+
+    assert got == expected
+
+
+def test_worker_candidates_come_with_segment_vectors(index):
+    segment = index.share()
+    try:
+        worker = QuantLibIndex(shared_segment=segment.spec(), embeddings=FakeEmbeddings(size=DIM))
+        query = segment.vectors[3].tolist()
+
+        handles, vectors = worker._candidates(query, 4)
+
+        assert handles[0].id == "c3" and handles[0].page_content == "chunk 3"
+        np.testing.assert_allclose(vectors[0], segment.vectors[3])
+        assert len(handles) == len(vectors) == 4
+        worker.close()
+    finally:
+        segment.close()